@@ -0,0 +1,299 @@
+"""
+Columnar counterpart of intake_agent.normalize + efficiency_auditor._rule_findings
+for many buildings at once.
+
+buildings: a DataFrame or a dict of equal-length arrays with columns
+    floor_area_m2, monthly_kWh, tariff_LKR_per_kWh,
+    bulbs, watt_per_bulb, lighting_hours_per_day
+ac_units: exploded AC table (one row per unit, in each building's unit order) with
+    building (row index into buildings), watt, hours_per_day, star_rating, count
+
+A missing column or a NaN cell means "key not given", so the per-building
+default applies. Results match _rule_findings(intake_agent.normalize(payload))
+building by building, issue text included. The rule conditions and impacts
+are array masks written here for the rules shipped in data/audit_rules.yaml;
+benchmarks, areas, confidences and issue/reason templates are read from the
+live rule pack on every call. If the pack's rules no longer are the ones
+the masks implement (a rule added, removed, reordered or rewritten),
+audit_batch raises RulePackError rather than disagree with the per-building
+audit.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from agents.efficiency_auditor import SEVERITY_WEIGHTS
+from agents.intake_agent import _load_defaults
+from utils.rule_pack import RulePack, RulePackError, get_rule_pack, logic_key
+
+
+SEVERITIES = ("low", "med", "high")
+_SEV_CODE = {s: i for i, s in enumerate(SEVERITIES)}
+
+# Rule ids, in the order the per-building passes emit their findings.
+AC_STAR, AC_HOURS, LIGHT_WATT, LIGHT_HOURS, ENVELOPE_HIGH, ENVELOPE_MED, USAGE_AC, USAGE_LIGHT = range(8)
+RULE_IDS = (
+    "ac_low_star_rating", "ac_long_hours", "lighting_high_wattage", "lighting_long_hours",
+    "intensity_very_high", "intensity_above_average", "ac_near_continuous", "lighting_extended_use",
+)
+# (scope, when, severity, impact) of each rule, as _rule_rows implements it.
+IMPLEMENTED = (
+    ("ac_unit", "star_rating < ac_efficiency.min_star_rating", "'high' if star_rating <= 2 else 'med'",
+     "watt * hours_per_day * 0.15 / 1000"),
+    ("ac_unit", "hours_per_day > ac_efficiency.max_hours_per_day", "med",
+     "watt * (hours_per_day - ac_efficiency.max_hours_per_day) / 1000"),
+    ("lighting", "watt_per_bulb > lighting_efficiency.led_watt_per_bulb * 1.5",
+     "'high' if watt_per_bulb >= lighting_efficiency.cfl_watt_per_bulb else 'med'",
+     "(watt_per_bulb - lighting_efficiency.led_watt_per_bulb) * bulbs * hours_per_day / 1000"),
+    ("lighting", "hours_per_day > lighting_efficiency.max_hours_per_day", "low",
+     "watt_per_bulb * bulbs * (hours_per_day - lighting_efficiency.max_hours_per_day) * 0.5 / 1000"),
+    ("building", "energy_intensity > energy_intensity.poor", "high", "monthly_kWh * 0.2"),
+    ("building", "energy_intensity.average < energy_intensity <= energy_intensity.poor", "med", "monthly_kWh * 0.1"),
+    ("ac_unit", "hours_per_day > 18", "high", "watt * 6 / 1000"),
+    ("lighting", "hours_per_day > 14", "med", "watt_per_bulb * bulbs * 4 / 1000"),
+)
+_IMPLEMENTED_LOGIC = [(rid, logic_key(*spec)) for rid, spec in zip(RULE_IDS, IMPLEMENTED)]
+# The name each rule's issue template quotes `value` under.
+VALUE_NAMES = (
+    "star_rating", "hours_per_day", "watt_per_bulb", "hours_per_day",
+    "energy_intensity", "energy_intensity", "hours_per_day", "hours_per_day",
+)
+
+# guardrails.clamp_hours / clamp_watts bounds.
+HOURS = (0, 24)
+WATTS = (0, 10000)
+
+
+def _column(table: Any, name: str, n: int, default: float) -> np.ndarray:
+    if table is None or name not in table:
+        return np.full(n, float(default))
+    col = np.asarray(table[name], dtype=float)
+    return np.where(np.isnan(col), float(default), col)
+
+
+def _clamp(x: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    return np.clip(x, lo, hi)
+
+
+def _rows(table: Any) -> int:
+    if table is None:
+        return 0
+    if hasattr(table, "__len__") and hasattr(table, "columns"):
+        return len(table)
+    lengths = {len(np.asarray(v)) for v in table.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"columns have different lengths: {sorted(lengths)}")
+    return lengths.pop() if lengths else 0
+
+
+@dataclass
+class NormalizedBatch:
+    """Clamped, defaulted columns; the same values intake_agent.normalize produces per building."""
+    floor_area_m2: np.ndarray
+    monthly_kWh: np.ndarray
+    tariff_LKR_per_kWh: np.ndarray
+    bulbs: np.ndarray
+    watt_per_bulb: np.ndarray
+    lighting_hours_per_day: np.ndarray
+    ac_building: np.ndarray
+    ac_unit: np.ndarray  # 1-based position of the unit within its building
+    ac_watt: np.ndarray
+    ac_hours_per_day: np.ndarray
+    ac_star_rating: np.ndarray
+    ac_count: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.floor_area_m2)
+
+
+def normalize_batch(buildings: Any, ac_units: Any = None) -> NormalizedBatch:
+    defaults = _load_defaults()
+    tariff_default = float(defaults.get("tariff_LKR_per_kWh_default", 62.0))
+    non_led_watt = float((defaults.get("lighting") or {}).get("non_led_watt_per_bulb", 12.0))
+    n = _rows(buildings)
+
+    floor = _column(buildings, "floor_area_m2", n, 0.0)
+    tariff = _column(buildings, "tariff_LKR_per_kWh", n, tariff_default)
+
+    m = _rows(ac_units)
+    ac_building = np.asarray(ac_units["building"], dtype=np.int64) if m else np.zeros(0, dtype=np.int64)
+    if m and (ac_building.min() < 0 or ac_building.max() >= n):
+        raise ValueError("ac_units.building must index rows of buildings")
+    # Stable sort keeps each building's units in row order; the rank inside
+    # each run of equal building ids is the unit number.
+    order = np.argsort(ac_building, kind="stable")
+    sorted_b = ac_building[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_b)) + 1] if m else np.zeros(0, dtype=np.int64)
+    run_start = np.repeat(starts, np.diff(np.r_[starts, m])) if m else np.zeros(0, dtype=np.int64)
+    unit = np.empty(m, dtype=np.int64)
+    unit[order] = np.arange(m) - run_start + 1
+
+    return NormalizedBatch(
+        floor_area_m2=np.where(floor < 0, 0.0, floor),
+        monthly_kWh=_clamp(_column(buildings, "monthly_kWh", n, 0.0), 0, 1e7),
+        tariff_LKR_per_kWh=np.where(tariff < 0, tariff_default, tariff),
+        bulbs=np.floor(_clamp(_column(buildings, "bulbs", n, 0.0), 0, 1000)).astype(np.int64),
+        watt_per_bulb=_clamp(_column(buildings, "watt_per_bulb", n, non_led_watt), *WATTS),
+        lighting_hours_per_day=_clamp(_column(buildings, "lighting_hours_per_day", n, 4.0), *HOURS),
+        ac_building=ac_building,
+        ac_unit=unit,
+        ac_watt=_clamp(_column(ac_units, "watt", m, 0.0), *WATTS),
+        ac_hours_per_day=_clamp(_column(ac_units, "hours_per_day", m, 0.0), *HOURS),
+        ac_star_rating=np.clip(np.trunc(_column(ac_units, "star_rating", m, 3.0)), 1, 5).astype(np.int64),
+        ac_count=np.floor(_clamp(_column(ac_units, "count", m, 1.0), 0, 1000)).astype(np.int64),
+    )
+
+
+@dataclass
+class BatchFindings:
+    """
+    One row per finding, sorted by building and then by rank (the
+    per-building sort order). `value` is the number quoted in the issue text.
+    """
+    building: np.ndarray
+    rule: np.ndarray
+    unit: np.ndarray
+    severity: np.ndarray  # index into SEVERITIES
+    value: np.ndarray
+    impact: np.ndarray
+    n_buildings: int
+    pack: RulePack  # the pack the findings were computed with
+
+    def __len__(self) -> int:
+        return len(self.building)
+
+    @property
+    def confidence(self) -> np.ndarray:
+        return np.asarray([r.confidence for r in self.pack.rules])[self.rule]
+
+    def counts(self) -> np.ndarray:
+        """Findings per building."""
+        return np.bincount(self.building, minlength=self.n_buildings)
+
+    def to_lists(self) -> List[List[Dict[str, Any]]]:
+        """Per-building finding dicts, identical to efficiency_auditor._rule_findings output."""
+        out: List[List[Dict[str, Any]]] = [[] for _ in range(self.n_buildings)]
+        rows = zip(
+            self.building.tolist(), self.rule.tolist(), self.unit.tolist(),
+            self.severity.tolist(), self.value.tolist(), self.impact.tolist(),
+        )
+        for b, rule, unit, sev, value, impact in rows:
+            out[b].append(_finding(self.pack, rule, unit, SEVERITIES[sev], value, impact))
+        return out
+
+
+def _quoted(name: str, value: float) -> Any:
+    """
+    `value` as intake_agent.normalize leaves it: guardrails.clamp returns its
+    int bound for a value at or past it, so 25 hours is quoted as "24h/day".
+    """
+    if name == "star_rating":
+        return int(value)
+    bounds = HOURS if name == "hours_per_day" else WATTS if name == "watt_per_bulb" else ()
+    return int(value) if value in bounds else value
+
+
+def _finding(pack: RulePack, rule: int, unit: int, severity: str, value: float, impact: float) -> Dict[str, Any]:
+    spec = pack.rules[rule]
+    names = {"unit": unit, VALUE_NAMES[rule]: _quoted(VALUE_NAMES[rule], value)}
+    return {
+        "area": spec.area,
+        "issue": spec.issue.format(benchmarks=pack.benchmarks, **names),
+        "severity": severity,
+        "reason": spec.reason.format(benchmarks=pack.benchmarks, **names),
+        "confidence": spec.confidence,
+        "estimated_kwh_impact": impact,
+    }
+
+
+def _check_pack(pack: RulePack) -> None:
+    if [(r.id, r.logic) for r in pack.rules] != _IMPLEMENTED_LOGIC:
+        raise RulePackError(
+            f"{pack.path}: rules differ from the ones audit_batch implements; "
+            "audit these buildings one at a time with efficiency_auditor.audit"
+        )
+
+
+def _rule_rows(nb: NormalizedBatch, benchmarks: Dict[str, Any]) -> Dict[str, List[np.ndarray]]:
+    """Every finding any rule raises, before ranking; `order` is the per-building emission order."""
+    ac_b = benchmarks["ac_efficiency"]
+    light_b = benchmarks["lighting_efficiency"]
+    ei_b = benchmarks["energy_intensity"]
+    rows: Dict[str, List[np.ndarray]] = {k: [] for k in ("building", "rule", "unit", "severity", "value", "impact", "order")}
+    buildings = np.arange(len(nb))
+    max_units = int(nb.ac_unit.max()) if len(nb.ac_unit) else 0
+
+    def add(mask, building, rule, unit, severity, value, impact, section):
+        k = int(mask.sum())
+        if not k:
+            return
+        rows["building"].append(building[mask])
+        rows["rule"].append(np.full(k, rule))
+        rows["unit"].append(unit[mask] if isinstance(unit, np.ndarray) else np.zeros(k, dtype=np.int64))
+        rows["severity"].append(severity[mask] if isinstance(severity, np.ndarray) else np.full(k, _SEV_CODE[severity]))
+        rows["value"].append(np.asarray(value, dtype=float)[mask])
+        rows["impact"].append(np.asarray(impact, dtype=float)[mask])
+        sub = unit[mask] * 2 if isinstance(unit, np.ndarray) else 0
+        rows["order"].append(np.full(k, section * (2 * max_units + 4) + int(rule in (AC_HOURS, LIGHT_HOURS))) + sub)
+
+    # _analyze_ac_efficiency
+    star, hours, watt = nb.ac_star_rating, nb.ac_hours_per_day, nb.ac_watt
+    add(star < ac_b["min_star_rating"], nb.ac_building, AC_STAR, nb.ac_unit,
+        np.where(star <= 2, _SEV_CODE["high"], _SEV_CODE["med"]), star, watt * hours * 0.15 / 1000, 0)
+    add(hours > ac_b["max_hours_per_day"], nb.ac_building, AC_HOURS, nb.ac_unit, "med", hours,
+        watt * (hours - ac_b["max_hours_per_day"]) / 1000, 0)
+
+    # _analyze_lighting_efficiency
+    wpb, bulbs, lh = nb.watt_per_bulb, nb.bulbs, nb.lighting_hours_per_day
+    add(wpb > light_b["led_watt_per_bulb"] * 1.5, buildings, LIGHT_WATT, None,
+        np.where(wpb >= light_b["cfl_watt_per_bulb"], _SEV_CODE["high"], _SEV_CODE["med"]), wpb,
+        (wpb - light_b["led_watt_per_bulb"]) * bulbs * lh / 1000, 1)
+    add(lh > light_b["max_hours_per_day"], buildings, LIGHT_HOURS, None, "low", lh,
+        wpb * bulbs * (lh - light_b["max_hours_per_day"]) * 0.5 / 1000, 1)
+
+    # _analyze_overall_efficiency
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ei = np.where(nb.floor_area_m2 <= 0, 0.0, nb.monthly_kWh / np.where(nb.floor_area_m2 <= 0, 1.0, nb.floor_area_m2))
+    high = ei > ei_b["poor"]
+    add(high, buildings, ENVELOPE_HIGH, None, "high", ei, nb.monthly_kWh * 0.2, 2)
+    add(~high & (ei > ei_b["average"]), buildings, ENVELOPE_MED, None, "med", ei, nb.monthly_kWh * 0.1, 2)
+
+    # _analyze_usage_patterns
+    add(hours > 18, nb.ac_building, USAGE_AC, nb.ac_unit, "high", hours, watt * 6 / 1000, 3)
+    add(lh > 14, buildings, USAGE_LIGHT, None, "med", lh, wpb * bulbs * 4 / 1000, 4)
+    return rows
+
+
+def audit_batch(buildings: Any, ac_units: Any = None, max_findings: int = 5,
+                normalized: Optional[NormalizedBatch] = None) -> BatchFindings:
+    """
+    Rule findings for every building: the quantitative half of
+    efficiency_auditor.audit, evaluated as array masks and ranked with one
+    lexsort (building, severity weight, estimated impact, emission order).
+    """
+    pack = get_rule_pack()
+    _check_pack(pack)
+    nb = normalized if normalized is not None else normalize_batch(buildings, ac_units)
+    rows = _rule_rows(nb, pack.benchmarks)
+    if not rows["building"]:
+        empty = np.zeros(0, dtype=np.int64)
+        return BatchFindings(empty, empty, empty, empty, np.zeros(0), np.zeros(0), len(nb), pack)
+    cols = {k: np.concatenate(v) for k, v in rows.items()}
+    weight = np.asarray([SEVERITY_WEIGHTS[s] for s in SEVERITIES])[cols["severity"]]
+    idx = np.lexsort((cols["order"], -cols["impact"], -weight, cols["building"]))
+    b = cols["building"][idx]
+    starts = np.r_[0, np.flatnonzero(np.diff(b)) + 1]
+    rank = np.arange(len(b)) - np.repeat(starts, np.diff(np.r_[starts, len(b)]))
+    keep = idx[rank < max_findings]
+    return BatchFindings(
+        building=cols["building"][keep],
+        rule=cols["rule"][keep],
+        unit=cols["unit"][keep],
+        severity=cols["severity"][keep],
+        value=cols["value"][keep],
+        impact=cols["impact"][keep],
+        n_buildings=len(nb),
+        pack=pack,
+    )
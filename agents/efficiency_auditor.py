@@ -1,270 +1,333 @@
 import json
 import math
 from pathlib import Path
-from utils.llm import call_json
+from utils.env import env_flag, env_float, env_int
+from utils.llm import LLMError, call_json, call_json_async, current_priority
 from utils.guardrails import clamp
+from utils.deadline import Deadline, RequestCancelled, current_deadline
+from utils.wire_schema import AUDIT_WIRE
+from utils.compaction import compact_building, compact_json, compaction_enabled, relevant_benchmarks
+from utils.rule_pack import get_rule_pack
+from utils.profile import building_profile, field_of, profile_of, without_profile
+from utils.peer_index import get_peer_index, peer_index_dir, peer_min_samples, peer_recording_enabled, record_observation
 
 PROMPT_PATH = Path(__file__).resolve().parent.parent / "prompts" / "auditor_system.txt"
 
-BENCHMARKS = {
-    "energy_intensity": {
-        "excellent": 8,   # kWh/m²/month
-        "good": 12,
-        "average": 18,
-        "poor": 25
-    },
-    "ac_efficiency": {
-        "min_star_rating": 3,
-        "recommended_star_rating": 4,
-        "max_hours_per_day": 12,
-        "optimal_setpoint": 24  # °C
-    },
-    "lighting_efficiency": {
-        "led_watt_per_bulb": 8,
-        "cfl_watt_per_bulb": 15,
-        "incandescent_watt_per_bulb": 60,
-        "max_hours_per_day": 8
-    },
-    "usage_patterns": {
-        "high_usage_threshold": 0.6,  # >60% of day
-        "standby_power_limit": 10     # watts
-    }
-}
-
-def _calculate_energy_intensity(normalized: dict) -> float:
-    """Calculate energy intensity in kWh/m²/month"""
-    monthly_kwh = float(normalized.get("monthly_kWh", 0))
-    floor_area = float(normalized.get("floor_area_m2", 1))  # Avoid division by zero
-    if floor_area <= 0:
-        return 0
-    return monthly_kwh / floor_area
-
-def _analyze_usage_patterns(normalized: dict) -> list:
-    """Analyze usage patterns for inefficiencies"""
-    issues = []
-
-
-    # Check AC usage patterns
-    ac_units = normalized.get("ac_units", [])
-    for i, ac in enumerate(ac_units):
-        hours_per_day = ac.get("hours_per_day", 0)
-        if hours_per_day > 18:  # >75% of day
-            issues.append({
-                "area": "other",
-                "issue": f"AC unit {i+1} operates {hours_per_day}h/day (excessive)",
-                "severity": "high",
-                "reason": "Near-continuous AC operation suggests poor building envelope or controls",
-                "confidence": 0.8,
-                "estimated_kwh_impact": ac.get("watt", 0) * 6 / 1000  # 6 hours reduction potential
-            })
-
-    # Check lighting usage patterns
-    lighting = normalized.get("lighting", {})
-    lighting_hours = lighting.get("hours_per_day", 0)
-    if lighting_hours > 14:
-        issues.append({
-            "area": "other",
-            "issue": f"Lights operate {lighting_hours}h/day (likely excessive)",
-            "severity": "med",
-            "reason": "Extended lighting suggests poor daylight utilization or lack of controls",
-            "confidence": 0.7,
-            "estimated_kwh_impact": lighting.get("watt_per_bulb", 0) * lighting.get("bulbs", 0) * 4 / 1000
-        })
-
-    return issues
-
-def _analyze_ac_efficiency(ac_units: list) -> list:
-    """Analyze AC efficiency and return issues"""
-    issues = []
-    for i, ac in enumerate(ac_units):
-        star_rating = ac.get("star_rating", 0)
-        hours_per_day = ac.get("hours_per_day", 0)
-        watt = ac.get("watt", 0)
-
-        if star_rating < BENCHMARKS["ac_efficiency"]["min_star_rating"]:
-            issues.append({
-                "area": "AC",
-                "issue": f"AC unit {i+1} has low efficiency rating ({star_rating} stars)",
-                "severity": "high" if star_rating <= 2 else "med",
-                "reason": f"Star rating below recommended minimum of {BENCHMARKS['ac_efficiency']['min_star_rating']}",
-                "confidence": 0.9,
-                "estimated_kwh_impact": watt * hours_per_day * 0.15 / 1000  # 15% improvement estimate
-            })
-
-        if hours_per_day > BENCHMARKS["ac_efficiency"]["max_hours_per_day"]:
-            issues.append({
-                "area": "AC",
-                "issue": f"AC unit {i+1} operates {hours_per_day}h/day (excessive usage)",
-                "severity": "med",
-                "reason": f"Usage exceeds recommended {BENCHMARKS['ac_efficiency']['max_hours_per_day']}h/day",
-                "confidence": 0.8,
-                "estimated_kwh_impact": watt * (hours_per_day - BENCHMARKS["ac_efficiency"]["max_hours_per_day"]) / 1000
-            })
-
-    return issues
-
-def _analyze_lighting_efficiency(lighting: dict) -> list:
-    """Analyze lighting efficiency and return issues"""
-    issues = []
-    watt_per_bulb = lighting.get("watt_per_bulb", 0)
-    bulbs = lighting.get("bulbs", 0)
-    hours_per_day = lighting.get("hours_per_day", 0)
-
-    if watt_per_bulb > BENCHMARKS["lighting_efficiency"]["led_watt_per_bulb"] * 1.5:
-        severity = "high" if watt_per_bulb >= BENCHMARKS["lighting_efficiency"]["cfl_watt_per_bulb"] else "med"
-        issues.append({
-            "area": "lighting",
-            "issue": f"High wattage bulbs ({watt_per_bulb}W per bulb)",
-            "severity": severity,
-            "reason": f"LED bulbs use only {BENCHMARKS['lighting_efficiency']['led_watt_per_bulb']}W for similar brightness",
-            "confidence": 0.95,
-            "estimated_kwh_impact": (watt_per_bulb - BENCHMARKS["lighting_efficiency"]["led_watt_per_bulb"]) * bulbs * hours_per_day / 1000
-        })
-
-    if hours_per_day > BENCHMARKS["lighting_efficiency"]["max_hours_per_day"]:
-        issues.append({
-            "area": "lighting",
-            "issue": f"Lights used {hours_per_day}h/day (potentially excessive)",
-            "severity": "low",
-            "reason": "Consider motion sensors or daylight harvesting",
-            "confidence": 0.6,
-            "estimated_kwh_impact": watt_per_bulb * bulbs * (hours_per_day - BENCHMARKS["lighting_efficiency"]["max_hours_per_day"]) * 0.5 / 1000
-        })
-
-    return issues
-
-def _analyze_overall_efficiency(normalized: dict) -> list:
-    """Analyze overall building efficiency"""
-    issues = []
+def benchmarks() -> dict:
+    """Benchmarks of the current rule pack; follows hot reloads."""
+    return get_rule_pack().benchmarks
+
+
+def _calculate_energy_intensity(normalized) -> float:
+    """Energy intensity in kWh/m²/month, read from the building profile"""
+    return profile_of(normalized).energy_intensity_kwh_per_m2
+
+def _peer_benchmark(normalized) -> dict | None:
+    """Percentile of the building's energy intensity among its peers; None without a peer index."""
+    index = get_peer_index()
     energy_intensity = _calculate_energy_intensity(normalized)
+    if index is None or energy_intensity <= 0:
+        return None
+    return index.percentile(
+        energy_intensity, field_of(normalized, "building_type", None),
+        field_of(normalized, "floor_area_m2"), peer_min_samples(),
+    )
+
+
+def _with_peers(summary: dict, normalized) -> dict:
+    peers = _peer_benchmark(normalized)
+    if peers is not None:
+        summary["peer_benchmark"] = peers
+    return summary
+
+SEVERITY_WEIGHTS = {"high": 3, "med": 2, "low": 1}
+
+
+def _as_dict(normalized) -> dict:
+    """Accept a NormalizedInput model or a plain dict."""
+    if hasattr(normalized, "model_dump"):
+        return normalized.model_dump()
+    return normalized or {}
+
+
+def _rule_findings(normalized, max_findings: int) -> list:
+    """Quantitative findings from the rule pack (data/audit_rules.yaml), sorted and capped."""
+    quantitative_issues = get_rule_pack().evaluate(normalized)
 
-    if energy_intensity > BENCHMARKS["energy_intensity"]["poor"]:
-        issues.append({
-            "area": "envelope",
-            "issue": f"Very high energy intensity ({energy_intensity:.1f} kWh/m²/month)",
-            "severity": "high",
-            "reason": f"Building uses {energy_intensity:.1f} kWh/m²/month, well above average of {BENCHMARKS['energy_intensity']['average']}",
-            "confidence": 0.9,
-            "estimated_kwh_impact": normalized.get("monthly_kWh", 0) * 0.2  # 20% potential reduction
-        })
-    elif energy_intensity > BENCHMARKS["energy_intensity"]["average"]:
-        issues.append({
-            "area": "envelope",
-            "issue": f"Above-average energy intensity ({energy_intensity:.1f} kWh/m²/month)",
-            "severity": "med",
-            "reason": f"Building uses more energy than average ({BENCHMARKS['energy_intensity']['average']} kWh/m²/month)",
-            "confidence": 0.8,
-            "estimated_kwh_impact": normalized.get("monthly_kWh", 0) * 0.1  # 10% potential reduction
-        })
-
-    return issues
-
-def audit(normalized: dict, max_findings: int = 5) -> dict:
+    # Sort by severity and impact, limit to max_findings
+    quantitative_issues.sort(key=lambda x: (
+        SEVERITY_WEIGHTS.get(x.get("severity", "low"), 1),
+        x.get("estimated_kwh_impact", 0)
+    ), reverse=True)
+
+    return quantitative_issues[:max_findings]
+
+
+def llm_gate(quantitative_issues: list, max_findings: int, priority: str | None = None) -> dict:
     """
-    Analyze a normalized input dictionary for inefficiencies using an LLM.
-    Returns a dictionary with a 'findings' key containing up to max_findings inefficiencies.
+    Decide how many findings to ask the LLM for, given the rule findings.
+      - "skip": no LLM call. Rules fill every slot and none is below
+        AUDITOR_GATE_MIN_CONFIDENCE (default 0.75), or the tier cap is 0.
+      - "downsize": fewer findings requested than free slots: only as many as
+        there are weak rule findings to replace, at most 1 once the rules
+        span AUDITOR_GATE_COVERAGE_AREAS (default 3) areas, and at most
+        AUDITOR_GATE_MAX_<TIER> (e.g. AUDITOR_GATE_MAX_INTERACTIVE, unset = no cap).
+      - "full": every free slot, as before.
+    AUDITOR_GATE=0 always gives "full".
+    """
+    free = max(max_findings - len(quantitative_issues), 0)
+    min_conf = env_float("AUDITOR_GATE_MIN_CONFIDENCE", 0.75)
+    weak = [f for f in quantitative_issues if float(f.get("confidence", 0.5)) < min_conf]
+    areas = sorted({str(f.get("area")) for f in quantitative_issues})
+    tier = (priority or current_priority()).lower()
+    gate = {
+        "decision": "full",
+        "requested": free,
+        "free_slots": free,
+        "rule_findings": len(quantitative_issues),
+        "weak_rule_findings": len(weak),
+        "areas_covered": areas,
+        "tier": tier,
+        "reason": "",
+    }
+    if not env_flag("AUDITOR_GATE", True):
+        return gate
+
+    requested, reasons = free, []
+    if free == 0:
+        requested = len(weak)
+        reasons.append(
+            f"{len(weak)} rule findings below confidence {min_conf:g} may be replaced" if weak
+            else f"rule findings fill all {max_findings} slots with confidence >= {min_conf:g}"
+        )
+    elif len(areas) >= env_int("AUDITOR_GATE_COVERAGE_AREAS", 3) and requested > 1:
+        requested = 1
+        reasons.append(f"rule findings already cover {len(areas)} areas")
+    cap = env_int(f"AUDITOR_GATE_MAX_{tier.upper()}", -1)
+    if 0 <= cap < requested:
+        requested = cap
+        reasons.append(f"{tier} tier caps the LLM at {cap} findings")
+
+    gate["requested"] = requested
+    gate["reason"] = "; ".join(reasons)
+    if requested == 0:
+        gate["decision"] = "skip"
+    elif requested < free or free == 0:
+        gate["decision"] = "downsize"
+    return gate
+
+
+def _build_user_prompt(normalized, quantitative_issues: list, max_findings: int, requested: int | None = None) -> str:
+    energy_intensity = _calculate_energy_intensity(normalized)
+    benchmarks = get_rule_pack().benchmarks
+    peers = _peer_benchmark(normalized)
+    # Only the LLM needs the building as a plain dict.
+    normalized = without_profile(_as_dict(normalized))
+    context = {
+        "energy_intensity_kwh_per_m2": round(energy_intensity, 2),
+        "quantitative_findings_count": len(quantitative_issues),
+        "benchmarks": benchmarks
+    }
+    if peers is not None:
+        context["peer_benchmark"] = peers
 
-    Args:
-        normalized (dict): The normalized input data to audit.
-        max_findings (int, optional): Maximum number of inefficiencies to list. Defaults to 5.
+    if compaction_enabled():
+        # Grouped devices, rounded numbers and only the benchmarks that apply.
+        context["benchmarks"] = relevant_benchmarks(
+            benchmarks, normalized, {f.get("area") for f in quantitative_issues}
+        )
+        jp = compact_json(compact_building(normalized))
+        context_jp = compact_json(context)
+    else:
+        jp = json.dumps(normalized, ensure_ascii=False)
+        context_jp = json.dumps(context, ensure_ascii=False)
 
-    Returns:
-        dict: The LLM's response with identified inefficiencies under the 'findings' key.
+    return (
+        f"Analyze this building for energy inefficiencies with the provided context.\n"
+        f"Building Data:\n{jp}\n\n"
+        f"Analysis Context:\n{context_jp}\n\n"
+        f"Focus on areas not covered by quantitative analysis. "
+        f"Provide {max_findings - len(quantitative_issues) if requested is None else requested} additional findings if applicable.\n"
+        'Return JSON with key "findings".'
+    )
+
+
+def _merge_llm_findings(normalized, quantitative_issues: list, llm_result: dict, max_findings: int) -> dict:
+    energy_intensity = _calculate_energy_intensity(normalized)
+
+    # Combine quantitative and LLM findings
+    all_findings = quantitative_issues.copy()
+
+    if "findings" in llm_result:
+        for finding in llm_result["findings"]:
+            # Add confidence and impact estimates to LLM findings
+            finding["confidence"] = finding.get("confidence", 0.7)
+            finding["estimated_kwh_impact"] = finding.get("estimated_kwh_impact", 0)
+            all_findings.append(finding)
+
+    # Final sort and limit
+    all_findings.sort(key=lambda x: (
+        SEVERITY_WEIGHTS.get(x.get("severity", "low"), 1),
+        x.get("confidence", 0.5),
+        x.get("estimated_kwh_impact", 0)
+    ), reverse=True)
+
+    return {
+        "findings": all_findings[:max_findings],
+        "analysis_summary": _with_peers({
+            "energy_intensity_kwh_per_m2": round(energy_intensity, 2),
+            "total_potential_monthly_savings_kwh": round(sum(f.get("estimated_kwh_impact", 0) for f in all_findings[:max_findings]), 2),
+            "quantitative_findings": len(quantitative_issues),
+            "llm_findings": len(llm_result.get("findings", []))
+        }, normalized)
+    }
+
+
+def _quantitative_only(normalized, quantitative_issues: list, warning: str, degraded: bool = False) -> dict:
+    # Fallback to quantitative analysis only
+    out = {
+        "findings": quantitative_issues,
+        "analysis_summary": _with_peers({
+            "energy_intensity_kwh_per_m2": round(_calculate_energy_intensity(normalized), 2),
+            "total_potential_monthly_savings_kwh": round(sum(f.get("estimated_kwh_impact", 0) for f in quantitative_issues), 2),
+            "quantitative_findings": len(quantitative_issues),
+            "llm_findings": 0
+        }, normalized),
+        "warning": warning
+    }
+    if degraded:
+        out["degraded"] = True
+    return out
+
+
+def _degraded(normalized, quantitative_issues: list, deadline: Deadline | None, e: LLMError) -> dict:
+    if deadline is not None:
+        deadline.mark_degraded("auditor", str(e))
+    return _quantitative_only(
+        normalized, quantitative_issues,
+        f"LLM analysis unavailable, using quantitative analysis only: {e}",
+        degraded=True,
+    )
+
+
+def _with_gate(out: dict, gate: dict) -> dict:
+    """Record the llm_gate() decision in analysis_summary."""
+    out.setdefault("analysis_summary", {})["llm_gate"] = gate
+    return out
+
+
+def _stage_timeout(deadline: Deadline | None):
+    return deadline.stage_timeout("auditor") if deadline is not None else None
+
+
+def _prepare(normalized, max_findings: int):
+    """
+    Returns (normalized, system_prompt, quantitative_issues, error_dict).
+    A NormalizedInput is kept as is: the rules read its fields directly and
+    it is turned into a dict only if the LLM is called.
     """
     try:
         system_prompt = PROMPT_PATH.read_text(encoding="utf-8")
     except Exception as e:
-        return {"error": f"Failed to read system prompt: {e}"}
+        return None, None, None, {"error": f"Failed to read system prompt: {e}"}
 
-    # Perform quantitative analysis first
-    quantitative_issues = []
+    if hasattr(normalized, "model_dump"):
+        if normalized.profile is None:
+            normalized = normalized.model_copy(update={"profile": building_profile(normalized)})
+    else:
+        normalized = normalized or {}
+        if "profile" not in normalized:
+            normalized = {**normalized, "profile": building_profile(normalized).model_dump()}
 
+    # Perform quantitative analysis first
     try:
-        # Analyze AC efficiency
-        ac_units = normalized.get("ac_units", [])
-        quantitative_issues.extend(_analyze_ac_efficiency(ac_units))
+        quantitative_issues = _rule_findings(normalized, max_findings)
+    except Exception as e:
+        return None, None, None, {"error": f"Failed during quantitative analysis: {e}"}
 
-        # Analyze lighting efficiency
-        lighting = normalized.get("lighting", {})
-        quantitative_issues.extend(_analyze_lighting_efficiency(lighting))
+    if peer_recording_enabled():
+        record_observation(
+            peer_index_dir(), field_of(normalized, "building_type", None),
+            field_of(normalized, "floor_area_m2"), field_of(normalized, "monthly_kWh"),
+        )
 
-        # Analyze overall efficiency
-        quantitative_issues.extend(_analyze_overall_efficiency(normalized))
+    return normalized, system_prompt, quantitative_issues, None
 
-        # Analyze usage patterns
-        quantitative_issues.extend(_analyze_usage_patterns(normalized))
 
-    except Exception as e:
-        return {"error": f"Failed during quantitative analysis: {e}"}
+def audit(normalized: dict, max_findings: int = 5, deadline: Deadline | None = None, on_rules=None) -> dict:
+    """
+    Analyze a normalized input dictionary for inefficiencies using an LLM.
+    Returns a dictionary with a 'findings' key containing up to max_findings inefficiencies.
 
-    # Sort by severity and impact, limit to max_findings
-    severity_weights = {"high": 3, "med": 2, "low": 1}
-    quantitative_issues.sort(key=lambda x: (
-        severity_weights.get(x.get("severity", "low"), 1),
-        x.get("estimated_kwh_impact", 0)
-    ), reverse=True)
+    Args:
+        normalized (dict): The normalized input data to audit (a NormalizedInput is accepted too).
+        max_findings (int, optional): Maximum number of inefficiencies to list. Defaults to 5.
+        deadline (Deadline, optional): Request deadline; defaults to the one of the current run.
+            When the auditor budget runs out (or the LLM fails) the quantitative
+            findings are returned with "degraded": True.
+        The LLM call is skipped or asks for fewer findings when the rule findings
+        already suffice (see llm_gate); analysis_summary["llm_gate"] records why.
+        on_rules (callable, optional): Called with the rule-only result just before
+            the LLM call (not at all when the call is skipped), so a caller can
+            start on it while the LLM runs.
 
-    quantitative_issues = quantitative_issues[:max_findings]
+    Returns:
+        dict: The LLM's response with identified inefficiencies under the 'findings' key.
+    """
+    deadline = deadline or current_deadline()
+    normalized, system_prompt, quantitative_issues, error = _prepare(normalized, max_findings)
+    if error:
+        return error
+    gate = llm_gate(quantitative_issues, max_findings)
+    if gate["decision"] == "skip":
+        return _with_gate(_merge_llm_findings(normalized, quantitative_issues, {}, max_findings), gate)
+    if on_rules is not None:
+        on_rules(_with_gate(_merge_llm_findings(normalized, quantitative_issues, {}, max_findings), dict(gate)))
 
     # Enhanced LLM analysis with quantitative context
     try:
-        energy_intensity = _calculate_energy_intensity(normalized)
-        context = {
-            "energy_intensity_kwh_per_m2": round(energy_intensity, 2),
-            "quantitative_findings_count": len(quantitative_issues),
-            "benchmarks": BENCHMARKS
-        }
-
-        jp = json.dumps(normalized, ensure_ascii=False)
-        context_jp = json.dumps(context, ensure_ascii=False)
-
-        user_prompt = (
-            f"Analyze this building for energy inefficiencies with the provided context.\n"
-            f"Building Data:\n{jp}\n\n"
-            f"Analysis Context:\n{context_jp}\n\n"
-            f"Focus on areas not covered by quantitative analysis. "
-            f"Provide {max_findings - len(quantitative_issues)} additional findings if applicable.\n"
-            'Return JSON with key "findings".'
+        user_prompt = _build_user_prompt(normalized, quantitative_issues, max_findings, gate["requested"])
+        llm_result = call_json(
+            system_prompt, user_prompt, timeout=_stage_timeout(deadline), raise_on_error=True,
+            stage="auditor", schema=AUDIT_WIRE,
+        )
+        return _with_gate(_merge_llm_findings(normalized, quantitative_issues, llm_result, max_findings), gate)
+    except RequestCancelled:
+        raise
+    except LLMError as e:
+        return _with_gate(_degraded(normalized, quantitative_issues, deadline, e), gate)
+    except Exception as e:
+        return _with_gate(
+            _quantitative_only(normalized, quantitative_issues, f"LLM analysis failed, using quantitative analysis only: {e}"),
+            gate,
         )
 
-        llm_result = call_json(system_prompt, user_prompt)
-
-        # Combine quantitative and LLM findings
-        all_findings = quantitative_issues.copy()
-
-        if "findings" in llm_result:
-            for finding in llm_result["findings"]:
-                # Add confidence and impact estimates to LLM findings
-                finding["confidence"] = finding.get("confidence", 0.7)
-                finding["estimated_kwh_impact"] = finding.get("estimated_kwh_impact", 0)
-                all_findings.append(finding)
-
-        # Final sort and limit
-        all_findings.sort(key=lambda x: (
-            severity_weights.get(x.get("severity", "low"), 1),
-            x.get("confidence", 0.5),
-            x.get("estimated_kwh_impact", 0)
-        ), reverse=True)
-
-        return {
-            "findings": all_findings[:max_findings],
-            "analysis_summary": {
-                "energy_intensity_kwh_per_m2": round(energy_intensity, 2),
-                "total_potential_monthly_savings_kwh": round(sum(f.get("estimated_kwh_impact", 0) for f in all_findings[:max_findings]), 2),
-                "quantitative_findings": len(quantitative_issues),
-                "llm_findings": len(llm_result.get("findings", []))
-            }
-        }
 
+async def audit_async(normalized: dict, max_findings: int = 5, deadline: Deadline | None = None, on_rules=None) -> dict:
+    """Asyncio variant of audit(); awaits the LLM call instead of blocking a thread."""
+    deadline = deadline or current_deadline()
+    normalized, system_prompt, quantitative_issues, error = _prepare(normalized, max_findings)
+    if error:
+        return error
+    gate = llm_gate(quantitative_issues, max_findings)
+    if gate["decision"] == "skip":
+        return _with_gate(_merge_llm_findings(normalized, quantitative_issues, {}, max_findings), gate)
+    if on_rules is not None:
+        on_rules(_with_gate(_merge_llm_findings(normalized, quantitative_issues, {}, max_findings), dict(gate)))
+
+    try:
+        user_prompt = _build_user_prompt(normalized, quantitative_issues, max_findings, gate["requested"])
+        llm_result = await call_json_async(
+            system_prompt, user_prompt, timeout=_stage_timeout(deadline), raise_on_error=True,
+            stage="auditor", schema=AUDIT_WIRE,
+        )
+        return _with_gate(_merge_llm_findings(normalized, quantitative_issues, llm_result, max_findings), gate)
+    except RequestCancelled:
+        raise
+    except LLMError as e:
+        return _with_gate(_degraded(normalized, quantitative_issues, deadline, e), gate)
     except Exception as e:
-        # Fallback to quantitative analysis only
-        return {
-            "findings": quantitative_issues,
-            "analysis_summary": {
-                "energy_intensity_kwh_per_m2": round(_calculate_energy_intensity(normalized), 2),
-                "total_potential_monthly_savings_kwh": round(sum(f.get("estimated_kwh_impact", 0) for f in quantitative_issues), 2),
-                "quantitative_findings": len(quantitative_issues),
-                "llm_findings": 0
-            },
-            "warning": f"LLM analysis failed, using quantitative analysis only: {e}"
-        }
+        return _with_gate(
+            _quantitative_only(normalized, quantitative_issues, f"LLM analysis failed, using quantitative analysis only: {e}"),
+            gate,
+        )
@@ -3,6 +3,8 @@ from typing import Dict, Any, List, Tuple
 from math import isfinite
 
 from utils.yaml_loader import load_defaults
+from utils.savings import kwh_saved_per_month
+from utils.profile import profile_of
 from utils.models import NormalizedInput, Recommendations, Recommendation, ImpactAction, ImpactTotals, ImpactPlan
 
 def _num(x, default=0.0) -> float:
@@ -13,15 +15,6 @@ def _num(x, default=0.0) -> float:
         return default
 
 
-def _est_kwh_saved_per_month(rec: Recommendation, baseline_kwh: float) -> float:
-    if rec.kwh_saved_per_month is not None:
-        return max(_num(rec.kwh_saved_per_month, 0.0), 0.0)
-
-    pct_min = max(_num(rec.pct_kwh_reduction_min, 0.0), 0.0)
-    pct_min = min(pct_min, 100.0)
-    return baseline_kwh * (pct_min / 100.0)
-
-
 def _monthly_savings_LKR(kwh_saved: float, tariff: float) -> float:
     return max(kwh_saved * max(tariff, 0.0), 0.0)
 
@@ -35,7 +28,7 @@ def _payback_months(cost_LKR: float, monthly_savings_LKR: float, fallback: float
 
 
 def _mk_action(rec: Recommendation, baseline_kwh: float, tariff: float, ef_kg_per_kwh: float) -> ImpactAction:
-    kwh = _est_kwh_saved_per_month(rec, baseline_kwh)
+    kwh = kwh_saved_per_month(rec, baseline_kwh)
     lkr = _monthly_savings_LKR(kwh, tariff)
     co2 = max(kwh * max(ef_kg_per_kwh, 0.0), 0.0)
     cost = max(_num(rec.est_cost, 0.0), 0.0)
@@ -98,6 +91,12 @@ def estimate_impact(normalized: NormalizedInput, recs: Recommendations) -> Impac
     lines.append(f"- Estimated monthly savings: **{round(totals.LKR_saved_per_month, 2):,} LKR**")
     lines.append(f"- Energy reduction: **{round(totals.kWh_saved_per_month, 2):,} kWh/mo** (~{round(achieved_pct_kwh, 1)}%)")
     lines.append(f"- CO₂ reduction: **{round(totals.co2_kg_saved_per_month, 2):,} kgCO₂/mo** (~{round(achieved_pct_co2, 1)}%)")
+    if baseline_kwh > 0:
+        profile = profile_of(normalized)
+        lines.append(
+            f"- Where the energy goes: AC ~{round(profile.ac_share * 100, 1)}%,"
+            f" lighting ~{round(profile.lighting_share * 100, 1)}%, other ~{round(profile.other_share * 100, 1)}%"
+        )
 
     if quick_wins:
         lines.append("\n**Quick wins (low cost / fast payback):**")
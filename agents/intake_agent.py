@@ -4,6 +4,8 @@ from typing import Any, Dict, Optional
 
 from utils.guardrails import clamp_hours, clamp_watts, clamp_count, clamp_kwh, clamp_disruption
 from utils.models import PolicyGoals
+from utils.profile import building_profile
+from utils.peer_index import building_type_key
 
 DEFAULTS_PATH = Path(__file__).resolve().parent.parent / "data" / "defaults.yaml"
 
@@ -133,5 +135,7 @@ def normalize(input_payload: dict) -> dict:
         "tariff_LKR_per_kWh": tariff,
         "monthly_kWh": monthly_kwh,
         "policy": policy_obj.model_dump() if policy_obj else None,
+        "building_type": building_type_key(input_payload.get("building_type")),
     }
+    data["profile"] = building_profile(data).model_dump()
     return data
\ No newline at end of file
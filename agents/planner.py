@@ -1,10 +1,12 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 
-from agents.planner_types import PlanStep, ActStep, CheckStep
+from agents.planner_types import PlanStep, ActStep, AsyncActStep, CheckStep
 from agents.steps.plan_default import default_plan_step
-from agents.steps.act_full_pipeline import act_full_pipeline
+from agents.steps.act_full_pipeline import act_full_pipeline, act_full_pipeline_async
 from agents.steps.check_default import check_against_criteria
+from utils.deadline import current_deadline
 
 def _deep_merge(base: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
     out = dict(base)
@@ -22,11 +24,16 @@ class TinyPlanner:
         plan_step: PlanStep = default_plan_step,
         act_step: ActStep = act_full_pipeline,
         check_step: CheckStep = check_against_criteria,
+        act_step_async: Optional[AsyncActStep] = None,
     ):
         self.max_iters = max(1, min(max_iters, 3))
         self.plan_step = plan_step
         self.act_step = act_step
         self.check_step = check_step
+        # A custom sync act_step without an async twin runs in a worker thread.
+        if act_step_async is None and act_step is act_full_pipeline:
+            act_step_async = act_full_pipeline_async
+        self.act_step_async = act_step_async
 
     def plan(self, raw_payload: Dict[str, Any]) -> Dict[str, Any]:
         return self.plan_step(raw_payload)
@@ -34,27 +41,84 @@ class TinyPlanner:
     def act(self, plan: Dict[str, Any]) -> Dict[str, Any]:
         return self.act_step(plan)
 
+    async def act_async(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        if self.act_step_async is not None:
+            return await self.act_step_async(plan)
+        return await asyncio.to_thread(self.act_step, plan)
+
     def check(self, result: Dict[str, Any], criteria: Dict[str, Any]):
         return self.check_step(result, criteria)
 
+    def _record(
+        self, attempts: List[Dict[str, Any]], i: int, plan: Dict[str, Any], result: Dict[str, Any]
+    ) -> Tuple[bool, Dict[str, Any]]:
+        ok, reason, patch = self.check(result, plan.get("criteria", {}))
+        attempts.append(
+            {
+                "attempt": i + 1,
+                "plan": plan,
+                "ok": ok,
+                "reason": reason,
+                "patch_applied_next": bool(patch) and not ok and (i + 1) < self.max_iters,
+            }
+        )
+        return ok, patch
+
+    @staticmethod
+    def _check_cancelled() -> None:
+        """A cancelled run stops here: the remaining iterations are counted as skipped."""
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.raise_if_cancelled("planner iteration", kind="planner_iterations_skipped")
+
+    @staticmethod
+    def _out_of_time(attempts: List[Dict[str, Any]]) -> bool:
+        """Skip retries once the request deadline has passed; the last result stands."""
+        deadline = current_deadline()
+        if deadline is None or not deadline.expired():
+            return False
+        if attempts:
+            attempts[-1]["patch_applied_next"] = False
+            attempts[-1]["reason"] += " (no retry: request deadline reached)"
+        return True
+
     def run(self, raw_payload: Dict[str, Any]) -> Dict[str, Any]:
         attempts: List[Dict[str, Any]] = []
         last_result: Optional[Dict[str, Any]] = None
         payload = dict(raw_payload)
 
         for i in range(self.max_iters):
+            if i > 0:
+                self._check_cancelled()
+                if self._out_of_time(attempts):
+                    break
             plan = self.plan(payload)
             result = self.act(plan)
-            ok, reason, patch = self.check(result, plan.get("criteria", {}))
-            attempts.append(
-                {
-                    "attempt": i + 1,
-                    "plan": plan,
-                    "ok": ok,
-                    "reason": reason,
-                    "patch_applied_next": bool(patch) and not ok and (i + 1) < self.max_iters,
-                }
-            )
+            ok, patch = self._record(attempts, i, plan, result)
+            last_result = result
+            if ok:
+                break
+            if patch:
+                payload = _deep_merge(payload, patch)
+
+        return {
+            "planner_trace": attempts,
+            "final": last_result,
+        }
+
+    async def run_async(self, raw_payload: Dict[str, Any]) -> Dict[str, Any]:
+        attempts: List[Dict[str, Any]] = []
+        last_result: Optional[Dict[str, Any]] = None
+        payload = dict(raw_payload)
+
+        for i in range(self.max_iters):
+            if i > 0:
+                self._check_cancelled()
+                if self._out_of_time(attempts):
+                    break
+            plan = self.plan(payload)
+            result = await self.act_async(plan)
+            ok, patch = self._record(attempts, i, plan, result)
             last_result = result
             if ok:
                 break
@@ -1,6 +1,6 @@
 # agents/planner_types.py
 from __future__ import annotations
-from typing import Any, Dict, Protocol, Tuple
+from typing import Any, Awaitable, Dict, Protocol, Tuple
 
 class PlanStep(Protocol):
     def __call__(self, raw_payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -10,6 +10,10 @@ class ActStep(Protocol):
     def __call__(self, plan: Dict[str, Any]) -> Dict[str, Any]:
         ...
 
+class AsyncActStep(Protocol):
+    def __call__(self, plan: Dict[str, Any]) -> Awaitable[Dict[str, Any]]:
+        ...
+
 class CheckStep(Protocol):
     def __call__(self, result: Dict[str, Any], criteria: Dict[str, Any]) -> Tuple[bool, str, Dict[str, Any]]:
         """
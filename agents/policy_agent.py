@@ -3,6 +3,8 @@ from __future__ import annotations
 from typing import Dict, Any, List, Tuple
 from math import isfinite
 
+from utils.savings import kwh_saved_per_month
+
 
 def _num(x, default=0.0) -> float:
     try:
@@ -21,15 +23,8 @@ def _disruption_ok(action_level: str | None, max_level: str | None) -> bool:
     return a <= m
 
 
-def _est_kwh_saved(action: Dict[str, Any], baseline_kwh: float) -> float:
-    if action.get("kwh_saved_per_month") is not None:
-        return max(_num(action.get("kwh_saved_per_month"), 0.0), 0.0)
-    pct = max(min(_num(action.get("pct_kwh_reduction_min"), 0.0), 100.0), 0.0)
-    return baseline_kwh * (pct / 100.0)
-
-
 def _monthly_savings_LKR(action: Dict[str, Any], baseline_kwh: float, tariff: float) -> float:
-    return _est_kwh_saved(action, baseline_kwh) * max(tariff, 0.0)
+    return kwh_saved_per_month(action, baseline_kwh) * max(tariff, 0.0)
 
 
 def _payback_months(action: Dict[str, Any], baseline_kwh: float, tariff: float) -> float | None:
@@ -42,7 +37,7 @@ def _payback_months(action: Dict[str, Any], baseline_kwh: float, tariff: float)
 
 def _value_per_lkr(action: Dict[str, Any], baseline_kwh: float) -> float:
     capex = max(_num(action.get("est_cost"), 0.0), 0.0)
-    kwh = _est_kwh_saved(action, baseline_kwh)
+    kwh = kwh_saved_per_month(action, baseline_kwh)
     if capex <= 0:
         return 1e12 if kwh > 0 else 0.0
     return kwh / capex
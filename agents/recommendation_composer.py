@@ -1,10 +1,29 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+import asyncio
+import contextvars
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+from utils.env import env_flag
 from utils.models import NormalizedInput, AuditResult, Recommendations, Recommendation
-from utils.llm import call_json
+from utils.llm import (
+    LLMError, attach_llm_calls, await_cancellable, call_json, call_json_async, call_json_stream_async,
+    current_priority, llm_priority, record_llm_calls,
+)
 from utils.constraints import apply_policy
+from utils.deadline import Deadline, RequestCancelled, check_cancelled, current_deadline, shared_deadline, use_deadline
+from utils.wire_schema import RECOMMENDATIONS_WIRE
+from utils.yaml_loader import load_defaults
+from utils.profile import profile_of
+from utils.compaction import compaction_enabled, drop_empty, group_devices, round_numbers
+from utils.microbatch import MicroBatcher, composer_batch_settings, composer_batching_enabled
+from utils.similarity_cache import building_signature, get_similarity_cache, rescalable, signature_key
+from utils.llm_backends import get_router
+from agents.impact_estimator import estimate_impact
 
 def _fmt(v: Any, default_str: str) -> str:
     if v is None:
@@ -86,12 +105,84 @@ def _shape_recommendations(obj: Dict[str, Any]) -> Recommendations:
     return Recommendations(recommendations=cleaned)
 
 
+def _rule_based_recommendations(normalized: NormalizedInput, findings: AuditResult) -> Recommendations:
+    """
+    Deterministic fallback used when the composer LLM is unavailable or out of time:
+    one conservative, well-known action per finding area.
+    """
+    defs = load_defaults()
+    lig_defs = defs.get("lighting") or {}
+    ac_defs = defs.get("ac") or {}
+    baseline = max(normalized.monthly_kWh or 0.0, 0.0)
+    areas = {f.area for f in (findings.findings or [])}
 
-def compose_recommendations(normalized: NormalizedInput, findings: AuditResult) -> Recommendations:
-    sys_prompt = _build_system_prompt(
-        policy=normalized.policy.model_dump() if normalized.policy else None
-    )
-    user_payload: Dict[str, Any] = {
+    recs: List[Recommendation] = []
+    lighting = normalized.lighting
+    led_watt = float(lig_defs.get("led_watt_per_bulb", 8))
+    if "lighting" in areas and lighting and lighting.bulbs > 0 and lighting.watt_per_bulb > led_watt:
+        kwh = (lighting.watt_per_bulb - led_watt) * lighting.bulbs * lighting.hours_per_day * 30 / 1000
+        pct = min(kwh / baseline * 100, 100.0) if baseline > 0 else 0.0
+        recs.append(Recommendation(
+            action="Replace bulbs with LEDs",
+            steps=["Count existing bulbs by fitting type", f"Buy {led_watt:g}W LED equivalents", "Replace the most-used fittings first"],
+            pct_kwh_reduction_min=round(pct * 0.8, 2),
+            pct_kwh_reduction_max=round(pct, 2),
+            est_cost=float(lig_defs.get("bulb_cost_LKR", 500)) * lighting.bulbs,
+            notes="Rule-based estimate (LLM unavailable).",
+            disruption="low",
+        ))
+    if "AC" in areas:
+        per_degree = float(ac_defs.get("setpoint_savings_per_degree_pct", 3))
+        ac_share = profile_of(normalized).ac_share
+        recs.append(Recommendation(
+            action="Raise AC setpoint to 24°C and clean filters",
+            steps=["Set thermostats to 24–25°C", "Clean or replace filters", "Close doors and windows while cooling"],
+            pct_kwh_reduction_min=round(ac_share * per_degree, 2),
+            pct_kwh_reduction_max=round(ac_share * per_degree * 2, 2),
+            est_cost=0.0,
+            notes="Rule-based estimate (LLM unavailable).",
+            disruption="low",
+        ))
+    if "envelope" in areas:
+        recs.append(Recommendation(
+            action="Reduce solar heat gain with shading or window film",
+            steps=["Identify sun-facing windows", "Fit external shading or solar control film", "Seal gaps around doors and windows"],
+            pct_kwh_reduction_min=3.0,
+            pct_kwh_reduction_max=8.0,
+            est_cost=25000.0,
+            notes="Rule-based estimate (LLM unavailable).",
+            disruption="medium",
+        ))
+    if "standby" in areas or "other" in areas:
+        recs.append(Recommendation(
+            action="Put always-on loads on timer plugs",
+            steps=["List devices left on overnight", "Fit timer or smart plugs", "Switch off at the wall when leaving"],
+            pct_kwh_reduction_min=1.0,
+            pct_kwh_reduction_max=3.0,
+            est_cost=3000.0,
+            notes="Rule-based estimate (LLM unavailable).",
+            disruption="none",
+        ))
+    return Recommendations(recommendations=recs)
+
+
+def _degraded(normalized: NormalizedInput, findings: AuditResult, deadline: Deadline | None, e: LLMError) -> Recommendations:
+    if deadline is not None:
+        deadline.mark_degraded("composer", str(e))
+    recs = _rule_based_recommendations(normalized, findings)
+    recs_filtered, report = apply_policy(recs, normalized)
+    report["notes"].append(f"Composer degraded to rule-based recommendations: {e}")
+    report["degraded"] = True
+    recs_filtered.policy_report = report
+    return recs_filtered
+
+
+def _stage_timeout(deadline: Deadline | None):
+    return deadline.stage_timeout("composer") if deadline is not None else None
+
+
+def _build_user_payload(normalized: NormalizedInput, findings: AuditResult) -> Dict[str, Any]:
+    payload = {
         "context": {
             "tariff_LKR_per_kWh": normalized.tariff_LKR_per_kWh,
             "monthly_kWh": normalized.monthly_kWh,
@@ -105,15 +196,474 @@ def compose_recommendations(normalized: NormalizedInput, findings: AuditResult)
         },
         "instructions": "Return exactly one JSON object as specified in the system prompt. No prose, no markdown.",
     }
-    raw: Dict[str, Any] = {}
-    try:
-        raw = call_json(system_text=sys_prompt, user_content=user_payload) or {}
-    except Exception:
-        raw = {}
+    if not compaction_enabled():
+        return payload
+    # The Streamlit form sends one dict per AC unit, often all identical.
+    payload["context"]["ac_units"] = group_devices(payload["context"]["ac_units"])
+    return drop_empty(round_numbers(payload))
+
 
+def _finish(raw: Dict[str, Any], normalized: NormalizedInput) -> Recommendations:
     recs = _shape_recommendations(raw)
     recs_filtered, report = apply_policy(recs, normalized)
     recs_filtered.policy_report = report
+    return recs_filtered
+
+
+def _similar_lookup(normalized: NormalizedInput, findings: AuditResult):
+    """
+    (cache, key, hit) for the similarity cache. A hit comes back without the
+    absolute kWh/payback fields, so the impact estimator rescales it to this
+    building's monthly_kWh and tariff; it is logged as a "similar" call record.
+    """
+    cache = get_similarity_cache()
+    if cache is None:
+        return None, None, None
+    router = get_router()
+    model = router.backends[router.route_for("composer").primary].model
+    key = signature_key(building_signature(normalized, findings), model)
+    cached = cache.get(key)
+    if cached is None:
+        return cache, key, None
+    attach_llm_calls([{"stage": "composer", "source": "similar", "queue_wait_s": 0.0, "latency_s": 0.0, "ok": True}])
+    return cache, key, rescalable(cached)
+
+
+def _similar_store(cache, key, raw: Dict[str, Any]) -> None:
+    if cache is not None and isinstance(raw, dict) and raw.get("recommendations"):
+        cache.put(key, raw)
+
+
+# Fan-out order; also the order in which area replies are merged.
+AREA_ORDER = ("lighting", "AC", "envelope", "standby", "other")
+
+
+def composer_fanout_enabled() -> bool:
+    """COMPOSER_FANOUT (default off): one concurrent composer call per finding area."""
+    return env_flag("COMPOSER_FANOUT", False)
+
+
+def _fanout_areas(findings: AuditResult) -> List[str]:
+    """Areas to fan out over, in AREA_ORDER; empty unless there are at least two."""
+    present = {f.area for f in (findings.findings or [])}
+    areas = [a for a in AREA_ORDER if a in present]
+    return areas if len(areas) > 1 else []
+
 
+def _area_suffix(area: str) -> str:
+    try:
+        with open(os.path.join("prompts", "composer_area.txt"), "r", encoding="utf-8") as f:
+            tmpl = f.read()
+    except Exception:
+        tmpl = '\n\nFOCUSED MODE: recommend at most 3 actions, only for the "{AREA}" findings.'
+    return tmpl.replace("{AREA}", area)
+
+
+def _area_findings(findings: AuditResult, area: str) -> AuditResult:
+    return AuditResult(findings=[f for f in (findings.findings or []) if f.area == area])
+
+
+_MENTIONS_AC = re.compile(r"\bAC\b|air[- ]?condition", re.IGNORECASE)
+_MENTIONS_LIGHTING = re.compile(r"\b(light|lights|lighting|bulbs?|lamps?)\b", re.IGNORECASE)
+
+
+def _mentions(findings: AuditResult, pattern: re.Pattern) -> bool:
+    return any(pattern.search(f"{f.issue} {f.reason}") for f in findings.findings or [])
+
+
+def _area_payload(normalized: NormalizedInput, findings: AuditResult, area: str) -> Dict[str, Any]:
+    """
+    The full payload cut down to one area's findings and the devices they
+    concern: an area's own devices, plus any its findings name ("other"
+    holds the near-continuous AC and extended lighting findings).
+    """
+    own = _area_findings(findings, area)
+    payload = _build_user_payload(normalized, own)
+    context = payload.get("context") or {}
+    if area != "AC" and not _mentions(own, _MENTIONS_AC):
+        context.pop("ac_units", None)
+    if area != "lighting" and not _mentions(own, _MENTIONS_LIGHTING):
+        context.pop("lighting", None)
+    return payload
+
+
+def _action_key(rec: Any) -> str:
+    action = rec.get("action") if isinstance(rec, dict) else None
+    return " ".join(re.findall(r"[a-z0-9]+", str(action or "").lower()))
+
+
+def _merge_area_replies(replies: List[Tuple[str, Any]]) -> Dict[str, Any]:
+    """
+    One reply from the per-area ones, taken in AREA_ORDER. An action whose
+    normalised title (lower case, punctuation dropped) was already seen is
+    dropped, so overlapping suggestions from two areas appear once.
+    """
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for _, raw in replies:
+        recs = raw.get("recommendations") if isinstance(raw, dict) else None
+        for rec in recs if isinstance(recs, list) else []:
+            key = _action_key(rec)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(rec)
+    return {"recommendations": merged}
+
+
+def _finish_fanout(
+    normalized: NormalizedInput, findings: AuditResult, deadline: Deadline | None,
+    replies: List[Tuple[str, Any]], cache, key,
+) -> Recommendations:
+    """
+    Merge the per-area replies. An area whose call failed gets the rule-based
+    actions for its findings instead and the result is marked degraded; only
+    a fully answered fan-out is stored in the similarity cache.
+    """
+    failed = [(area, raw) for area, raw in replies if isinstance(raw, LLMError)]
+    merged = _merge_area_replies([(a, r) for a, r in replies if not isinstance(r, LLMError)])
+    if not failed:
+        _similar_store(cache, key, merged)
+        return _finish(merged, normalized)
+
+    fallback = _rule_based_recommendations(
+        normalized, AuditResult(findings=[f for area, _ in failed for f in _area_findings(findings, area).findings])
+    )
+    merged = _merge_area_replies([("", merged), ("", {"recommendations": [r.model_dump() for r in fallback.recommendations]})])
+    detail = "; ".join(f"{area}: {e}" for area, e in failed)
+    if deadline is not None:
+        deadline.mark_degraded("composer", detail)
+    recs_filtered, report = apply_policy(_shape_recommendations(merged), normalized)
+    report["notes"].append(f"Composer degraded to rule-based recommendations for {', '.join(a for a, _ in failed)}: {detail}")
+    report["degraded"] = True
+    recs_filtered.policy_report = report
     return recs_filtered
 
+
+def _compose_area_sync(sys_prompt: str, payload: Dict[str, Any], timeout: Optional[float]) -> Any:
+    try:
+        return call_json(
+            system_text=sys_prompt, user_content=payload,
+            timeout=timeout, raise_on_error=True,
+            stage="composer_area", schema=RECOMMENDATIONS_WIRE,
+        ) or {}
+    except RequestCancelled:
+        raise
+    except LLMError as e:
+        return e
+    except Exception:
+        return {}
+
+
+def _compose_fanout(
+    normalized: NormalizedInput, findings: AuditResult, deadline: Deadline | None,
+    sys_prompt: str, areas: List[str], cache, key,
+) -> Recommendations:
+    timeout = _stage_timeout(deadline)
+    jobs = [(sys_prompt + _area_suffix(a), _area_payload(normalized, findings, a), timeout) for a in areas]
+    # Each thread runs in a copy of this context so call records and the deadline follow it.
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _compose_area_sync, *job) for job in jobs]
+        replies = [f.result() for f in futures]
+    return _finish_fanout(normalized, findings, deadline, list(zip(areas, replies)), cache, key)
+
+
+def compose_recommendations(
+    normalized: NormalizedInput, findings: AuditResult, deadline: Deadline | None = None
+) -> Recommendations:
+    """
+    Compose recommendations with the LLM, then apply the policy. With
+    COMPOSER_SIMILARITY_CACHE=1 a building with the same quantised profile
+    as an earlier one reuses its recommendations without an LLM call. With
+    COMPOSER_FANOUT=1 and findings in two or more areas, each area gets its
+    own smaller composer call, run concurrently and merged.
+    """
+    deadline = deadline or current_deadline()
+    cache, key, similar = _similar_lookup(normalized, findings)
+    if similar is not None:
+        return _finish(similar, normalized)
+    sys_prompt = _build_system_prompt(
+        policy=normalized.policy.model_dump() if normalized.policy else None
+    )
+    areas = _fanout_areas(findings) if composer_fanout_enabled() else []
+    if areas:
+        return _compose_fanout(normalized, findings, deadline, sys_prompt, areas, cache, key)
+    user_payload = _build_user_payload(normalized, findings)
+    raw: Dict[str, Any] = {}
+    try:
+        raw = call_json(
+            system_text=sys_prompt, user_content=user_payload,
+            timeout=_stage_timeout(deadline), raise_on_error=True,
+            stage="composer", schema=RECOMMENDATIONS_WIRE,
+        ) or {}
+        _similar_store(cache, key, raw)
+    except RequestCancelled:
+        raise
+    except LLMError as e:
+        return _degraded(normalized, findings, deadline, e)
+    except Exception:
+        raw = {}
+
+    return _finish(raw, normalized)
+
+
+def _batch_suffix() -> str:
+    try:
+        with open(os.path.join("prompts", "composer_batch.txt"), "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception:
+        return '\n\nBATCH MODE: reply {"results": {"<id>": {"recommendations": [...]}}} with one entry per building id.'
+
+
+async def _compose_area(sys_prompt: str, payload: Dict[str, Any], timeout: Optional[float]) -> Any:
+    try:
+        return await call_json_async(
+            system_text=sys_prompt, user_content=payload,
+            timeout=timeout, raise_on_error=True,
+            stage="composer_area", schema=RECOMMENDATIONS_WIRE,
+        ) or {}
+    except RequestCancelled:
+        raise
+    except LLMError as e:
+        return e
+    except Exception:
+        return {}
+
+
+async def _compose_one(sys_prompt: str, user_payload: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+    return await call_json_async(
+        system_text=sys_prompt, user_content=user_payload,
+        timeout=timeout, raise_on_error=True,
+        stage="composer", schema=RECOMMENDATIONS_WIRE,
+    ) or {}
+
+
+def _split_batch(raw: Any, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Per-building replies from a merged one; ids with no usable entry are left out."""
+    results = raw.get("results") if isinstance(raw, dict) else None
+    if not isinstance(results, dict):
+        return {}
+    out: Dict[str, Dict[str, Any]] = {}
+    for bid in ids:
+        sub = results.get(bid)
+        if isinstance(sub, list):
+            sub = {"recommendations": sub}
+        if isinstance(sub, dict) and isinstance(sub.get("recommendations"), list):
+            out[bid] = sub
+    return out
+
+
+def _shared(calls: List[Dict[str, Any]], n: int) -> List[Dict[str, Any]]:
+    """A batch call's records as seen by one of its n callers: tokens prorated."""
+    out = []
+    for c in calls:
+        c = dict(c, shared_by=n)
+        for k in ("prompt_tokens", "completion_tokens"):
+            if k in c:
+                c[k] = round(c[k] / n)
+        out.append(c)
+    return out
+
+
+# A queued building: (user payload, monotonic time its composer budget runs out or None, its run's deadline).
+BatchItem = Tuple[Dict[str, Any], Optional[float], Optional[Deadline]]
+
+
+def _left(expires_at: Optional[float]) -> Optional[float]:
+    return None if expires_at is None else max(expires_at - time.monotonic(), 0.0)
+
+
+async def _run_composer_batch(group: Tuple[str, str], items: List[BatchItem]) -> List[Any]:
+    """
+    MicroBatcher callback: one composer call for every building in `items`
+    (all sharing the priority and system prompt in `group`), replies keyed
+    by building id. Buildings the merged reply does not cover (or the whole
+    batch, if the call fails or its reply does not parse) are retried with
+    their own composer call, given only what is left of their own budget.
+    The batch runs at the callers' priority under a deadline that is
+    cancelled once every caller's run is. Each result is (raw reply or
+    exception, call records for that caller).
+    """
+    priority, sys_prompt = group
+    with llm_priority(priority), shared_deadline(d for _, _, d in items):
+        return await _compose_batch_items(sys_prompt, items)
+
+
+async def _compose_batch_items(sys_prompt: str, items: List[BatchItem]) -> List[Any]:
+    ids = [f"b{i}" for i in range(len(items))]
+    merged: Dict[str, Dict[str, Any]] = {}
+    shared: List[Dict[str, Any]] = []
+    if len(items) > 1:
+        lefts = [t for t in (_left(e) for _, e, _ in items) if t is not None]
+        buildings = {bid: {k: v for k, v in payload.items() if k != "instructions"} for bid, (payload, _, _) in zip(ids, items)}
+        with record_llm_calls() as calls:
+            try:
+                raw = await await_cancellable(call_json_async(
+                    system_text=sys_prompt + _batch_suffix(), user_content={"buildings": buildings},
+                    timeout=min(lefts) if lefts else None, raise_on_error=True, stage="composer_batch",
+                ), "composer_batch")
+                merged = _split_batch(raw, ids)
+            except (LLMError, RequestCancelled):
+                merged = {}
+        shared = _shared(calls, len(items))
+
+    async def _fallback(payload: Dict[str, Any], expires_at: Optional[float], deadline: Optional[Deadline]) -> Tuple[Any, List[Dict[str, Any]]]:
+        with use_deadline(deadline), record_llm_calls() as calls:
+            try:
+                check_cancelled("composer")
+                raw: Any = await await_cancellable(_compose_one(sys_prompt, payload, _left(expires_at)), "composer")
+            except (LLMError, RequestCancelled) as e:
+                raw = e
+        return raw, calls
+
+    missing = [i for i, bid in enumerate(ids) if bid not in merged]
+    retried = await asyncio.gather(*(_fallback(*items[i]) for i in missing))
+    fallback = dict(zip(missing, retried))
+    return [
+        (merged[bid], shared) if bid in merged else (fallback[i][0], shared + fallback[i][1])
+        for i, bid in enumerate(ids)
+    ]
+
+
+_BATCHER: Optional[MicroBatcher] = None
+_BATCHER_LOCK = threading.Lock()
+
+
+def get_composer_batcher() -> Optional[MicroBatcher]:
+    """
+    Process-wide composer micro-batcher, or None unless COMPOSER_BATCH_ENABLED=1.
+    Buildings are grouped by (LLM priority, system prompt), so interactive
+    and batch-tier requests never share a call.
+    COMPOSER_BATCH_WINDOW_MS (default 10) is how long a batch waits for
+    company; COMPOSER_BATCH_MAX (default 4) caps the buildings per call.
+    """
+    global _BATCHER
+    if not composer_batching_enabled():
+        return None
+    if _BATCHER is None:
+        with _BATCHER_LOCK:
+            if _BATCHER is None:
+                window_s, max_batch = composer_batch_settings()
+                _BATCHER = MicroBatcher(_run_composer_batch, window_s=window_s, max_batch=max_batch)
+    return _BATCHER
+
+
+async def _compose_batched(
+    batcher: MicroBatcher, sys_prompt: str, user_payload: Dict[str, Any], timeout: Optional[float]
+) -> Dict[str, Any]:
+    expires_at = None if timeout is None else time.monotonic() + timeout
+    item: BatchItem = (user_payload, expires_at, current_deadline())
+    raw, calls = await await_cancellable(batcher.submit((current_priority(), sys_prompt), item), "composer")
+    attach_llm_calls(dict(c) for c in calls)
+    if isinstance(raw, BaseException):
+        raise raw
+    return raw
+
+
+async def compose_recommendations_async(
+    normalized: NormalizedInput, findings: AuditResult, deadline: Deadline | None = None
+) -> Recommendations:
+    """
+    Asyncio variant of compose_recommendations. With COMPOSER_BATCH_ENABLED=1,
+    concurrent calls that share a system prompt (same policy) are packed into
+    one LLM call by get_composer_batcher(). COMPOSER_FANOUT=1 fans out per
+    area as compose_recommendations does, with asyncio.gather.
+    """
+    deadline = deadline or current_deadline()
+    cache, key, similar = _similar_lookup(normalized, findings)
+    if similar is not None:
+        return _finish(similar, normalized)
+    sys_prompt = _build_system_prompt(
+        policy=normalized.policy.model_dump() if normalized.policy else None
+    )
+    areas = _fanout_areas(findings) if composer_fanout_enabled() else []
+    if areas:
+        # Area calls bypass the micro-batcher: they are meant to run side by side.
+        timeout = _stage_timeout(deadline)
+        replies = await asyncio.gather(*(
+            _compose_area(sys_prompt + _area_suffix(a), _area_payload(normalized, findings, a), timeout) for a in areas
+        ))
+        return _finish_fanout(normalized, findings, deadline, list(zip(areas, replies)), cache, key)
+    user_payload = _build_user_payload(normalized, findings)
+    raw: Dict[str, Any] = {}
+    batcher = get_composer_batcher()
+    try:
+        if batcher is not None:
+            raw = await _compose_batched(batcher, sys_prompt, user_payload, _stage_timeout(deadline))
+        else:
+            raw = await _compose_one(sys_prompt, user_payload, _stage_timeout(deadline))
+        _similar_store(cache, key, raw)
+    except RequestCancelled:
+        raise
+    except LLMError as e:
+        return _degraded(normalized, findings, deadline, e)
+    except Exception:
+        raw = {}
+
+    return _finish(raw, normalized)
+
+
+def _with_remaining_budget(normalized: NormalizedInput, spent: float) -> NormalizedInput:
+    policy = normalized.policy
+    if policy is None or policy.target_budget_LKR is None:
+        return normalized
+    remaining = max(float(policy.target_budget_LKR) - spent, 0.0)
+    return normalized.model_copy(update={"policy": policy.model_copy(update={"target_budget_LKR": remaining})})
+
+
+def _action_event(rec: Recommendation, normalized: NormalizedInput) -> Dict[str, Any]:
+    plan = estimate_impact(normalized, Recommendations(recommendations=[rec]))
+    impact = plan.all_actions[0].model_dump() if plan.all_actions else None
+    return {"type": "action", "recommendation": rec.model_dump(), "impact": impact}
+
+
+def _stream_event(item: Dict[str, Any], normalized: NormalizedInput, spent: float) -> Dict[str, Any] | None:
+    """Validate and policy-check one streamed recommendation; None when it is dropped."""
+    shaped = _shape_recommendations({"recommendations": [item]})
+    if not shaped.recommendations:
+        return None
+    kept, _ = apply_policy(shaped, _with_remaining_budget(normalized, spent))
+    if not kept.recommendations:
+        return None
+    return _action_event(kept.recommendations[0], normalized)
+
+
+async def compose_recommendations_stream(
+    normalized: NormalizedInput, findings: AuditResult, deadline: Deadline | None = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming composer. Yields {"type": "action", "recommendation", "impact"}
+    for each recommendation that validates and passes the policy as soon as it
+    closes in the LLM stream (budget is spent first come, first served), then
+    {"type": "done", "recommendations": Recommendations}: the final set, ranked
+    by apply_policy over every streamed item exactly as compose_recommendations does.
+    """
+    deadline = deadline or current_deadline()
+    sys_prompt = _build_system_prompt(
+        policy=normalized.policy.model_dump() if normalized.policy else None
+    )
+    user_payload = _build_user_payload(normalized, findings)
+    items: List[Dict[str, Any]] = []
+    spent = 0.0
+    try:
+        async for item in call_json_stream_async(
+            sys_prompt, user_payload, item_keys=("recommendations",),
+            timeout=_stage_timeout(deadline), stage="composer", schema=RECOMMENDATIONS_WIRE,
+        ):
+            items.append(item)
+            event = _stream_event(item, normalized, spent)
+            if event is not None:
+                spent += event["recommendation"]["est_cost"]
+                yield event
+    except LLMError as e:
+        if not items:
+            recs = _degraded(normalized, findings, deadline, e)
+            for rec in recs.recommendations:
+                yield _action_event(rec, normalized)
+            yield {"type": "done", "recommendations": recs}
+            return
+        # Keep what arrived before the stream broke off.
+        if deadline is not None:
+            deadline.mark_degraded("composer", f"stream ended early after {len(items)} recommendations: {e}")
+
+    yield {"type": "done", "recommendations": _finish({"recommendations": items}, normalized)}
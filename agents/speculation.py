@@ -0,0 +1,188 @@
+from __future__ import annotations
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.env import env_flag
+from agents import efficiency_auditor, recommendation_composer
+from utils.deadline import check_cancelled
+from utils.llm import attach_llm_calls, record_llm_calls
+from utils.models import AuditResult, NormalizedInput, Recommendations
+
+
+def speculation_enabled() -> bool:
+    """COMPOSER_SPECULATE (default off): compose on the rule findings while the auditor's LLM runs."""
+    return env_flag("COMPOSER_SPECULATE", False)
+
+
+def _key(finding: Any) -> Tuple[str, str]:
+    get = finding.get if isinstance(finding, dict) else lambda k: getattr(finding, k, None)
+    return str(get("area") or "").lower(), str(get("issue") or "").strip().lower()
+
+
+def new_high_findings(speculated: AuditResult, final: AuditResult) -> List[Any]:
+    """High-severity findings of `final` that the speculation did not have, matched on (area, issue)."""
+    seen = {_key(f) for f in speculated.findings}
+    return [f for f in final.findings if f.severity == "high" and _key(f) not in seen]
+
+
+class SpeculationStats:
+    """
+    Process-wide outcome counters. saved_s adds up, over accepted runs, how
+    much sooner the composer finished than it would have started after the
+    audit; discarded_composer_s is composer time thrown away on rejects.
+    """
+
+    def __init__(self) -> None:
+        self.started = 0
+        self.accepted = 0
+        self.discarded = 0
+        self.saved_s = 0.0
+        self.discarded_composer_s = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, accepted: bool, seconds: float) -> None:
+        with self._lock:
+            self.started += 1
+            if accepted:
+                self.accepted += 1
+                self.saved_s += max(seconds, 0.0)
+            else:
+                self.discarded += 1
+                self.discarded_composer_s += max(seconds, 0.0)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "accepted": self.accepted,
+                "discarded": self.discarded,
+                "hit_rate": round(self.accepted / self.started, 4) if self.started else None,
+                "saved_s": round(self.saved_s, 4),
+                "avg_saved_s": round(self.saved_s / self.accepted, 4) if self.accepted else None,
+                "discarded_composer_s": round(self.discarded_composer_s, 4),
+            }
+
+
+_STATS = SpeculationStats()
+
+
+def get_speculation_stats() -> SpeculationStats:
+    return _STATS
+
+
+def _coerce_audit(x: Any) -> AuditResult:
+    return x if isinstance(x, AuditResult) else AuditResult(**x)
+
+
+def _tagged(calls: List[Dict[str, Any]], outcome: str) -> List[Dict[str, Any]]:
+    return [dict(c, speculative=outcome) for c in calls]
+
+
+def _saved(spec: Dict[str, Any], audited: float) -> float:
+    """Composer time that overlapped the audit: what a sequential run would have added after it."""
+    return (spec["done"] - spec["started"]) - max(spec["done"] - audited, 0.0)
+
+
+def _spent(spec: Dict[str, Any], audited: float) -> float:
+    return min(spec.get("done", audited), audited) - spec["started"]
+
+
+def audit_and_compose(normalized: NormalizedInput) -> Tuple[AuditResult, Recommendations]:
+    """
+    audit() then compose_recommendations(). With COMPOSER_SPECULATE=1 the
+    composer starts on the rule-only findings in a worker thread as soon as
+    the auditor is about to call its LLM. The speculative recommendations
+    are kept unless the LLM adds a high-severity finding the rules did not
+    have; then they are discarded and the composer runs again on the full
+    findings. Composer calls of a speculation are tagged "speculative":
+    "accepted" or "discarded" in the run's llm_calls.
+    """
+    if not speculation_enabled():
+        check_cancelled("auditor")
+        findings = _coerce_audit(efficiency_auditor.audit(normalized))
+        check_cancelled("composer")
+        return findings, recommendation_composer.compose_recommendations(normalized, findings)
+
+    spec: Dict[str, Any] = {}
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    def _speculate(rule_only: Dict[str, Any]) -> None:
+        spec["findings"] = _coerce_audit(rule_only)
+        spec["started"] = time.monotonic()
+
+        def _compose() -> Recommendations:
+            with record_llm_calls() as calls:
+                spec["calls"] = calls
+                recs = recommendation_composer.compose_recommendations(normalized, spec["findings"])
+            spec["done"] = time.monotonic()
+            return recs
+
+        spec["future"] = pool.submit(contextvars.copy_context().run, _compose)
+
+    try:
+        check_cancelled("auditor")
+        findings = _coerce_audit(efficiency_auditor.audit(normalized, on_rules=_speculate))
+        audited = time.monotonic()
+        if "future" in spec and not new_high_findings(spec["findings"], findings):
+            check_cancelled("composer")
+            recs = spec["future"].result()
+            attach_llm_calls(_tagged(spec["calls"], "accepted"))
+            _STATS.record(True, _saved(spec, audited))
+            return findings, recs
+        if "future" in spec:
+            # A running thread cannot be stopped; its reply is simply ignored.
+            spec["future"].cancel()
+            attach_llm_calls(_tagged(list(spec.get("calls") or []), "discarded"))
+            _STATS.record(False, _spent(spec, audited))
+        check_cancelled("composer")
+        return findings, recommendation_composer.compose_recommendations(normalized, findings)
+    finally:
+        pool.shutdown(wait=False)
+
+
+async def audit_and_compose_async(normalized: NormalizedInput) -> Tuple[AuditResult, Recommendations]:
+    """Asyncio variant of audit_and_compose(); a discarded speculation is cancelled mid-call."""
+    if not speculation_enabled():
+        check_cancelled("auditor")
+        findings = _coerce_audit(await efficiency_auditor.audit_async(normalized))
+        check_cancelled("composer")
+        return findings, await recommendation_composer.compose_recommendations_async(normalized, findings)
+
+    spec: Dict[str, Any] = {}
+
+    async def _compose() -> Recommendations:
+        with record_llm_calls() as calls:
+            spec["calls"] = calls
+            recs = await recommendation_composer.compose_recommendations_async(normalized, spec["findings"])
+        spec["done"] = time.monotonic()
+        return recs
+
+    def _speculate(rule_only: Dict[str, Any]) -> None:
+        spec["findings"] = _coerce_audit(rule_only)
+        spec["started"] = time.monotonic()
+        spec["task"] = asyncio.get_running_loop().create_task(_compose())
+
+    try:
+        check_cancelled("auditor")
+        findings = _coerce_audit(await efficiency_auditor.audit_async(normalized, on_rules=_speculate))
+        audited = time.monotonic()
+        task: Optional[asyncio.Task] = spec.get("task")
+        if task is not None and not new_high_findings(spec["findings"], findings):
+            check_cancelled("composer")
+            recs = await task
+            attach_llm_calls(_tagged(spec["calls"], "accepted"))
+            _STATS.record(True, _saved(spec, audited))
+            return findings, recs
+        if task is not None:
+            task.cancel()
+            attach_llm_calls(_tagged(list(spec.get("calls") or []), "discarded"))
+            _STATS.record(False, _spent(spec, audited))
+        check_cancelled("composer")
+        return findings, await recommendation_composer.compose_recommendations_async(normalized, findings)
+    finally:
+        if spec.get("task") is not None and not spec["task"].done():
+            spec["task"].cancel()
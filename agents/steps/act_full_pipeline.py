@@ -1,30 +1,25 @@
 from __future__ import annotations
 from typing import Any, Dict, Tuple
 
+from utils.deadline import check_cancelled
 from utils.models import (
     NormalizedInput, AuditResult, Recommendations, ImpactPlan
 )
 from agents import (
     intake_agent,
-    efficiency_auditor,
-    recommendation_composer,
     policy_agent,
     impact_estimator,
 )
+from agents.speculation import audit_and_compose, audit_and_compose_async
 
-def act_full_pipeline(plan: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Runs your existing pipeline exactly once.
-    """
+def _normalize(plan: Dict[str, Any]) -> NormalizedInput:
     raw = plan["inputs"] or {}
-
     normalized_any = intake_agent.normalize(raw or {})
-    normalized = normalized_any if isinstance(normalized_any, NormalizedInput) else NormalizedInput(**normalized_any)
+    return normalized_any if isinstance(normalized_any, NormalizedInput) else NormalizedInput(**normalized_any)
 
-    findings_any = efficiency_auditor.audit(normalized)
-    findings = findings_any if isinstance(findings_any, AuditResult) else AuditResult(**findings_any)
 
-    recs_any = recommendation_composer.compose_recommendations(normalized, findings)
+def _finish_pipeline(normalized: NormalizedInput, findings: AuditResult, recs_any: Any) -> Dict[str, Any]:
+    check_cancelled("estimator")
     if isinstance(recs_any, dict):
         recs_dict = recs_any
     else:
@@ -48,3 +43,21 @@ def act_full_pipeline(plan: Dict[str, Any]) -> Dict[str, Any]:
         "policy_report": policy_report,
         "impact_plan": plan_out,
     }
+
+
+def act_full_pipeline(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs your existing pipeline exactly once.
+    """
+    normalized = _normalize(plan)
+    findings, recs_any = audit_and_compose(normalized)
+    return _finish_pipeline(normalized, findings, recs_any)
+
+
+async def act_full_pipeline_async(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Asyncio variant of act_full_pipeline: the two LLM stages are awaited.
+    """
+    normalized = _normalize(plan)
+    findings, recs_any = await audit_and_compose_async(normalized)
+    return _finish_pipeline(normalized, findings, recs_any)
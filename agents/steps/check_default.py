@@ -1,6 +1,8 @@
 from __future__ import annotations
 from typing import Any, Dict, Tuple
 
+from utils.profile import field_of
+
 def _get_num(x: Any, default: float = 0.0) -> float:
     try:
         v = float(x)
@@ -46,11 +48,6 @@ def check_against_criteria(result: Dict[str, Any], criteria: Dict[str, Any]) ->
     impact_plan = result.get("impact_plan") or result.get("plan")
     recommendations = result.get("recommendations")
 
-    if hasattr(normalized, "model_dump"):
-        n = normalized.model_dump()
-    else:
-        n = normalized or {}
-
     if hasattr(impact_plan, "model_dump"):
         p = impact_plan.model_dump()
     else:
@@ -62,8 +59,8 @@ def check_against_criteria(result: Dict[str, Any], criteria: Dict[str, Any]) ->
     blended_payback_num = None if blended_payback is None else _get_num(blended_payback, 0.0)
     total_kwh_saved = _get_num(totals.get("total_monthly_kwh_saved"))
 
-    baseline_kwh = _get_num(n.get("monthly_kWh"))
-    tariff = _get_num(n.get("tariff_LKR_per_kWh"))
+    baseline_kwh = _get_num(field_of(normalized or {}, "monthly_kWh"))
+    tariff = _get_num(field_of(normalized or {}, "tariff_LKR_per_kWh"))
 
     ok = True
 
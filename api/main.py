@@ -1,11 +1,26 @@
 from __future__ import annotations
-from typing import Any, Dict
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+from fastapi import FastAPI, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 
 from utils.models import (RawPayload, ComposeInput, EstimateInput, NormalizedInput, AuditResult, Recommendations, ImpactPlan,)
 from agents import intake_agent, efficiency_auditor, recommendation_composer, impact_estimator
-from workflow import run_workflow
+from agents.speculation import get_speculation_stats, speculation_enabled
+from workflow import remember_exact, run_workflow_async, run_workflow_stream, serve_precomputed
+from utils import llm
+from utils.deadline import Deadline, RequestCancelled
+from utils.similarity_cache import get_similarity_cache
+from utils.archetypes import archetype_serving_enabled, get_archetype_store, get_refresher
+from utils.rule_pack import get_rule_source
+from utils.profile import with_own_profile
+
+# How often a running /v1/run checks whether its client is still connected.
+DISCONNECT_POLL_S = 0.25
+# nginx's "client closed request"; nobody reads it, but access logs do.
+CLIENT_CLOSED_REQUEST = 499
 
 app = FastAPI(
     title="Green Efficiency Calculator API",
@@ -19,20 +34,35 @@ app = FastAPI(
 
 
 @app.get("/")
-def root():
+async def root():
     return RedirectResponse(url="/docs")
 
 
 @app.get("/healthz")
-def healthz():
+async def healthz():
     return {"status": "ok"}
 
+
+@app.get("/v1/metrics", summary="LLM call-path counters (cache, coalescing, connection pool, rate limiter).")
+async def v1_metrics() -> Dict[str, Any]:
+    batcher = recommendation_composer.get_composer_batcher()
+    similar = get_similarity_cache()
+    return {
+        **llm.metrics(),
+        "composer_batching": batcher.info() if batcher is not None else None,
+        "similarity_cache": similar.info() if similar is not None else None,
+        "archetypes": {**get_archetype_store().info(), "refresh": get_refresher().info()}
+        if archetype_serving_enabled() else None,
+        "audit_rules": get_rule_source().info(),
+        "speculation": get_speculation_stats().info() if speculation_enabled() else None,
+    }
+
 @app.post(
     "/v1/normalize",
     response_model=NormalizedInput,
     summary="Normalize raw payload into canonical NormalizedInput (includes optional `policy`).",
 )
-def v1_normalize(req: RawPayload) -> NormalizedInput:
+async def v1_normalize(req: RawPayload) -> NormalizedInput:
     normalized_dict = intake_agent.normalize(req.payload or {})
     return NormalizedInput(**normalized_dict)
 
@@ -42,8 +72,9 @@ def v1_normalize(req: RawPayload) -> NormalizedInput:
     response_model=AuditResult,
     summary="Run quantitative/qualitative audit on a NormalizedInput.",
 )
-def v1_audit(body: NormalizedInput) -> AuditResult:
-    res = efficiency_auditor.audit(body)
+async def v1_audit(body: NormalizedInput) -> AuditResult:
+    with llm.llm_priority("interactive"):
+        res = await efficiency_auditor.audit_async(with_own_profile(body))
     return res if isinstance(res, AuditResult) else AuditResult(**res)
 
 
@@ -52,8 +83,9 @@ def v1_audit(body: NormalizedInput) -> AuditResult:
     response_model=Recommendations,
     summary="Compose recommendations under policy constraints (prompt + deterministic filtering).",
 )
-def v1_compose(body: ComposeInput) -> Recommendations:
-    recs = recommendation_composer.compose_recommendations(body.normalized, body.findings)
+async def v1_compose(body: ComposeInput) -> Recommendations:
+    with llm.llm_priority("interactive"):
+        recs = await recommendation_composer.compose_recommendations_async(with_own_profile(body.normalized), body.findings)
     return recs if isinstance(recs, Recommendations) else Recommendations(**recs)
 
 
@@ -62,15 +94,71 @@ def v1_compose(body: ComposeInput) -> Recommendations:
     response_model=ImpactPlan,
     summary="Estimate monthly kWh/LKR/CO₂ impact (adds quick wins and CO₂ goal check).",
 )
-def v1_estimate(body: EstimateInput) -> ImpactPlan:
-    plan = impact_estimator.estimate_impact(body.normalized, body.recommendations)
+async def v1_estimate(body: EstimateInput) -> ImpactPlan:
+    plan = impact_estimator.estimate_impact(with_own_profile(body.normalized), body.recommendations)
     return plan if isinstance(plan, ImpactPlan) else ImpactPlan(**plan)
 
 
+async def _watch_disconnect(request: Request, deadline: Deadline) -> None:
+    while not deadline.cancelled:
+        if await request.is_disconnected():
+            deadline.cancel("client disconnected")
+            return
+        await asyncio.sleep(DISCONNECT_POLL_S)
+
+
+@asynccontextmanager
+async def _cancel_on_disconnect(request: Request, deadline: Deadline) -> AsyncIterator[Deadline]:
+    """Cancel `deadline` (and with it the pipeline's pending LLM calls) once the client goes away."""
+    watcher = asyncio.create_task(_watch_disconnect(request, deadline))
+    try:
+        yield deadline
+    finally:
+        watcher.cancel()
+
+
 @app.post(
     "/v1/run",
     response_model=Dict[str, Any],
     summary="End-to-end: raw payload → normalize → audit → compose → estimate.",
 )
-def v1_run(req: RawPayload) -> Dict[str, Any]:
-    return run_workflow(req.payload or {})
+async def v1_run(req: RawPayload, request: Request) -> Any:
+    payload = req.payload or {}
+    serving = archetype_serving_enabled()
+    if serving:
+        served = await asyncio.to_thread(serve_precomputed, payload)
+        if served is not None:
+            return served
+    deadline = Deadline.from_env()
+    try:
+        async with _cancel_on_disconnect(request, deadline):
+            with llm.llm_priority("interactive"):
+                result = await run_workflow_async(payload, deadline)
+    except RequestCancelled:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    if serving:
+        await asyncio.to_thread(remember_exact, payload, result)
+    return result
+
+
+async def _ndjson(payload: Dict[str, Any], deadline: Deadline) -> AsyncIterator[str]:
+    finished = False
+    try:
+        with llm.llm_priority("interactive"):
+            async for event in run_workflow_stream(payload, deadline):
+                yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        finished = True
+    except RequestCancelled:
+        finished = True
+    finally:
+        # Starlette stops iterating (and cancels us) when the client disconnects.
+        if not finished:
+            deadline.cancel("client disconnected")
+
+
+@app.post(
+    "/v1/run/stream",
+    summary="End-to-end run streamed as NDJSON: findings, then each action as it is composed, then the full result.",
+)
+async def v1_run_stream(req: RawPayload) -> StreamingResponse:
+    return StreamingResponse(_ndjson(req.payload or {}, Deadline.from_env()), media_type="application/x-ndjson")
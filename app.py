@@ -4,9 +4,13 @@ import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 import re, html, urllib.parse as ul
+import contextvars, time
+from concurrent.futures import ThreadPoolExecutor
 
 
 from workflow import run_workflow
+from utils.llm import llm_priority
+from utils.deadline import Deadline, RequestCancelled
 from utils.auth_utils import login, signup, logout
 from utils.autofix import AutoFixContext
 from utils.validation import validate_actions_report
@@ -328,6 +332,27 @@ DARK_CSS = """
 </style>
 """
 
+# Analysis runs in a worker thread so a rerun (new click, changed input) can
+# cancel it: Streamlit interrupts this script at its next st.* call, and the
+# finally block then cancels the run's deadline so the pipeline skips the
+# stages it has not started yet.
+def run_workflow_cancellable(payload, status):
+    deadline = Deadline.from_env()
+    pool = ThreadPoolExecutor(max_workers=1)
+    ctx = contextvars.copy_context()
+    future = pool.submit(ctx.run, run_workflow, payload, deadline)
+    started = time.monotonic()
+    try:
+        while not future.done():
+            status.caption(f"Analyzing… {time.monotonic() - started:.0f}s")
+            time.sleep(0.25)
+        return future.result()
+    finally:
+        if not future.done():
+            deadline.cancel("streamlit rerun")
+        pool.shutdown(wait=False)
+        status.empty()
+
 # C. Tiny theme switcher (keeps choice in session and injects the right CSS)
 if "theme" not in st.session_state:
     st.session_state.theme = "Light"  # default to Light; change to "Dark" if you prefer
@@ -555,8 +580,11 @@ elif choice == "App":
                 "policy": policy,
             }
 
-            with st.spinner("Analyzing…"):
-                result = run_workflow(payload)
+            with st.spinner("Analyzing…"), llm_priority("interactive"):
+                try:
+                    result = run_workflow_cancellable(payload, st.empty())
+                except RequestCancelled:
+                    st.stop()
 
             plan = result.get("plan", {}) or {}
             totals = plan.get("totals", {}) or {}
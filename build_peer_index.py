@@ -0,0 +1,27 @@
+from __future__ import annotations
+import argparse
+import csv
+from pathlib import Path
+
+from utils.peer_index import build_peer_index, peer_index_dir, update_peer_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the peer energy-intensity percentile index.")
+    parser.add_argument("--from", dest="source", type=Path, default=None,
+                        help="CSV with building_type, floor_area_m2, monthly_kWh columns; rebuilds the index from scratch")
+    parser.add_argument("--index", type=Path, default=None, help="index directory (default PEER_INDEX_PATH)")
+    args = parser.parse_args()
+
+    directory = args.index or peer_index_dir()
+    if args.source:
+        with open(args.source, "r", encoding="utf-8", newline="") as f:
+            n = build_peer_index(directory, csv.DictReader(f))
+        print(f"Indexed {n} buildings in {directory}")
+    else:
+        n = update_peer_index(directory)
+        print(f"Merged {n} recorded buildings into {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+from __future__ import annotations
+import argparse
+from pathlib import Path
+
+from utils.archetypes import ArchetypeStore, GRID_PATH, get_archetype_store
+from workflow import precompute_archetypes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline for every building archetype and store the plans.")
+    parser.add_argument("--grid", type=Path, default=GRID_PATH, help="archetype grid (default data/archetypes.yaml)")
+    parser.add_argument("--store", type=Path, default=None, help="store path (default ARCHETYPE_STORE_PATH)")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many archetypes")
+    args = parser.parse_args()
+
+    store = ArchetypeStore(args.store) if args.store else get_archetype_store()
+    n = precompute_archetypes(store=store, grid_path=args.grid, limit=args.limit)
+    print(f"Stored {n} archetype plans in {store.path}")
+
+
+if __name__ == "__main__":
+    main()
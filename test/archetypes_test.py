@@ -0,0 +1,64 @@
+from agents import impact_estimator, intake_agent
+from utils.archetypes import ArchetypeStore, archetype_payloads, get_refresher, load_grid
+from utils.models import NormalizedInput, Recommendations
+from workflow import precompute_archetypes, serve_precomputed
+
+HOME = {
+    "floor_area_m2": 95,
+    "monthly_kWh": 120,
+    "tariff_LKR_per_kWh": 62,
+    "ac_units": [],
+    "lighting": {"bulbs": 10, "watt_per_bulb": 40, "hours_per_day": 5},
+}
+
+
+def test_grid_expands_to_unique_archetypes():
+    ids = [a for a, _ in archetype_payloads(load_grid())]
+    assert len(ids) == len(set(ids)) > 100
+
+
+def test_nearest_archetype_then_exact_plan(fake_llm, tmp_path):
+    store = ArchetypeStore(tmp_path / "archetypes.sqlite3")
+    assert precompute_archetypes(store=store, limit=4) == 4
+    calls = len(fake_llm)
+
+    first = serve_precomputed(dict(HOME), store=store)
+    assert first["served_from"]["source"] == "archetype"
+    assert "non_led" in first["served_from"]["key"]
+    assert first["served_from"]["refreshing"] and first["llm_calls"] == []
+    assert first["input"]["floor_area_m2"] == 95 and first["input"]["monthly_kWh"] == 120
+    own = impact_estimator.estimate_impact(
+        NormalizedInput(**intake_agent.normalize(dict(HOME))), Recommendations(**first["recommendations"])
+    )
+    assert first["plan"]["totals"] == own.totals.model_dump()
+    get_refresher().wait(timeout=10)
+    assert len(fake_llm) > calls
+
+    second = serve_precomputed(dict(HOME), store=store)
+    assert second["served_from"]["source"] == "exact"
+    assert not second["served_from"]["refreshing"]
+    assert second["input"]["floor_area_m2"] == 95
+
+    assert serve_precomputed(dict(HOME, policy={"target_budget_LKR": 1000}), store=store) is None
+    far = dict(HOME, floor_area_m2=2000, monthly_kWh=9000)
+    assert serve_precomputed(far, store=store) is None
+
+
+def test_tariff_counts_toward_distance(fake_llm, tmp_path):
+    store = ArchetypeStore(tmp_path / "archetypes.sqlite3")
+    precompute_archetypes(store=store, limit=4)
+    assert serve_precomputed(dict(HOME, tariff_LKR_per_kWh=62 * 20), store=store) is None
+
+
+def test_exact_plans_are_bounded_by_age_and_count(tmp_path):
+    store = ArchetypeStore(tmp_path / "archetypes.sqlite3", max_exact=3, max_exact_age_s=3600)
+    for i in range(5):
+        store.put(f"k{i}", "exact", {"i": i})
+        store._conn().execute("UPDATE plans SET computed_at = computed_at - ? WHERE key = ?", (100 * (5 - i), f"k{i}"))
+    store._conn().execute("UPDATE plans SET computed_at = computed_at - 7200 WHERE key = 'k4'")
+    store._conn().commit()
+    assert store.get("k4") is None  # too old to serve
+
+    store.prune()
+    assert store.info()["exact"] == 3
+    assert [store.get(f"k{i}") is not None for i in range(5)] == [False, True, True, True, False]
@@ -0,0 +1,33 @@
+from agents import efficiency_auditor
+from agents.intake_agent import normalize
+from utils.llm import llm_priority
+from workflow_async_test import PAYLOAD
+
+
+def _gate(out):
+    return out["analysis_summary"]["llm_gate"]
+
+
+def test_saturated_rule_findings_skip_the_llm(fake_llm):
+    out = efficiency_auditor.audit(normalize(dict(PAYLOAD)), max_findings=3)
+    assert fake_llm == []
+    assert _gate(out)["decision"] == "skip"
+    assert len(out["findings"]) == 3 and "warning" not in out
+
+
+def test_wide_coverage_downsizes_the_request(fake_llm):
+    out = efficiency_auditor.audit(normalize(dict(PAYLOAD, monthly_kWh=3000)), max_findings=8)
+    gate = _gate(out)
+    assert gate["decision"] == "downsize" and gate["requested"] == 1
+    assert "Provide 1 additional findings" in fake_llm[0][1]
+
+
+def test_tier_cap_and_kill_switch(fake_llm, monkeypatch):
+    monkeypatch.setenv("AUDITOR_GATE_MAX_INTERACTIVE", "0")
+    with llm_priority("interactive"):
+        assert _gate(efficiency_auditor.audit(normalize(dict(PAYLOAD))))["decision"] == "skip"
+    assert _gate(efficiency_auditor.audit(normalize(dict(PAYLOAD))))["decision"] == "full"
+
+    monkeypatch.setenv("AUDITOR_GATE", "0")
+    out = efficiency_auditor.audit(normalize(dict(PAYLOAD)), max_findings=3)
+    assert _gate(out)["decision"] == "full" and len(fake_llm) == 2
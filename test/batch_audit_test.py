@@ -0,0 +1,150 @@
+import math
+import os
+import random
+import time
+
+import numpy as np
+import pytest
+
+from agents import efficiency_auditor
+from agents.batch_audit import audit_batch, normalize_batch
+from agents.efficiency_auditor import _rule_findings
+from agents.intake_agent import normalize
+from utils import llm
+from utils.rule_pack import RULES_PATH, RulePackError
+
+
+def _random_buildings(n, seed=7):
+    rng = random.Random(seed)
+    maybe = lambda v: math.nan if rng.random() < 0.1 else v  # noqa: E731
+    cols = {k: [] for k in ("floor_area_m2", "monthly_kWh", "tariff_LKR_per_kWh",
+                            "bulbs", "watt_per_bulb", "lighting_hours_per_day")}
+    units = {k: [] for k in ("building", "watt", "hours_per_day", "star_rating", "count")}
+    for b in range(n):
+        cols["floor_area_m2"].append(maybe(rng.choice([0.0, -5.0, rng.uniform(10, 400)])))
+        cols["monthly_kWh"].append(maybe(rng.choice([-10.0, 2e7, rng.uniform(0, 5000)])))
+        cols["tariff_LKR_per_kWh"].append(maybe(rng.choice([-1.0, 62.0, 45.5])))
+        cols["bulbs"].append(maybe(rng.choice([-2, 0, 4, 12.7, 30, 5000])))
+        cols["watt_per_bulb"].append(maybe(rng.choice([-1.0, 0.0, 8.0, 12.0, 15.0, 40.0, 60.0, 10000.0, 25000.0])))
+        cols["lighting_hours_per_day"].append(maybe(rng.choice([-3.0, 2.0, 6.0, 9.5, 16.0, 24.0, 30.0])))
+        for _ in range(rng.randint(0, 3)):
+            units["building"].append(b)
+            units["watt"].append(maybe(rng.choice([-100.0, 900.0, 1200.0, 1800.0, 20000.0])))
+            units["hours_per_day"].append(maybe(rng.choice([-1.0, 4.0, 8.0, 12.5, 20.0, 24.0, 25.0, 48.5])))
+            units["star_rating"].append(maybe(rng.choice([0, 1, 2, 2.7, 3, 5, 7.5])))
+            units["count"].append(maybe(rng.choice([-1, 1, 2, 1500])))
+    return cols, units
+
+
+def _payload(cols, units, b):
+    def present(d, i):
+        return {k: v[i] for k, v in d.items() if k != "building" and not (isinstance(v[i], float) and math.isnan(v[i]))}
+
+    row = present(cols, b)
+    lighting = {k2: row.pop(k1) for k1, k2 in (("bulbs", "bulbs"), ("watt_per_bulb", "watt_per_bulb"),
+                                              ("lighting_hours_per_day", "hours_per_day")) if k1 in row}
+    row["lighting"] = lighting
+    row["ac_units"] = [present(units, i) for i, ub in enumerate(units["building"]) if ub == b]
+    return row
+
+
+def test_batch_matches_per_building_audit():
+    cols, units = _random_buildings(400)
+    got = audit_batch(cols, units, max_findings=5).to_lists()
+    for b in range(400):
+        assert got[b] == _rule_findings(normalize(_payload(cols, units, b)), 5), b
+
+
+def test_batch_quotes_clamped_values_like_normalize():
+    cols = {"floor_area_m2": [100.0], "monthly_kWh": [100.0],
+            "watt_per_bulb": [25000.0], "lighting_hours_per_day": [30.0]}
+    units = {"building": [0], "hours_per_day": [25.0], "watt": [1000.0]}
+    issues = [f["issue"] for f in audit_batch(cols, units, max_findings=10).to_lists()[0]]
+    assert "AC unit 1 operates 24h/day (excessive)" in issues
+    assert "High wattage bulbs (10000W per bulb)" in issues
+    assert "Lights operate 24h/day (likely excessive)" in issues
+
+
+def test_batch_accepts_interleaved_unit_rows():
+    cols = {"floor_area_m2": [100.0, 50.0], "monthly_kWh": [100.0, 100.0]}
+    units = {"building": [1, 0, 1], "hours_per_day": [20.0, 4.0, 13.0], "star_rating": [5, 1, 5], "watt": [1000.0] * 3}
+    nb = normalize_batch(cols, units)
+    assert nb.ac_unit.tolist() == [1, 1, 2]
+    issues = [f["issue"] for f in audit_batch(cols, units).to_lists()[1]]
+    assert "AC unit 1 operates 20.0h/day (excessive)" in issues
+    assert "AC unit 2 operates 13.0h/day (excessive usage)" in issues
+
+
+def test_batch_empty_and_counts():
+    empty = audit_batch({"floor_area_m2": [], "monthly_kWh": []})
+    assert len(empty) == 0 and empty.to_lists() == []
+    res = audit_batch({"floor_area_m2": [10.0, 100.0], "monthly_kWh": [500.0, 1.0],
+                       "watt_per_bulb": [8.0, 8.0]}, max_findings=1)
+    assert res.counts().tolist() == [1, 0]
+
+
+def test_batch_handles_many_buildings_quickly():
+    n = 100_000
+    rng = np.random.default_rng(0)
+    cols = {
+        "floor_area_m2": rng.uniform(20, 500, n),
+        "monthly_kWh": rng.uniform(50, 5000, n),
+        "bulbs": rng.integers(0, 40, n).astype(float),
+        "watt_per_bulb": rng.choice([8.0, 15.0, 60.0], n),
+        "lighting_hours_per_day": rng.uniform(0, 18, n),
+    }
+    units = {
+        "building": np.repeat(np.arange(n), 2),
+        "watt": np.full(2 * n, 1200.0),
+        "hours_per_day": rng.uniform(0, 24, 2 * n),
+        "star_rating": rng.integers(1, 6, 2 * n).astype(float),
+    }
+    start = time.perf_counter()
+    res = audit_batch(cols, units)
+    assert time.perf_counter() - start < 5.0
+    assert res.counts().max() <= 5 and len(res) > n
+
+
+def _edited_pack(tmp_path, monkeypatch, old, new):
+    path = tmp_path / "rules.yaml"
+    text = RULES_PATH.read_text(encoding="utf-8")
+    assert old in text
+    path.write_text(text.replace(old, new), encoding="utf-8")
+    monkeypatch.setenv("AUDIT_RULES_PATH", str(path))
+
+
+def test_batch_follows_the_pack_benchmarks_and_confidences(tmp_path, monkeypatch):
+    _edited_pack(tmp_path, monkeypatch, "min_star_rating: 3", "min_star_rating: 4")
+    cols = {"floor_area_m2": [100.0], "monthly_kWh": [100.0]}
+    units = {"building": [0], "hours_per_day": [8.0], "star_rating": [3], "watt": [1000.0]}
+    got = audit_batch(cols, units).to_lists()[0]
+    assert got == _rule_findings(normalize(_payload(cols, units, 0)), 5)
+    assert got[0]["issue"] == "AC unit 1 has low efficiency rating (3 stars)"
+
+
+def test_batch_refuses_a_pack_whose_rules_it_does_not_implement(tmp_path, monkeypatch):
+    _edited_pack(tmp_path, monkeypatch, "when: hours_per_day > 14", "when: hours_per_day > 12")
+    with pytest.raises(RulePackError):
+        audit_batch({"floor_area_m2": [100.0], "monthly_kWh": [100.0]})
+
+
+def test_audit_and_batch_agree_across_a_hot_reload(tmp_path, monkeypatch):
+    path = tmp_path / "rules.yaml"
+    path.write_text(RULES_PATH.read_text(encoding="utf-8"), encoding="utf-8")
+    monkeypatch.setenv("AUDIT_RULES_PATH", str(path))
+    monkeypatch.setenv("AUDIT_RULES_CHECK_S", "0")
+    monkeypatch.setattr(llm, "_complete_json", lambda *a, **k: {"findings": []})
+    cols = {"floor_area_m2": [100.0], "monthly_kWh": [100.0]}
+    units = {"building": [0], "hours_per_day": [8.0], "star_rating": [3], "watt": [1000.0]}
+
+    def both():
+        return efficiency_auditor.audit(normalize(_payload(cols, units, 0)))["findings"], audit_batch(cols, units).to_lists()[0]
+
+    assert both() == ([], [])
+    text = path.read_text(encoding="utf-8").replace("min_star_rating: 3", "min_star_rating: 4")
+    path.write_text(text.replace("confidence: 0.9\n    impact: watt", "confidence: 0.85\n    impact: watt"), encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    per_building, batch = both()
+    assert per_building == batch
+    assert [(f["issue"], f["confidence"]) for f in batch] == [("AC unit 1 has low efficiency rating (3 stars)", 0.85)]
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from api import main
+from utils import llm
+from utils.deadline import Deadline, RequestCancelled, cancellation_stats
+from workflow import run_workflow, run_workflow_async
+from workflow_async_test import PAYLOAD
+
+
+def test_cancel_aborts_inflight_async_call(fake_llm, monkeypatch):
+    async def slow(model, system_text, user_content, temperature, *args, **kwargs):
+        fake_llm.append((system_text, user_content))
+        await asyncio.sleep(5)
+        return {}
+
+    monkeypatch.setattr(llm, "_complete_json_async", slow)
+    before = cancellation_stats()
+
+    async def go():
+        deadline = Deadline.after(30)
+        task = asyncio.create_task(run_workflow_async(dict(PAYLOAD), deadline))
+        await asyncio.sleep(0.05)
+        deadline.cancel("client disconnected")
+        with pytest.raises(RequestCancelled):
+            await task
+
+    t0 = time.monotonic()
+    asyncio.run(go())
+    assert time.monotonic() - t0 < 2
+    assert len(fake_llm) == 1
+    after = cancellation_stats()
+    assert after["requests"] == before["requests"] + 1
+    assert after["llm_calls_aborted"] == before["llm_calls_aborted"] + 1
+
+
+def test_cancel_skips_later_stages(fake_llm, monkeypatch):
+    deadline = Deadline.after(30)
+    canned = llm._complete_json
+
+    def cancel_during_audit(*args, **kwargs):
+        deadline.cancel("streamlit rerun")
+        return canned(*args, **kwargs)
+
+    monkeypatch.setattr(llm, "_complete_json", cancel_during_audit)
+    before = cancellation_stats()
+    with pytest.raises(RequestCancelled):
+        run_workflow(dict(PAYLOAD), deadline)
+    assert len(fake_llm) == 1
+    assert deadline.degraded_stages == []
+    assert cancellation_stats()["stages_skipped"] == before["stages_skipped"] + 1
+
+
+def test_run_returns_499_when_client_disconnects(fake_llm, monkeypatch):
+    async def slow(model, system_text, user_content, temperature, *args, **kwargs):
+        await asyncio.sleep(5)
+        return {}
+
+    class GoneRequest:
+        async def is_disconnected(self):
+            return True
+
+    monkeypatch.setattr(llm, "_complete_json_async", slow)
+    resp = asyncio.run(main.v1_run(main.RawPayload(payload=dict(PAYLOAD)), GoneRequest()))
+    assert resp.status_code == main.CLIENT_CLOSED_REQUEST
+    assert "cancellation" in llm.metrics()
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+from agents.efficiency_auditor import _build_user_prompt, benchmarks
+from agents.recommendation_composer import _build_user_payload
+from utils import llm
+from utils.compaction import group_devices, relevant_benchmarks, round_numbers
+from utils.models import AuditResult, NormalizedInput
+from workflow import run_workflow
+from workflow_async_test import PAYLOAD
+
+AC = {"watt": 1200.0, "hours_per_day": 8.0, "star_rating": 3.0, "count": 0}
+
+
+def test_group_devices_and_rounding():
+    units = [dict(AC)] * 4 + [dict(AC, watt=900.0, count=2)]
+    assert group_devices(units) == [dict(AC, count=4), dict(AC, watt=900.0, count=2)]
+    assert round_numbers({"a": 1.23456, "b": [120.0, True]}) == {"a": 1.23, "b": [120, True]}
+
+
+def test_only_relevant_benchmarks():
+    no_ac = {"lighting": {"bulbs": 4}, "monthly_kWh": 0}
+    assert set(relevant_benchmarks(benchmarks(), no_ac)) == {"lighting_efficiency"}
+    assert "ac_efficiency" in relevant_benchmarks(benchmarks(), no_ac, {"AC"})
+
+
+def test_compaction_shrinks_prompts(monkeypatch):
+    normalized = NormalizedInput(**dict(PAYLOAD, ac_units=[AC] * 6))
+    findings = AuditResult(findings=[{"area": "lighting", "issue": "x", "severity": "low", "reason": "y"}])
+    sizes = {}
+    for flag in ("0", "1"):
+        monkeypatch.setenv("LLM_PROMPT_COMPACTION", flag)
+        auditor = llm._user_text(_build_user_prompt(normalized.model_dump(), [], 5))
+        composer = llm._user_text(_build_user_payload(normalized, findings))
+        sizes[flag] = (len(auditor), len(composer))
+    assert sizes["1"][0] < sizes["0"][0] * 0.7
+    assert sizes["1"][1] < sizes["0"][1] * 0.7
+
+
+def test_usage_is_read_and_totalled(fake_llm):
+    usage = {}
+    llm._read_usage(SimpleNamespace(usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30)), usage)
+    assert usage == {"prompt_tokens": 120, "completion_tokens": 30}
+
+    out = run_workflow(dict(PAYLOAD))
+    totals = out["llm_usage"]
+    assert set(totals["by_stage"]) == {"auditor", "composer"}
+    assert totals["prompt_tokens"] == sum(c["prompt_tokens"] for c in out["llm_calls"])
+    assert totals["estimated"] is True  # the fake reports no usage
+    assert llm.metrics()["tokens"]["auditor"]["calls"] >= 1
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+from agents import recommendation_composer
+from agents.intake_agent import normalize
+from utils import llm
+from utils.llm import LLMError, record_llm_calls
+from utils.models import AuditResult, NormalizedInput
+from workflow_async_test import PAYLOAD
+
+FINDINGS = AuditResult(findings=[
+    {"area": "AC", "issue": "Setpoint too low", "severity": "medium", "reason": "18°C"},
+    {"area": "lighting", "issue": "Incandescent bulbs", "severity": "high", "reason": "60W"},
+    {"area": "standby", "issue": "Devices on standby", "severity": "low", "reason": "Phantom loads"},
+])
+
+
+def _rec(action, cost=1000):
+    return {"action": action, "steps": ["Do it"], "pct_kwh_reduction_min": 2, "pct_kwh_reduction_max": 4,
+            "est_cost": cost, "disruption": "low"}
+
+
+REPLIES = {
+    "lighting": {"recommendations": [_rec("Switch to LED bulbs"), _rec("Fit occupancy sensors")]},
+    "AC": {"recommendations": [_rec("Raise the AC setpoint"), _rec("Switch to LED bulbs!")]},
+    "standby": {"recommendations": [_rec("Use timer plugs")]},
+}
+
+
+def _area_of(user_content):
+    return user_content["audit_summary"]["findings"][0]["area"]
+
+
+def test_fanout_is_off_by_default(fake_llm, monkeypatch):
+    monkeypatch.delenv("COMPOSER_FANOUT", raising=False)
+    normalized = NormalizedInput(**normalize(dict(PAYLOAD)))
+    recommendation_composer.compose_recommendations(normalized, FINDINGS)
+    assert len(fake_llm) == 1
+
+
+def test_one_concurrent_call_per_area_merged_and_deduplicated(fake_llm, monkeypatch):
+    monkeypatch.setenv("COMPOSER_FANOUT", "1")
+    seen = []
+
+    async def fake(model, system_text, user_content, temperature, *args, options=None, **kwargs):
+        area = _area_of(user_content)
+        seen.append((area, options.get("max_tokens"), system_text))
+        await asyncio.sleep({"lighting": 0.2, "AC": 0.3, "standby": 0.1}[area])
+        return REPLIES[area]
+
+    monkeypatch.setattr(llm, "_complete_json_async", fake)
+    normalized = NormalizedInput(**normalize(dict(PAYLOAD)))
+
+    async def go():
+        with record_llm_calls() as calls:
+            recs = await recommendation_composer.compose_recommendations_async(normalized, FINDINGS)
+        return recs, calls
+
+    started = time.perf_counter()
+    recs, calls = asyncio.run(go())
+    assert time.perf_counter() - started < 0.5
+    assert sorted(a for a, _, _ in seen) == ["AC", "lighting", "standby"]
+    assert all(cap == 700 and f'"{area}"' in prompt for area, cap, prompt in seen)
+    assert [c["stage"] for c in calls] == ["composer_area"] * 3
+    actions = sorted(r.action for r in recs.recommendations)
+    assert actions == ["Fit occupancy sensors", "Raise the AC setpoint", "Switch to LED bulbs", "Use timer plugs"]
+    assert not recs.policy_report.get("degraded")
+
+
+def test_area_payload_keeps_only_its_devices():
+    normalized = NormalizedInput(**normalize(dict(PAYLOAD)))
+    ac = recommendation_composer._area_payload(normalized, FINDINGS, "AC")
+    lighting = recommendation_composer._area_payload(normalized, FINDINGS, "lighting")
+    assert "lighting" not in ac["context"] and [f["area"] for f in ac["audit_summary"]["findings"]] == ["AC"]
+    assert "ac_units" not in lighting["context"]
+
+
+def test_failed_area_falls_back_to_rules(fake_llm, monkeypatch):
+    monkeypatch.setenv("COMPOSER_FANOUT", "1")
+
+    def fake(model, system_text, user_content, temperature, *args, **kwargs):
+        area = _area_of(user_content)
+        if area == "AC":
+            raise LLMError("timeout")
+        time.sleep(0.1)
+        return REPLIES[area]
+
+    monkeypatch.setattr(llm, "_complete_json", fake)
+    normalized = NormalizedInput(**normalize(dict(PAYLOAD)))
+    recs = recommendation_composer.compose_recommendations(normalized, FINDINGS)
+    actions = {r.action for r in recs.recommendations}
+    assert "Raise AC setpoint to 24°C and clean filters" in actions
+    assert {"Switch to LED bulbs", "Use timer plugs"} <= actions
+    assert recs.policy_report["degraded"] is True
+
+
+def test_area_payload_keeps_the_devices_its_findings_name():
+    normalized = NormalizedInput(**normalize(dict(PAYLOAD)))
+    findings = AuditResult(findings=[
+        {"area": "other", "issue": "AC unit 1 operates 20h/day (excessive)", "severity": "high", "reason": "Near-continuous"},
+        {"area": "standby", "issue": "Devices on standby", "severity": "low", "reason": "Phantom loads"},
+    ])
+    other = recommendation_composer._area_payload(normalized, findings, "other")["context"]
+    assert "ac_units" in other and "lighting" not in other
+    standby = recommendation_composer._area_payload(normalized, findings, "standby")["context"]
+    assert "ac_units" not in standby and "lighting" not in standby
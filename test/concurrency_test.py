@@ -0,0 +1,39 @@
+from utils.concurrency import ERROR, OK, OVERLOAD, AdaptiveLimiter, classify_error, get_adaptive_limiter
+
+
+class _Err(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_additive_increase_and_multiplicative_decrease():
+    lim = AdaptiveLimiter(initial=4, target_latency_s=1.0, cooldown_s=0)
+    for _ in range(8):
+        lim.acquire()
+        lim.release(0.1, OK)
+    assert 5.0 <= lim.limit < 6.5
+
+    before = lim.limit
+    lim.acquire()
+    lim.release(0.1, OVERLOAD)
+    assert lim.limit == before / 2
+
+    before = lim.limit
+    lim.acquire()
+    lim.release(5.0, OK)  # latency spike
+    assert lim.limit == max(before / 2, 1.0)
+    assert lim.info()["in_flight"] == 0
+
+
+def test_classify_error():
+    assert classify_error(_Err(429)) == OVERLOAD
+    assert classify_error(_Err(503)) == OVERLOAD
+    assert classify_error(_Err(400)) == ERROR
+    assert classify_error(ValueError()) == ERROR
+
+
+def test_limiter_is_opt_in(monkeypatch):
+    monkeypatch.delenv("LLM_AIMD_ENABLED", raising=False)
+    assert get_adaptive_limiter() is None
+    monkeypatch.setenv("LLM_AIMD_ENABLED", "1")
+    assert get_adaptive_limiter() is not None
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from utils import llm
+
+AUDIT_REPLY = {
+    "findings": [
+        {"area": "standby", "issue": "Devices left on standby", "severity": "low", "reason": "Phantom loads"}
+    ]
+}
+COMPOSE_REPLY = {
+    "recommendations": [
+        {
+            "action": "Switch to LED bulbs",
+            "steps": ["Buy LED bulbs", "Replace old bulbs"],
+            "pct_kwh_reduction_min": 5,
+            "pct_kwh_reduction_max": 10,
+            "est_cost": 5000,
+            "disruption": "low",
+        }
+    ]
+}
+
+
+def _reply_for(system_text):
+    return COMPOSE_REPLY if "recommendations" in system_text else AUDIT_REPLY
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Replace the network call with canned auditor/composer replies; records every request."""
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    calls = []
+
+    def fake_complete(model, system_text, user_content, temperature, *args, **kwargs):
+        calls.append((system_text, user_content))
+        return _reply_for(system_text)
+
+    async def fake_complete_async(model, system_text, user_content, temperature, *args, **kwargs):
+        calls.append((system_text, user_content))
+        return _reply_for(system_text)
+
+    async def fake_stream(model, system_text, user_content, temperature, *args, **kwargs):
+        calls.append((system_text, user_content))
+        text = json.dumps(_reply_for(system_text))
+        for i in range(0, len(text), 16):
+            yield text[i : i + 16]
+
+    monkeypatch.setattr(llm, "_complete_json", fake_complete)
+    monkeypatch.setattr(llm, "_complete_json_async", fake_complete_async)
+    monkeypatch.setattr(llm, "_stream_text_async", fake_stream)
+    return calls
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from utils import llm
+from utils.deadline import Deadline
+from workflow import run_workflow, run_workflow_async
+from workflow_async_test import PAYLOAD
+
+
+def test_expired_budget_degrades_without_calling_llm(fake_llm):
+    out = run_workflow(dict(PAYLOAD), deadline=Deadline.after(0))
+    assert fake_llm == []
+    assert out["degraded"] is True
+    assert out["degraded_stages"] == ["auditor", "composer"]
+    assert out["findings"]["findings"], "rule findings survive"
+    actions = [a["action"] for a in out["plan"]["all_actions"]]
+    assert "Replace bulbs with LEDs" in actions
+
+
+def test_slow_upstream_is_cut_off(fake_llm, monkeypatch):
+    async def slow(*args, **kwargs):
+        await asyncio.sleep(5)
+        return {}
+
+    monkeypatch.setattr(llm, "_complete_json_async", slow)
+    started = time.monotonic()
+    deadline = Deadline.after(10, {"auditor": 0.05, "composer": 0.05})
+    out = asyncio.run(run_workflow_async(dict(PAYLOAD), deadline=deadline))
+    assert time.monotonic() - started < 2
+    assert out["degraded_stages"] == ["auditor", "composer"]
+
+
+def test_healthy_run_not_degraded(fake_llm):
+    out = run_workflow(dict(PAYLOAD))
+    assert out["degraded"] is False
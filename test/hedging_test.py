@@ -0,0 +1,95 @@
+import asyncio
+import itertools
+import time
+
+from utils import llm
+from utils.hedging import HedgePolicy, run_hedged, run_hedged_async
+
+
+def _warm(policy, stage="composer", latency=0.01):
+    for _ in range(policy.min_samples):
+        policy.observe(stage, latency)
+
+
+def test_slow_primary_is_beaten_by_hedge():
+    policy = HedgePolicy(percentile=95, max_rate=1.0, min_samples=5, min_delay_s=0.02)
+    _warm(policy)
+    calls = itertools.count()
+
+    def attempt():
+        if next(calls) == 0:
+            time.sleep(0.5)
+            return {"who": "primary"}
+        return {"who": "hedge"}
+
+    result, fired, won = run_hedged(policy, "composer", attempt, timeout=2.0)
+    assert result == {"who": "hedge"}
+    assert fired and won
+    assert policy.info()["hedges_won"] == 1
+
+
+def test_async_hedge_cancels_loser():
+    policy = HedgePolicy(percentile=95, max_rate=1.0, min_samples=5, min_delay_s=0.02)
+    _warm(policy)
+    calls = itertools.count()
+    cancelled = []
+
+    async def attempt():
+        if next(calls) == 0:
+            try:
+                await asyncio.sleep(0.5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return {"who": "primary"}
+        return {"who": "hedge"}
+
+    result, fired, won = asyncio.run(run_hedged_async(policy, "composer", attempt))
+    assert result == {"who": "hedge"} and fired and won
+    assert cancelled == [True]
+    assert policy.info()["losers_cancelled"] == 1
+
+
+def test_hedge_rate_is_capped():
+    policy = HedgePolicy(percentile=50, max_rate=0.25, min_samples=5, min_delay_s=0.0)
+    _warm(policy, latency=0.001)
+
+    def attempt():
+        time.sleep(0.01)
+        return {"ok": True}
+
+    for _ in range(8):
+        run_hedged(policy, "composer", attempt, timeout=2.0)
+    info = policy.info()
+    assert info["calls"] == 8
+    assert info["hedges_fired"] <= 0.25 * info["calls"]
+
+
+def test_no_hedging_before_enough_samples():
+    policy = HedgePolicy(min_samples=20)
+    result, fired, won = run_hedged(policy, "auditor", lambda: {"ok": True})
+    assert result == {"ok": True} and not fired and not won
+
+
+def test_unhedgeable_call_runs_inline():
+    import threading
+
+    policy = HedgePolicy(min_samples=20)
+    caller = threading.get_ident()
+    ran_on = []
+
+    def attempt():
+        ran_on.append(threading.get_ident())
+        return {"ok": True}
+
+    run_hedged(policy, "auditor", attempt)
+    _warm(policy, "auditor")
+    policy.max_rate = 0.0
+    run_hedged(policy, "auditor", attempt)
+    assert ran_on == [caller, caller]
+
+
+def test_sub_stages_follow_their_parent_hedging(monkeypatch):
+    monkeypatch.setenv("LLM_HEDGE_STAGES", "composer")
+    assert llm._hedging("composer_area", None) and llm._hedging("composer_batch", None)
+    assert not llm._hedging("auditor", None)
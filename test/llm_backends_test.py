@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from utils.llm_backends import load_router
+from workflow import run_workflow_async
+from workflow_async_test import PAYLOAD
+
+REGISTRY = """
+backends:
+  fast: {model: small-model}
+  large: {model: big-model}
+routes:
+  auditor: fast
+  composer: {primary: large, fallback: fast, fallback_latency_s: 1.0}
+"""
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    path = tmp_path / "llm_backends.yaml"
+    path.write_text(REGISTRY, encoding="utf-8")
+    monkeypatch.setenv("LLM_BACKENDS_PATH", str(path))
+    return path
+
+
+def test_stages_are_routed_and_tagged(fake_llm, registry):
+    out = asyncio.run(run_workflow_async(dict(PAYLOAD)))
+    tags = {c["stage"]: (c["backend"], c["model"]) for c in out["llm_calls"]}
+    assert tags == {"auditor": ("fast", "small-model"), "composer": ("large", "big-model")}
+
+
+def test_slow_primary_falls_back(registry):
+    router = load_router(registry)
+    assert router.choose("composer").name == "large"
+    for _ in range(3):
+        router.observe("large", 5.0)
+    picks = [router.choose("composer").name for _ in range(10)]
+    assert picks.count("fast") == 9  # every 10th call probes the primary
+    assert router.choose("unknown-stage").name == "default"
+
+
+def test_unknown_backend_in_route_is_rejected(tmp_path):
+    path = tmp_path / "bad.yaml"
+    path.write_text("routes:\n  auditor: nope\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_router(path)
+
+
+def test_composer_area_calls_use_the_composer_route(fake_llm, registry, monkeypatch):
+    assert load_router(registry).route_for("composer_area").primary == "large"
+    monkeypatch.setenv("COMPOSER_FANOUT", "1")
+    out = asyncio.run(run_workflow_async(dict(PAYLOAD)))
+    areas = {(c["backend"], c["model"]) for c in out["llm_calls"] if c["stage"] == "composer_area"}
+    assert areas == {("large", "big-model")}
+
+
+def test_composer_batch_calls_use_the_composer_route(registry):
+    router = load_router(registry)
+    assert router.route_for("composer_batch") == router.route_for("composer")
@@ -0,0 +1,57 @@
+from utils import llm, llm_cache
+from utils.llm_cache import ResponseCache, request_key
+
+
+def test_two_tier_roundtrip(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ResponseCache(path=path, ttl_s=60, mem_entries=2)
+    key = request_key("m", 0.2, "sys", {"b": 1, "a": 2})
+    assert key == request_key("m", 0.2, "sys", {"a": 2, "b": 1})
+    assert cache.get(key) is None
+
+    cache.put(key, {"findings": [1, 2]})
+    hit = cache.get(key)
+    assert hit == {"findings": [1, 2]}
+    hit["findings"].append(3)
+    assert cache.get(key) == {"findings": [1, 2]}
+
+    other = ResponseCache(path=path, ttl_s=60)
+    assert other.get(key) == {"findings": [1, 2]}
+    assert other.stats["disk_hits"] == 1
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = ResponseCache(path=tmp_path / "c.sqlite3", ttl_s=-1)
+    cache.put("k", {"x": 1})
+    assert cache.get("k") is None
+
+
+def test_call_json_served_from_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_CACHE", ResponseCache(path=tmp_path / "c.sqlite3"))
+    calls = []
+
+    def fake_complete(model, system_text, user_content, temperature, *args, **kwargs):
+        calls.append(user_content)
+        return {"ok": True}
+
+    monkeypatch.setattr(llm, "_complete_json", fake_complete)
+    assert llm.call_json("sys", {"a": 1}) == {"ok": True}
+    assert llm.call_json("sys", {"a": 1}) == {"ok": True}
+    assert len(calls) == 1
+
+
+def test_backend_is_part_of_the_key():
+    assert request_key("m", 0.2, "sys", "u", "http://a:8000/v1") != request_key("m", 0.2, "sys", "u", "http://b:8000/v1")
+
+
+def test_disk_hit_skips_recent_access_update(tmp_path):
+    cache = ResponseCache(path=tmp_path / "c.sqlite3", mem_entries=0, access_resolution_s=300)
+    cache.put("k", {"x": 1})
+    conn = cache.disk._conn()
+    conn.execute("UPDATE responses SET last_access = 1000 WHERE key = 'k'")
+    conn.commit()
+    before = conn.total_changes
+    assert cache.get("k") == {"x": 1}
+    assert conn.total_changes == before + 1
+    assert cache.get("k") == {"x": 1}
+    assert conn.total_changes == before + 1
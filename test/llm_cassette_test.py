@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from utils import llm
+from workflow import run_workflow, run_workflow_async
+from workflow_async_test import PAYLOAD
+
+
+def _offline(monkeypatch):
+    def boom(*args, **kwargs):
+        raise AssertionError("network call in replay mode")
+
+    async def boom_async(*args, **kwargs):
+        raise AssertionError("network call in replay mode")
+
+    monkeypatch.setattr(llm, "_complete_json", boom)
+    monkeypatch.setattr(llm, "_complete_json_async", boom_async)
+
+
+def test_record_then_replay_offline(fake_llm, monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_CASSETTE_DIR", str(tmp_path))
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "record")
+    recorded = run_workflow(dict(PAYLOAD))
+    assert len(fake_llm) == 2
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    _offline(monkeypatch)
+    replayed = run_workflow(dict(PAYLOAD))
+    replayed_async = asyncio.run(run_workflow_async(dict(PAYLOAD)))
+    assert replayed["recommendations"] == recorded["recommendations"]
+    assert replayed_async["findings"] == recorded["findings"]
+    assert llm.metrics()["cassette"]["replayed"] >= 4
+
+
+def test_replay_miss_is_an_llm_error(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_CASSETTE_DIR", str(tmp_path))
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    _offline(monkeypatch)
+    with pytest.raises(llm.LLMError):
+        llm.call_json("sys", {"q": 1}, raise_on_error=True)
+
+
+def test_replay_injects_recorded_latency(monkeypatch, tmp_path):
+    from utils.llm_backends import get_router
+    from utils.llm_cassette import Cassette, cassette_key
+
+    Cassette(tmp_path, mode="record").put(
+        cassette_key(get_router().choose("default").model, 0.2, "sys", {"q": 1}), {}, {"ok": True}, latency_s=0.3
+    )
+    monkeypatch.setenv("LLM_CASSETTE_DIR", str(tmp_path))
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    monkeypatch.setenv("LLM_CASSETTE_REPLAY_LATENCY", "1")
+    _offline(monkeypatch)
+    assert llm.call_json("sys", {"q": 1}) == {"ok": True}
+    with pytest.raises(llm.LLMTimeoutError):
+        llm.call_json("sys", {"q": 1}, timeout=0.05, raise_on_error=True)
@@ -0,0 +1,22 @@
+import threading
+
+import pytest
+
+from utils import llm_transport
+
+httpx = pytest.importorskip("httpx")
+
+
+def test_client_is_created_once_across_threads(monkeypatch):
+    monkeypatch.setattr(llm_transport, "_SYNC_CLIENT", None)
+    monkeypatch.setattr(llm_transport, "_SYNC_TRANSPORT", None)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(llm_transport.get_http_client())) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(c) for c in seen}) == 1
+    metrics = llm_transport.pool_metrics()
+    assert metrics["connections_open"] == 0
+    assert "waits" in metrics
@@ -0,0 +1,120 @@
+import asyncio
+
+from agents import recommendation_composer
+from agents.intake_agent import normalize
+from conftest import COMPOSE_REPLY
+from utils import llm
+from utils.deadline import Deadline, shared_deadline, use_deadline
+from utils.llm import record_llm_calls
+from utils.microbatch import MicroBatcher
+from utils.models import AuditResult, NormalizedInput
+from workflow_async_test import PAYLOAD
+
+
+def test_concurrent_submits_share_one_batch():
+    seen = []
+
+    async def run_batch(group, items):
+        seen.append((group, list(items)))
+        return [f"{group}:{x}" for x in items]
+
+    batcher = MicroBatcher(run_batch, window_s=0.02, max_batch=3)
+
+    async def go():
+        return await asyncio.gather(*(batcher.submit(g, x) for g, x in [("a", 1), ("a", 2), ("b", 3), ("a", 4)]))
+
+    assert asyncio.run(go()) == ["a:1", "a:2", "b:3", "a:4"]
+    assert sorted(seen) == [("a", [1, 2, 4]), ("b", [3])]
+    assert batcher.info()["largest"] == 3
+
+
+def test_item_exception_reaches_only_its_caller():
+    async def run_batch(group, items):
+        return [ValueError("bad") if x == 2 else x for x in items]
+
+    batcher = MicroBatcher(run_batch, window_s=0.01)
+
+    async def go():
+        return await asyncio.gather(batcher.submit("g", 1), batcher.submit("g", 2), return_exceptions=True)
+
+    ok, err = asyncio.run(go())
+    assert ok == 1 and isinstance(err, ValueError)
+
+
+def test_composer_batch_splits_and_falls_back(fake_llm, monkeypatch):
+    monkeypatch.setenv("COMPOSER_BATCH_ENABLED", "1")
+    monkeypatch.setattr(recommendation_composer, "_BATCHER", None)
+    prompts = []
+
+    async def fake(model, system_text, user_content, temperature, *args, **kwargs):
+        prompts.append(system_text)
+        if "BATCH MODE" in system_text:
+            assert set(user_content["buildings"]) == {"b0", "b1"}
+            return {"results": {"b0": COMPOSE_REPLY, "b1": "not a reply"}}
+        return COMPOSE_REPLY
+
+    monkeypatch.setattr(llm, "_complete_json_async", fake)
+    normalized = NormalizedInput(**normalize(dict(PAYLOAD)))
+    findings = AuditResult(findings=[])
+
+    async def one():
+        with record_llm_calls() as calls:
+            recs = await recommendation_composer.compose_recommendations_async(normalized, findings)
+        return recs, calls
+
+    async def go():
+        return await asyncio.gather(one(), one())
+
+    (recs0, calls0), (recs1, calls1) = asyncio.run(go())
+    assert [p.count("BATCH MODE") for p in prompts] == [1, 0]
+    assert recs0.recommendations[0].action == recs1.recommendations[0].action == "Switch to LED bulbs"
+    assert [c["stage"] for c in calls0] == ["composer_batch"]
+    assert [c["stage"] for c in calls1] == ["composer_batch", "composer"]
+    assert calls0[0]["shared_by"] == 2
+
+
+def test_batches_keep_priority_and_fallbacks_get_only_the_remaining_budget(fake_llm, monkeypatch):
+    monkeypatch.setenv("COMPOSER_BATCH_ENABLED", "1")
+    monkeypatch.setattr(recommendation_composer, "_BATCHER", None)
+    seen = []
+
+    async def fake(model, system_text, user_content, temperature, timeout=None, *args, **kwargs):
+        batch = "BATCH MODE" in system_text
+        seen.append(("batch" if batch else "single", llm.current_priority(), timeout))
+        if batch:
+            await asyncio.sleep(0.25)
+            return {"results": {}}
+        return COMPOSE_REPLY
+
+    monkeypatch.setattr(llm, "_complete_json_async", fake)
+    normalized = NormalizedInput(**normalize(dict(PAYLOAD)))
+    findings = AuditResult(findings=[])
+
+    async def one(priority):
+        deadline = Deadline.after(10, {"composer": 0.4})
+        with llm.llm_priority(priority), use_deadline(deadline):
+            return await recommendation_composer.compose_recommendations_async(normalized, findings)
+
+    async def go():
+        return await asyncio.gather(one("interactive"), one("interactive"), one("batch"))
+
+    asyncio.run(go())
+    batches = [s for s in seen if s[0] == "batch"]
+    assert [p for _, p, _ in batches] == ["interactive"]
+    singles = [s for s in seen if s[0] == "single"]
+    # The two identical interactive retries coalesce into one call.
+    assert sorted(p for _, p, _ in singles) == ["batch", "interactive"]
+    retried = [t for _, p, t in singles if p == "interactive"]
+    assert all(t is not None and t < 0.2 for t in retried)
+
+
+def test_shared_deadline_is_cancelled_only_with_every_run():
+    a, b = Deadline.after(1), Deadline.after(5)
+    with shared_deadline([a, b]) as merged:
+        assert merged.expires_at == b.expires_at
+        a.cancel("gone")
+        assert not merged.cancelled
+        b.cancel("gone")
+        assert merged.cancelled
+    with shared_deadline([a, None]) as merged:
+        assert merged is None
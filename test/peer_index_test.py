@@ -0,0 +1,88 @@
+import random
+
+import numpy as np
+import pytest
+
+from agents import efficiency_auditor
+from agents.intake_agent import normalize
+from utils.peer_index import (
+    PeerIndex, build_peer_index, get_peer_index, record_observation, segment_keys, update_peer_index,
+)
+from utils import peer_index
+from workflow_async_test import PAYLOAD
+
+
+@pytest.fixture(autouse=True)
+def _fresh_index_cache(monkeypatch):
+    monkeypatch.setattr(peer_index, "_INDEX_KEY", None)
+
+
+def _rows(n, seed=3):
+    rng = random.Random(seed)
+    return [
+        {
+            "building_type": rng.choice(["home", "Small Office"]),
+            "floor_area_m2": rng.choice([80, 120, 400, 2000]),
+            "monthly_kWh": rng.uniform(100, 8000),
+        }
+        for _ in range(n)
+    ]
+
+
+def _brute(rows, key, value):
+    peers = [r["monthly_kWh"] / r["floor_area_m2"] for r in rows if key in segment_keys(r["building_type"], r["floor_area_m2"])]
+    return round(100.0 * sum(p <= value for p in peers) / len(peers), 1), len(peers)
+
+
+def test_percentiles_match_a_linear_scan(tmp_path):
+    rows = _rows(2000)
+    assert build_peer_index(tmp_path, rows) == 2000
+    index = PeerIndex(tmp_path)
+    assert isinstance(index.values, np.memmap)
+    for value in (0.5, 5.0, 20.0, 60.0):
+        got = index.percentile(value, "small_office", 120, min_samples=30)
+        assert got["segment"] == "small_office/small"
+        assert (got["percentile"], got["peers"]) == _brute(rows, "small_office/small", value)
+
+
+def test_small_segments_fall_back_to_broader_ones(tmp_path):
+    build_peer_index(tmp_path, _rows(200) + [{"building_type": "clinic", "floor_area_m2": 300, "monthly_kWh": 900}])
+    index = PeerIndex(tmp_path)
+    assert index.percentile(3.0, "clinic", 300, min_samples=30)["segment"] == "*/medium"
+    assert index.percentile(3.0, None, 0, min_samples=30)["segment"] == "*/*"
+    assert index.percentile(3.0, "clinic", 300, min_samples=10_000) is None
+
+
+def test_incremental_update_equals_full_rebuild(tmp_path):
+    rows, extra = _rows(500), _rows(300, seed=9)
+    build_peer_index(tmp_path / "inc", rows)
+    for r in extra:
+        assert record_observation(tmp_path / "inc", r["building_type"], r["floor_area_m2"], r["monthly_kWh"])
+    assert not record_observation(tmp_path / "inc", "home", 0, 100)
+    assert update_peer_index(tmp_path / "inc") == 300
+    assert update_peer_index(tmp_path / "inc") == 0
+
+    build_peer_index(tmp_path / "full", rows + extra)
+    inc, full = PeerIndex(tmp_path / "inc"), PeerIndex(tmp_path / "full")
+    assert inc.segments == full.segments
+    assert np.array_equal(inc.values, full.values)
+
+
+def test_auditor_reports_the_peer_percentile(tmp_path, monkeypatch, fake_llm):
+    monkeypatch.setenv("PEER_INDEX_PATH", str(tmp_path))
+    monkeypatch.setenv("PEER_INDEX_CHECK_S", "0")
+    monkeypatch.setenv("PEER_INDEX_RECORD", "1")
+    build_peer_index(tmp_path, _rows(500))
+    assert get_peer_index() is not None
+
+    out = efficiency_auditor.audit(normalize(dict(PAYLOAD, building_type="Home")), max_findings=8)
+    peers = out["analysis_summary"]["peer_benchmark"]
+    assert peers["segment"].startswith("home/") and 0 <= peers["percentile"] <= 100
+    assert '"peer_benchmark"' in fake_llm[0][1]
+    assert update_peer_index(tmp_path) == 1
+
+
+def test_no_index_means_no_peer_benchmark(tmp_path, monkeypatch, fake_llm):
+    monkeypatch.setenv("PEER_INDEX_PATH", str(tmp_path / "missing"))
+    out = efficiency_auditor.audit(normalize(dict(PAYLOAD)), max_findings=3)
+    assert "peer_benchmark" not in out["analysis_summary"]
@@ -0,0 +1,63 @@
+import asyncio
+import json
+import random
+
+from utils.portfolio import PortfolioStats
+from utils.quantile_sketch import KLLSketch
+from workflow import run_portfolio_async
+from workflow_async_test import PAYLOAD
+
+
+def _rank_error(values, q, estimate):
+    values = sorted(values)
+    rank = sum(v <= estimate for v in values) / len(values)
+    return abs(rank - q)
+
+
+def test_sketch_quantiles_are_accurate_in_bounded_space():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(3, 1) for _ in range(100_000)]
+    sketch = KLLSketch(k=200, seed=1)
+    sketch.extend(values)
+    assert sketch.n == len(values)
+    assert sum(len(lv) for lv in sketch.levels) < 1000
+    for q in (0.1, 0.5, 0.9, 0.99):
+        assert _rank_error(values, q, sketch.quantile(q)) < 0.02
+    assert (sketch.quantile(0), sketch.quantile(1)) == (min(values), max(values))
+
+
+def test_small_streams_are_exact():
+    sketch = KLLSketch(k=200)
+    sketch.extend([5, 1, 4, 2, 3])
+    assert sketch.quantiles([0.2, 0.5, 0.9]) == [1, 3, 5]
+    assert KLLSketch().quantile(0.5) is None
+
+
+def test_merged_worker_sketches_match_one_stream():
+    rng = random.Random(2)
+    values = [rng.uniform(0, 100) for _ in range(60_000)]
+    workers = [KLLSketch(k=200, seed=i) for i in range(3)]
+    for i, v in enumerate(values):
+        workers[i % 3].update(v)
+    # As if sent between processes.
+    merged = KLLSketch.from_dict(json.loads(json.dumps(workers[0].to_dict())), seed=0)
+    for w in workers[1:]:
+        merged.merge(KLLSketch.from_dict(json.loads(json.dumps(w.to_dict()))))
+    assert merged.n == len(values)
+    for q in (0.1, 0.5, 0.9):
+        assert _rank_error(values, q, merged.quantile(q)) < 0.02
+
+
+def test_portfolio_run_folds_results_into_sketches(fake_llm):
+    sites = (dict(PAYLOAD, monthly_kWh=200 + 40 * i) for i in range(12))
+    stats = asyncio.run(run_portfolio_async(sites, concurrency=4))
+    assert (stats.sites, stats.failed) == (12, 0)
+
+    q = stats.quantiles()
+    assert q["energy_intensity_kwh_per_m2"]["count"] == 12
+    assert q["energy_intensity_kwh_per_m2"]["p50"] == sorted((200 + 40 * i) / 120 for i in range(12))[5]
+    assert q["kwh_saved_per_month"]["p10"] <= q["kwh_saved_per_month"]["p90"]
+
+    other = PortfolioStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+    stats.merge(other)
+    assert stats.summary()["sites"] == 24 and stats.quantiles()["lkr_saved_per_month"]["count"] == 24
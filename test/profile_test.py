@@ -0,0 +1,65 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from agents import efficiency_auditor, impact_estimator
+from agents.intake_agent import normalize
+from api.main import app
+from utils.models import NormalizedInput, Recommendation, Recommendations
+from utils.profile import building_profile, profile_of
+from utils.savings import kwh_saved_per_month
+from workflow_async_test import PAYLOAD
+
+BUILDING = {
+    "floor_area_m2": 100,
+    "monthly_kWh": 1000,
+    "ac_units": [{"watt": 1000, "hours_per_day": 10, "count": 2}],
+    "lighting": {"bulbs": 10, "watt_per_bulb": 10, "hours_per_day": 5},
+}
+
+
+def test_normalize_attaches_the_profile():
+    profile = NormalizedInput(**normalize(BUILDING)).profile
+    assert profile.ac_kWh_per_month == pytest.approx(600)
+    assert profile.lighting_kWh_per_month == pytest.approx(15)
+    assert (profile.ac_share, profile.lighting_share) == pytest.approx((0.6, 0.015))
+    assert profile.other_share == pytest.approx(0.385)
+    assert profile.energy_intensity_kwh_per_m2 == 10
+    assert profile.connected_load_W == 2100
+    assert building_profile(NormalizedInput(**{**normalize(BUILDING), "profile": None})) == profile
+
+
+def test_end_use_shares_are_capped_at_the_bill():
+    profile = profile_of(normalize(dict(BUILDING, monthly_kWh=500)))
+    assert (profile.ac_share, profile.lighting_share, profile.other_share) == (1.0, 0.0, 0.0)
+
+
+def test_typed_audit_skips_dict_conversion_unless_the_llm_is_called(fake_llm, monkeypatch):
+    normalized = NormalizedInput(**normalize(dict(PAYLOAD)))
+    dumped = []
+    original = NormalizedInput.model_dump
+    monkeypatch.setattr(NormalizedInput, "model_dump", lambda self, **kw: dumped.append(1) or original(self, **kw))
+
+    out = efficiency_auditor.audit(normalized, max_findings=3)
+    assert out["analysis_summary"]["llm_gate"]["decision"] == "skip" and dumped == []
+
+    efficiency_auditor.audit(normalized, max_findings=8)
+    assert dumped and "profile" not in fake_llm[0][1]
+
+
+def test_kwh_saved_matches_for_models_and_dicts():
+    rec = Recommendation(action="a", pct_kwh_reduction_min=150, pct_kwh_reduction_max=200, est_cost=0)
+    assert kwh_saved_per_month(rec, 400) == kwh_saved_per_month(rec.model_dump(), 400) == 400
+    assert kwh_saved_per_month({"kwh_saved_per_month": -3, "pct_kwh_reduction_min": 10}, 400) == 0
+
+
+def test_estimator_reads_end_use_shares_from_the_profile():
+    normalized = NormalizedInput(**normalize(BUILDING))
+    plan = impact_estimator.estimate_impact(normalized, Recommendations())
+    assert "AC ~60.0%, lighting ~1.5%, other ~38.5%" in plan.plan_text
+
+
+def test_api_rederives_a_client_sent_profile():
+    forged = dict(normalize(BUILDING), profile={"ac_share": 0.99, "lighting_share": 0.01, "other_share": 0.0})
+    res = TestClient(app).post("/v1/estimate", json={"normalized": forged, "recommendations": {"recommendations": []}})
+    assert res.status_code == 200
+    assert "AC ~60.0%" in res.json()["plan_text"]
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from utils.rate_limit import RateLimiter, RateLimitTimeout
+
+
+def test_interactive_overtakes_queued_batch():
+    limiter = RateLimiter(rpm=600, tpm=0)  # one request every 0.1s once the burst is spent
+    limiter.buckets._state["req"] = (0.0, time.monotonic())
+    order = []
+
+    def call(name, priority):
+        limiter.acquire(1, priority)
+        order.append(name)
+
+    batch = [threading.Thread(target=call, args=(f"batch{i}", "batch")) for i in range(3)]
+    for t in batch:
+        t.start()
+    time.sleep(0.02)
+    urgent = threading.Thread(target=call, args=("interactive", "interactive"))
+    urgent.start()
+    for t in batch + [urgent]:
+        t.join()
+    assert order.index("interactive") <= 1
+    info = limiter.info()["by_priority"]
+    assert info["batch"]["calls"] == 3 and info["interactive"]["calls"] == 1
+
+
+def test_timeout_when_bucket_is_empty():
+    limiter = RateLimiter(rpm=1, tpm=0)
+    assert limiter.acquire(1) == pytest.approx(0.0, abs=0.01)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(1, timeout=0.1)
+    assert limiter.info()["queued"] == 0
+
+
+def test_shared_bucket_across_instances(tmp_path):
+    a = RateLimiter(rpm=1, tpm=0, shared_path=tmp_path / "rl.sqlite3")
+    b = RateLimiter(rpm=1, tpm=0, shared_path=tmp_path / "rl.sqlite3")
+    a.acquire(1)
+    with pytest.raises(RateLimitTimeout):
+        b.acquire(1, timeout=0.1)
+
+
+def test_shared_bucket_wait_does_not_block_the_event_loop(tmp_path):
+    import asyncio
+    import sqlite3
+
+    path = tmp_path / "rl.sqlite3"
+    limiter = RateLimiter(rpm=600, tpm=0, shared_path=path)
+    holder = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, holder.execute, args=("COMMIT",)).start()
+    ticks = []
+
+    async def ticker():
+        for _ in range(10):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    async def go():
+        return await asyncio.gather(limiter.acquire_async(1), ticker())
+
+    started = time.monotonic()
+    asyncio.run(go())
+    assert len([t for t in ticks if t - started < 0.25]) >= 5
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+import pytest
+
+from agents.intake_agent import normalize
+from utils.rule_pack import RULES_PATH, RulePackError, RulePackSource, load_rule_pack
+
+BUILDING = normalize({
+    "floor_area_m2": 100,
+    "monthly_kWh": 3000,
+    "ac_units": [{"watt": 1200, "hours_per_day": 20, "star_rating": 2}, {"watt": 900, "hours_per_day": 6}],
+    "lighting": {"bulbs": 10, "watt_per_bulb": 40, "hours_per_day": 6},
+})
+
+
+def _bump(path, text):
+    path.write_text(text, encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_shipped_pack_emits_findings_in_pass_order():
+    findings = load_rule_pack().evaluate(BUILDING)
+    assert [f["issue"] for f in findings] == [
+        "AC unit 1 has low efficiency rating (2 stars)",
+        "AC unit 1 operates 20.0h/day (excessive usage)",
+        "High wattage bulbs (40.0W per bulb)",
+        "Very high energy intensity (30.0 kWh/m²/month)",
+        "AC unit 1 operates 20.0h/day (excessive)",
+    ]
+    assert findings[3]["reason"] == "Building uses 30.0 kWh/m²/month, well above average of 18"
+
+
+def test_per_rule_counters():
+    pack = load_rule_pack()
+    pack.evaluate(BUILDING)
+    stats = {s["id"]: s for s in pack.stats()}
+    assert stats["ac_low_star_rating"]["evaluations"] == 2 and stats["ac_low_star_rating"]["hits"] == 1
+    assert stats["intensity_above_average"]["hits"] == 0 and stats["intensity_above_average"]["hit_rate"] == 0
+    assert all(s["errors"] == 0 and s["total_ms"] >= 0 for s in stats.values())
+
+
+def test_hot_reload_keeps_counters_and_survives_a_broken_edit(tmp_path):
+    path = tmp_path / "rules.yaml"
+    shutil.copy(RULES_PATH, path)
+    source = RulePackSource(path, check_s=0)
+    source.get().evaluate(BUILDING)
+
+    _bump(path, path.read_text(encoding="utf-8").replace("min_star_rating: 3", "min_star_rating: 2"))
+    pack = source.get()
+    assert pack.benchmarks["ac_efficiency"]["min_star_rating"] == 2
+    assert not any("stars" in f["issue"] for f in pack.evaluate(BUILDING))
+    assert source.reloads == 1
+    assert {s["id"]: s for s in pack.stats()}["ac_low_star_rating"]["evaluations"] == 4
+
+    _bump(path, path.read_text(encoding="utf-8").replace("when: hours_per_day > 14", "when: hours_per_day >"))
+    assert source.get() is pack
+    assert source.get() is pack
+    info = source.info()
+    assert info["reload_errors"] == 1 and "lighting_extended_use" in info["last_error"]
+
+
+@pytest.mark.parametrize("expr, message", [
+    ("__import__('os').system('true')", "only min, max, abs, round"),
+    ("watt.__class__", "unknown benchmark"),
+    ("[x for x in range(3)]", "not allowed"),
+    ("lighting_hours > 2", "unknown name"),
+])
+def test_expressions_are_restricted(tmp_path, expr, message):
+    path = tmp_path / "rules.yaml"
+    path.write_text(
+        "rules:\n"
+        "  - {id: r, scope: ac_unit, area: AC, severity: low, confidence: 0.5, impact: 0,\n"
+        f"     issue: x, reason: y, when: \"{expr}\"}}\n",
+        encoding="utf-8",
+    )
+    with pytest.raises(RulePackError, match=message):
+        load_rule_pack(path)
@@ -0,0 +1,49 @@
+from agents import recommendation_composer
+from agents.impact_estimator import estimate_impact
+from agents.intake_agent import normalize
+from conftest import COMPOSE_REPLY
+from utils import llm, similarity_cache
+from utils.llm import record_llm_calls
+from utils.models import AuditResult, NormalizedInput
+from utils.similarity_cache import building_signature
+from workflow_async_test import PAYLOAD
+
+FINDINGS = AuditResult(findings=[{"area": "AC", "issue": "Long AC hours", "severity": "high", "reason": "14 h/day"}])
+
+
+def _building(**overrides):
+    return NormalizedInput(**normalize(dict(PAYLOAD, **overrides)))
+
+
+def test_signature_ignores_small_differences():
+    a = building_signature(_building(floor_area_m2=118, monthly_kWh=315), FINDINGS)
+    b = building_signature(_building(floor_area_m2=122, monthly_kWh=325), FINDINGS)
+    assert a == b
+    ac = [{"watt": 1200, "hours_per_day": 14, "star_rating": 5}]
+    assert building_signature(_building(ac_units=ac), FINDINGS) != a
+    assert building_signature(_building(), AuditResult(findings=[])) != a
+
+
+def test_similar_building_skips_llm_and_rescales(fake_llm, monkeypatch):
+    monkeypatch.setenv("COMPOSER_SIMILARITY_CACHE", "1")
+    monkeypatch.setenv("COMPOSER_SIMILARITY_CACHE_PATH", "")
+    monkeypatch.setattr(similarity_cache, "_CACHE", None)
+    reply = {"recommendations": [dict(COMPOSE_REPLY["recommendations"][0], kwh_saved_per_month=30, payback_months=4)]}
+
+    def fake(model, system_text, user_content, temperature, *args, **kwargs):
+        fake_llm.append(system_text)
+        return reply
+
+    monkeypatch.setattr(llm, "_complete_json", fake)
+    first = recommendation_composer.compose_recommendations(_building(floor_area_m2=118, monthly_kWh=315), FINDINGS)
+    assert first.recommendations[0].kwh_saved_per_month == 30
+
+    other = _building(floor_area_m2=122, monthly_kWh=325)
+    with record_llm_calls() as calls:
+        recs = recommendation_composer.compose_recommendations(other, FINDINGS)
+    assert len(fake_llm) == 1
+    assert [c["source"] for c in calls] == ["similar"]
+    rec = recs.recommendations[0]
+    assert rec.action == "Switch to LED bulbs" and rec.kwh_saved_per_month is None
+    plan = estimate_impact(other, recs)
+    assert plan.all_actions[0].kWh_saved_per_month != 30
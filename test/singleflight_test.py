@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+from utils.singleflight import SingleFlight
+
+
+def test_threads_share_one_call():
+    sf = SingleFlight()
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"n": 1}
+
+    threads = [threading.Thread(target=lambda: results.append(sf.do("k", work))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"n": 1}] * 8
+    assert sf.info()["coalesced"] == 7
+
+
+def test_tasks_share_one_call():
+    sf = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"n": 2}
+
+    async def main():
+        return await asyncio.gather(*(sf.do_async("k", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"n": 2}] * 5
+    assert len(calls) == 1
+    assert sf.info()["coalesced"] == 4
+
+
+def test_cancelled_leader_does_not_fail_followers():
+    sf = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"n": 3}
+
+    async def main():
+        leader = asyncio.ensure_future(sf.do_async("k", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(sf.do_async("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        return leader, result
+
+    leader, result = asyncio.run(main())
+    assert leader.cancelled()
+    assert result == {"n": 3}
+    assert len(calls) == 1
+    assert sf.info()["in_flight"] == 0
+
+
+def test_work_is_cancelled_when_every_caller_leaves():
+    sf = SingleFlight()
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        callers = [asyncio.ensure_future(sf.do_async("k", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for c in callers:
+            c.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert cancelled == [True]
+    assert sf.info()["in_flight"] == 0
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from agents import speculation
+from agents.speculation import SpeculationStats, new_high_findings
+from conftest import AUDIT_REPLY, COMPOSE_REPLY
+from utils import llm
+from utils.models import AuditResult
+from workflow import run_workflow, run_workflow_async
+from workflow_async_test import PAYLOAD
+
+NEW_HIGH = {"findings": [{"area": "envelope", "issue": "Single glazing", "severity": "high", "reason": "West facade"}]}
+
+
+def _fake(monkeypatch, audit_reply, audit_s=0.2, compose_s=0.1):
+    """Stub both LLM paths; `seen` gets (stage, user_content) per call and `spans` its (stage, start, end)."""
+    seen, spans = [], []
+
+    async def fake_async(model, system_text, user_content, temperature, *args, **kwargs):
+        composer = "recommendations" in system_text
+        seen.append(("composer" if composer else "auditor", user_content))
+        start = time.monotonic()
+        await asyncio.sleep(compose_s if composer else audit_s)
+        spans.append(("composer" if composer else "auditor", start, time.monotonic()))
+        return COMPOSE_REPLY if composer else audit_reply
+
+    def fake_sync(model, system_text, user_content, temperature, *args, **kwargs):
+        composer = "recommendations" in system_text
+        seen.append(("composer" if composer else "auditor", user_content))
+        start = time.monotonic()
+        time.sleep(compose_s if composer else audit_s)
+        spans.append(("composer" if composer else "auditor", start, time.monotonic()))
+        return COMPOSE_REPLY if composer else audit_reply
+
+    monkeypatch.setattr(llm, "_complete_json_async", fake_async)
+    monkeypatch.setattr(llm, "_complete_json", fake_sync)
+    monkeypatch.setattr(speculation, "_STATS", SpeculationStats())
+    return seen, spans
+
+
+def test_new_high_findings_matches_on_area_and_issue():
+    rules = AuditResult(findings=[{"area": "AC", "issue": "Old units", "severity": "high", "reason": "2 star"}])
+    final = AuditResult(findings=[
+        {"area": "AC", "issue": "old units ", "severity": "high", "reason": "2 star"},
+        {"area": "standby", "issue": "Phantom loads", "severity": "low", "reason": "TV"},
+    ])
+    assert new_high_findings(rules, final) == []
+    assert len(new_high_findings(rules, AuditResult(**NEW_HIGH))) == 1
+
+
+def test_accepted_speculation_overlaps_the_auditor(fake_llm, monkeypatch):
+    monkeypatch.setenv("COMPOSER_SPECULATE", "1")
+    seen, spans = _fake(monkeypatch, AUDIT_REPLY)
+    for run in (lambda: asyncio.run(run_workflow_async(dict(PAYLOAD))), lambda: run_workflow(dict(PAYLOAD))):
+        del spans[:]
+        out = run()
+        ran = {stage: (start, end) for stage, start, end in spans}
+        assert ran["composer"][0] < ran["auditor"][1], "the composer started only after the audit"
+        assert out["plan"]["all_actions"][0]["action"] == "Switch to LED bulbs"
+        assert [c.get("speculative") for c in out["llm_calls"] if c["stage"] == "composer"] == ["accepted"]
+    assert sorted(s for s, _ in seen) == ["auditor", "auditor", "composer", "composer"]
+    info = speculation.get_speculation_stats().info()
+    assert info["accepted"] == 2 and info["hit_rate"] == 1.0 and info["avg_saved_s"] > 0
+
+
+def test_new_high_finding_discards_and_recomposes(fake_llm, monkeypatch):
+    monkeypatch.setenv("COMPOSER_SPECULATE", "1")
+    seen, _ = _fake(monkeypatch, NEW_HIGH)
+    out = asyncio.run(run_workflow_async(dict(PAYLOAD)))
+    composer = [c for c in out["llm_calls"] if c["stage"] == "composer"]
+    assert [c.get("speculative") for c in composer] == ["discarded", None]
+    last = [u for s, u in seen if s == "composer"][-1]
+    assert "Single glazing" in str(last)
+    info = speculation.get_speculation_stats().info()
+    assert info["discarded"] == 1 and info["hit_rate"] == 0.0
+
+
+def test_speculation_is_off_by_default(fake_llm, monkeypatch):
+    monkeypatch.delenv("COMPOSER_SPECULATE", raising=False)
+    out = run_workflow(dict(PAYLOAD))
+    assert [c["stage"] for c in out["llm_calls"]] == ["auditor", "composer"]
+    assert all("speculative" not in c for c in out["llm_calls"])
@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from utils.json_stream import JsonItemStream
+from workflow import run_workflow, run_workflow_stream
+from workflow_async_test import PAYLOAD
+
+
+def test_items_close_incrementally():
+    parser = JsonItemStream(["recommendations"])
+    text = '```json\n{"recommendations": [{"action": "a }", "steps": ["x\\"y"]}, {"action": "b"}]}\n```'
+    seen, first_at = [], None
+    for ch in text:
+        seen.extend(parser.feed(ch))
+        if seen and first_at is None:
+            first_at = len(parser.text)
+    assert [i["action"] for i in seen] == ["a }", "b"]
+    assert first_at < text.index('{"action": "b"')
+
+
+async def _collect(payload):
+    return [ev async for ev in run_workflow_stream(payload)]
+
+
+def test_stream_matches_batch_result(fake_llm):
+    payload = dict(PAYLOAD, planner={"enabled": False})
+    events = asyncio.run(_collect(dict(payload)))
+    kinds = [e["event"] for e in events]
+    assert kinds[0] == "findings" and kinds[-1] == "result" and "action" in kinds
+    assert events[1]["recommendation"]["action"] == "Switch to LED bulbs"
+    assert events[1]["impact"]["kWh_saved_per_month"] > 0
+
+    result = events[-1]["result"]
+    assert result["recommendations"] == run_workflow(dict(payload))["recommendations"]
+    assert result["stream"]["actions_streamed"] == 1
+    composer = [c for c in result["llm_calls"] if c["stage"] == "composer"][0]
+    assert composer["streamed"] and composer["ttft_s"] <= composer["first_item_s"]
+
+
+def test_ndjson_endpoint(fake_llm):
+    client = TestClient(app)
+    with client.stream("POST", "/v1/run/stream", json={"payload": dict(PAYLOAD)}) as resp:
+        lines = [json.loads(line) for line in resp.iter_lines() if line]
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert [e["event"] for e in lines][-1] == "result"
@@ -0,0 +1,40 @@
+from utils import llm
+from utils.wire_schema import AUDIT_WIRE, RECOMMENDATIONS_WIRE
+from workflow import run_workflow
+from workflow_async_test import PAYLOAD
+
+SHORT_RECS = {"r": [{"a": "Switch to LED bulbs", "st": ["Buy LEDs"], "mn": 5, "mx": 10, "c": 5000,
+                     "n": None, "d": "low", "k": None, "p": None}]}
+SHORT_FINDINGS = {"f": [{"a": "standby", "i": "Devices on standby", "s": "low", "r": "Phantom loads",
+                         "c": 0.8, "k": 2.0}]}
+
+
+def test_schema_is_strict_and_expands():
+    schema = RECOMMENDATIONS_WIRE.json_schema()
+    item = schema["properties"]["r"]["items"]
+    assert item["additionalProperties"] is False
+    assert set(item["required"]) == set(item["properties"])
+    expanded = RECOMMENDATIONS_WIRE.expand(SHORT_RECS)["recommendations"][0]
+    assert expanded["action"] == "Switch to LED bulbs" and "notes" not in expanded
+    long_form = {"findings": [{"area": "AC"}]}
+    assert AUDIT_WIRE.expand(long_form) is long_form
+
+
+def test_structured_mode_sends_schema_and_caps(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.setenv("LLM_STRUCTURED_OUTPUT", "1")
+    monkeypatch.setenv("LLM_MAX_TOKENS_COMPOSER", "700")
+    sent = []
+
+    def fake(model, system_text, user_content, temperature, *args, options=None, **kwargs):
+        sent.append(options)
+        fmt = options["response_format"]["json_schema"]["name"]
+        return SHORT_RECS if fmt == "recommendations" else SHORT_FINDINGS
+
+    monkeypatch.setattr(llm, "_complete_json", fake)
+    out = run_workflow(dict(PAYLOAD))
+    assert out["plan"]["all_actions"][0]["action"] == "Switch to LED bulbs"
+    assert any(f.get("issue") == "Devices on standby" for f in out["findings"]["findings"])
+    composer = [o for o in sent if o["response_format"]["json_schema"]["name"] == "recommendations"][0]
+    assert composer["max_tokens"] == 700
+    assert all(c["structured"] for c in out["llm_calls"])
@@ -0,0 +1,28 @@
+import asyncio
+
+from workflow import run_workflow, run_workflow_async
+
+PAYLOAD = {
+    "floor_area_m2": 120,
+    "monthly_kWh": 320,
+    "tariff_LKR_per_kWh": 62,
+    "ac_units": [{"watt": 1200, "hours_per_day": 14, "star_rating": 2}],
+    "lighting": {"bulbs": 10, "watt_per_bulb": 40, "hours_per_day": 6},
+}
+
+
+def test_async_matches_sync(fake_llm):
+    sync_out = run_workflow(dict(PAYLOAD))
+    async_out = asyncio.run(run_workflow_async(dict(PAYLOAD)))
+    assert async_out["recommendations"] == sync_out["recommendations"]
+    assert async_out["findings"] == sync_out["findings"]
+    assert sync_out["findings"]["findings"]
+    assert sync_out["plan"]["all_actions"][0]["action"] == "Switch to LED bulbs"
+    assert [c["stage"] for c in async_out["llm_calls"]] == ["auditor", "composer"]
+    assert all(c["queue_wait_s"] == 0.0 for c in async_out["llm_calls"])
+
+
+def test_legacy_async_path(fake_llm):
+    payload = dict(PAYLOAD, planner={"enabled": False})
+    out = asyncio.run(run_workflow_async(payload))
+    assert set(out) >= {"input", "findings", "recommendations", "plan"}
@@ -0,0 +1,310 @@
+from __future__ import annotations
+import hashlib
+import itertools
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from utils.env import env_flag, env_float, env_int
+from utils.llm_cache import ROOT, prompt_fingerprint
+from utils.models import NormalizedInput
+
+GRID_PATH = ROOT / "data" / "archetypes.yaml"
+STORE_PATH = ROOT / ".cache" / "archetypes.sqlite3"
+
+
+def load_grid(path: Optional[Path] = None) -> Dict[str, Any]:
+    with open(path or GRID_PATH, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def _as_list(v: Any) -> List[Any]:
+    return list(v) if isinstance(v, (list, tuple)) else [v]
+
+
+def archetype_payloads(grid: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(archetype id, raw payload) for every point of the grid in data/archetypes.yaml."""
+    ac_watt = float(grid.get("ac_watt", 1200))
+    tariff = float(grid.get("tariff_LKR_per_kWh", 62))
+    ac_variants = [(0, None, None)] + [
+        (n, h, s)
+        for n in _as_list(grid.get("ac_count", [])) if int(n) > 0
+        for h in _as_list(grid.get("ac_hours_per_day", [8]))
+        for s in _as_list(grid.get("ac_star_rating", [3]))
+    ]
+    for (kind, spec), (n_ac, ac_hours, star), (light, watt), light_hours in itertools.product(
+        (grid.get("kinds") or {}).items(),
+        ac_variants,
+        (grid.get("lighting") or {"non_led": 40}).items(),
+        _as_list(grid.get("lighting_hours_per_day", 6)),
+    ):
+        bulbs = int(spec.get("bulbs", 10))
+        ac_kwh = n_ac * ac_watt * (ac_hours or 0) * 30 / 1000
+        light_kwh = bulbs * float(watt) * float(light_hours) * 30 / 1000
+        ac_id = f"ac{n_ac}" + (f"-{ac_hours}h-{star}star" if n_ac else "")
+        yield f"{kind}/{ac_id}/{light}-{light_hours}h", {
+            "floor_area_m2": float(spec.get("floor_area_m2", 100)),
+            "monthly_kWh": round(float(spec.get("base_load_kWh", 0)) + ac_kwh + light_kwh, 1),
+            "tariff_LKR_per_kWh": tariff,
+            "ac_units": [{"watt": ac_watt, "hours_per_day": ac_hours, "star_rating": star, "count": n_ac}] if n_ac else [],
+            "lighting": {"bulbs": bulbs, "watt_per_bulb": float(watt), "hours_per_day": float(light_hours)},
+        }
+
+
+def features(normalized: NormalizedInput) -> List[float]:
+    """
+    Scaled profile used for nearest-archetype matching; one unit in any
+    coordinate is roughly "a different building": 1.5x the floor area,
+    monthly kWh or tariff, one more AC unit, 4 more AC hours, 2 star
+    ratings, or the step from LED to a non-LED bulb.
+    """
+    units = [(u, max(int(u.count or 0), 1)) for u in normalized.ac_units]
+    n_ac = sum(n for _, n in units)
+    hours = sum(u.hours_per_day * n for u, n in units) / n_ac if n_ac else 0.0
+    star = sum(u.star_rating * n for u, n in units) / n_ac if n_ac else 0.0
+    lighting = normalized.lighting
+    log15 = math.log(1.5)
+    return [
+        math.log(max(normalized.floor_area_m2 or 0.0, 1.0)) / log15,
+        math.log(max(normalized.monthly_kWh or 0.0, 1.0)) / log15,
+        math.log(max(normalized.tariff_LKR_per_kWh or 0.0, 1.0)) / log15,
+        float(n_ac),
+        hours / 4.0,
+        star / 2.0,
+        (lighting.watt_per_bulb if lighting and lighting.bulbs > 0 else 0.0) / 16.0,
+    ]
+
+
+def distance(a: List[float], b: List[float]) -> float:
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+
+def exact_key(normalized: NormalizedInput) -> str:
+    material = json.dumps(
+        {"input": normalized.model_dump(), "fingerprint": prompt_fingerprint()}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def servable(normalized: NormalizedInput) -> bool:
+    """Archetypes are computed without a policy; requests with caps or goals need their own plan."""
+    p = normalized.policy
+    if p is None:
+        return True
+    return (
+        p.target_budget_LKR is None and p.payback_threshold_months is None
+        and p.co2_reduction_goal_pct is None and (p.max_disruption or "medium") == "medium"
+    )
+
+
+@dataclass(frozen=True)
+class StoredPlan:
+    key: str
+    kind: str  # "archetype" or "exact"
+    result: Dict[str, Any]
+    computed_at: float
+    features: Optional[List[float]] = None
+
+    @property
+    def age_s(self) -> float:
+        return max(time.time() - self.computed_at, 0.0)
+
+
+class ArchetypeStore:
+    """
+    SQLite table of precomputed pipeline results: one row per archetype
+    (matched by nearest features) and one per exact input refreshed in the
+    background (matched by exact_key). Archetype features are kept in memory
+    for the nearest-neighbour scan, which over a few hundred rows is cheap.
+    Exact rows are bounded: older than `max_exact_age_s` they are no longer
+    served, and every 64 exact writes those rows, and the oldest beyond
+    `max_exact` rows, are deleted (0 disables either limit).
+    """
+
+    def __init__(self, path: Path, max_exact: int = 10000, max_exact_age_s: float = 7 * 24 * 3600.0):
+        self.path = Path(path)
+        self.max_exact = max(0, int(max_exact))
+        self.max_exact_age_s = max(0.0, float(max_exact_age_s))
+        self._puts = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            " key TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " features TEXT,"
+            " result TEXT NOT NULL,"
+            " computed_at REAL NOT NULL)"
+        )
+        conn.commit()
+        self._archetypes: List[Tuple[str, List[float]]] = [
+            (key, json.loads(feats))
+            for key, feats in conn.execute("SELECT key, features FROM plans WHERE kind = 'archetype'")
+        ]
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, key: str, kind: str, result: Dict[str, Any], feats: Optional[List[float]] = None) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO plans (key, kind, features, result, computed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, kind, json.dumps(feats) if feats is not None else None,
+             json.dumps(result, ensure_ascii=False, default=str), time.time()),
+        )
+        conn.commit()
+        if kind == "archetype" and feats is not None:
+            with self._lock:
+                self._archetypes = [(k, f) for k, f in self._archetypes if k != key] + [(key, list(feats))]
+        if kind == "exact":
+            with self._lock:
+                self._puts += 1
+                sweep = self._puts % 64 == 0
+            if sweep:
+                self.prune()
+
+    def prune(self) -> None:
+        """Delete exact rows past max_exact_age_s, then the oldest beyond max_exact."""
+        conn = self._conn()
+        if self.max_exact_age_s > 0:
+            conn.execute(
+                "DELETE FROM plans WHERE kind = 'exact' AND computed_at < ?", (time.time() - self.max_exact_age_s,)
+            )
+        if self.max_exact > 0:
+            conn.execute(
+                "DELETE FROM plans WHERE key IN ("
+                " SELECT key FROM plans WHERE kind = 'exact' ORDER BY computed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_exact,),
+            )
+        conn.commit()
+
+    def get(self, key: str) -> Optional[StoredPlan]:
+        row = self._conn().execute(
+            "SELECT key, kind, result, computed_at, features FROM plans WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] == "exact" and self.max_exact_age_s > 0 and time.time() - row[3] > self.max_exact_age_s:
+            return None
+        return StoredPlan(row[0], row[1], json.loads(row[2]), row[3], json.loads(row[4]) if row[4] else None)
+
+    def nearest(self, feats: List[float]) -> Tuple[Optional[str], float]:
+        with self._lock:
+            candidates = list(self._archetypes)
+        best, best_d = None, math.inf
+        for key, f in candidates:
+            if len(f) != len(feats):
+                continue  # stored by an older features(); rerun the precompute job
+            d = distance(feats, f)
+            if d < best_d:
+                best, best_d = key, d
+        return best, best_d
+
+    def info(self) -> Dict[str, Any]:
+        row = self._conn().execute("SELECT COUNT(*) FROM plans WHERE kind = 'exact'").fetchone()
+        with self._lock:
+            return {"path": str(self.path), "archetypes": len(self._archetypes), "exact": int(row[0]) if row else 0}
+
+
+class Refresher:
+    """Background recomputation with at most one job in flight per key."""
+
+    def __init__(self, threads: int = 2):
+        self._pool = ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix="archetype-refresh")
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.scheduled = 0
+        self.failed = 0
+
+    def schedule(self, key: str, fn: Callable[[], Any]) -> bool:
+        with self._lock:
+            if key in self._inflight:
+                return False
+            fut = self._pool.submit(fn)
+            self._inflight[key] = fut
+            self.scheduled += 1
+        fut.add_done_callback(lambda f: self._done(key, f))
+        return True
+
+    def _done(self, key: str, fut: Future) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+            if fut.exception() is not None:
+                self.failed += 1
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            pending = list(self._inflight.values())
+        for fut in pending:
+            try:
+                fut.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {"scheduled": self.scheduled, "failed": self.failed, "in_flight": len(self._inflight)}
+
+
+def archetype_serving_enabled() -> bool:
+    """ARCHETYPE_SERVING (default off): answer /v1/run from precomputed plans when one is close enough."""
+    return env_flag("ARCHETYPE_SERVING", False)
+
+
+def max_distance() -> float:
+    """ARCHETYPE_MAX_DISTANCE (default 1.5, in features() units)."""
+    return env_float("ARCHETYPE_MAX_DISTANCE", 1.5)
+
+
+def fresh_for_s() -> float:
+    """ARCHETYPE_FRESH_S (default 1 day): exact plans younger than this are served without a refresh."""
+    return env_float("ARCHETYPE_FRESH_S", 24 * 3600.0)
+
+
+_STORE: Optional[ArchetypeStore] = None
+_REFRESHER: Optional[Refresher] = None
+_LOCK = threading.Lock()
+
+
+def get_archetype_store() -> ArchetypeStore:
+    """
+    Process-wide store at ARCHETYPE_STORE_PATH (default .cache/archetypes.sqlite3);
+    ARCHETYPE_EXACT_MAX_ROWS (default 10000) and ARCHETYPE_EXACT_MAX_AGE_S
+    (default 7 days) bound the exact plans.
+    """
+    global _STORE
+    if _STORE is None:
+        with _LOCK:
+            if _STORE is None:
+                _STORE = ArchetypeStore(
+                    Path(os.getenv("ARCHETYPE_STORE_PATH") or STORE_PATH),
+                    max_exact=env_int("ARCHETYPE_EXACT_MAX_ROWS", 10000),
+                    max_exact_age_s=env_float("ARCHETYPE_EXACT_MAX_AGE_S", 7 * 24 * 3600.0),
+                )
+    return _STORE
+
+
+def get_refresher() -> Refresher:
+    """Process-wide refresher; ARCHETYPE_REFRESH_THREADS (default 2) workers."""
+    global _REFRESHER
+    if _REFRESHER is None:
+        with _LOCK:
+            if _REFRESHER is None:
+                _REFRESHER = Refresher(env_int("ARCHETYPE_REFRESH_THREADS", 2))
+    return _REFRESHER
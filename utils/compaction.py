@@ -0,0 +1,99 @@
+from __future__ import annotations
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.env import env_flag
+
+
+def compaction_enabled() -> bool:
+    """LLM_PROMPT_COMPACTION (default on); turn off to compare against the verbose prompts."""
+    return env_flag("LLM_PROMPT_COMPACTION", True)
+
+
+def round_numbers(obj: Any, ndigits: int = 2) -> Any:
+    """Round floats recursively; whole floats become ints (120.0 -> 120)."""
+    if isinstance(obj, bool):
+        return obj
+    if isinstance(obj, float):
+        r = round(obj, ndigits)
+        return int(r) if r.is_integer() else r
+    if isinstance(obj, dict):
+        return {k: round_numbers(v, ndigits) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [round_numbers(v, ndigits) for v in obj]
+    return obj
+
+
+def drop_empty(obj: Any) -> Any:
+    """Remove None values and empty containers from dicts, recursively."""
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            v = drop_empty(v)
+            if v is None or (isinstance(v, (dict, list)) and not v):
+                continue
+            out[k] = v
+        return out
+    if isinstance(obj, list):
+        return [drop_empty(v) for v in obj]
+    return obj
+
+
+def group_devices(units: Iterable[Dict[str, Any]], count_key: str = "count") -> List[Dict[str, Any]]:
+    """
+    Merge identical device dicts into one entry with a summed count.
+    A unit with count 0 (the model default) stands for one device.
+    First-seen order is kept.
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for unit in units or []:
+        spec = {k: v for k, v in dict(unit).items() if k != count_key}
+        sig = json.dumps(spec, sort_keys=True, default=str)
+        n = max(int(unit.get(count_key) or 0), 1)
+        if sig in groups:
+            groups[sig][count_key] += n
+        else:
+            groups[sig] = {**spec, count_key: n}
+    return list(groups.values())
+
+
+# Benchmark sections and the building data / finding areas that make them relevant.
+_BENCHMARK_AREAS = {
+    "energy_intensity": {"envelope", "other"},
+    "ac_efficiency": {"AC"},
+    "lighting_efficiency": {"lighting"},
+    "usage_patterns": {"other", "standby"},
+}
+
+
+def relevant_benchmarks(
+    benchmarks: Dict[str, Any], normalized: Dict[str, Any], finding_areas: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """
+    Only the benchmark sections that apply to this building: ones for
+    equipment it has, plus ones for areas the findings already touch.
+    """
+    areas = set(finding_areas or ())
+    if normalized.get("ac_units"):
+        areas.add("AC")
+    if (normalized.get("lighting") or {}).get("bulbs"):
+        areas.add("lighting")
+    if normalized.get("monthly_kWh") and normalized.get("floor_area_m2"):
+        areas.add("envelope")
+    return {
+        name: section
+        for name, section in benchmarks.items()
+        if _BENCHMARK_AREAS.get(name, set()) & areas
+    }
+
+
+def compact_building(normalized: Dict[str, Any]) -> Dict[str, Any]:
+    """Building data for prompts: identical AC units grouped, numbers rounded, empty fields dropped."""
+    out = dict(normalized)
+    if out.get("ac_units"):
+        out["ac_units"] = group_devices(out["ac_units"])
+    return drop_empty(round_numbers(out))
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from utils.env import env_flag, env_float
+
+
+class ConcurrencyTimeout(TimeoutError):
+    """No concurrency slot became free within the call's time budget."""
+
+
+OK = "ok"
+OVERLOAD = "overload"
+ERROR = "error"
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on in-flight upstream calls.
+      - success under the latency target: limit += increase / limit
+        (about +increase per full window of calls)
+      - 429/5xx, or latency above spike_factor x target: limit *= decrease,
+        at most once per cooldown so one burst of failures counts once
+    """
+
+    POLL_S = 0.02
+
+    def __init__(
+        self,
+        initial: float = 8.0,
+        min_limit: float = 1.0,
+        max_limit: float = 128.0,
+        target_latency_s: float = 10.0,
+        spike_factor: float = 2.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        cooldown_s: float = 1.0,
+    ):
+        self.min_limit = max(min_limit, 1.0)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.target_latency_s = target_latency_s
+        self.spike_factor = spike_factor
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown_s = cooldown_s
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._stats: Dict[str, Any] = {
+            "increases": 0, "decreases": 0, "overloads": 0, "spikes": 0, "waits": 0,
+        }
+        self._latency: Dict[str, Dict[str, float]] = {}
+
+    def _try_enter(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """Block until a slot is free; returns the wait in seconds."""
+        started = time.monotonic()
+        with self._cond:
+            if self._try_enter():
+                return 0.0
+            self._stats["waits"] += 1
+            while True:
+                waited = time.monotonic() - started
+                if timeout is not None and waited >= timeout:
+                    raise ConcurrencyTimeout(f"no LLM concurrency slot within {timeout:.2f}s")
+                left = None if timeout is None else timeout - waited
+                self._cond.wait(left)
+                if self._try_enter():
+                    return time.monotonic() - started
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> float:
+        started = time.monotonic()
+        with self._cond:
+            if self._try_enter():
+                return 0.0
+            self._stats["waits"] += 1
+        while True:
+            await asyncio.sleep(self.POLL_S)
+            with self._cond:
+                if self._try_enter():
+                    return time.monotonic() - started
+            if timeout is not None and time.monotonic() - started >= timeout:
+                raise ConcurrencyTimeout(f"no LLM concurrency slot within {timeout:.2f}s")
+
+    def release(self, latency_s: float, outcome: str = OK, stage: str = "default") -> None:
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight = max(self.in_flight - 1, 0)
+            lat = self._latency.setdefault(stage, {"ewma_s": latency_s, "last_s": latency_s, "calls": 0})
+            lat["ewma_s"] = 0.8 * lat["ewma_s"] + 0.2 * latency_s
+            lat["last_s"] = latency_s
+            lat["calls"] += 1
+
+            spike = outcome == OK and latency_s > self.target_latency_s * self.spike_factor
+            if outcome == OVERLOAD or spike:
+                self._stats["overloads" if outcome == OVERLOAD else "spikes"] += 1
+                if now - self._last_decrease >= self.cooldown_s:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+                    self._stats["decreases"] += 1
+            elif outcome == OK and latency_s <= self.target_latency_s:
+                new_limit = min(self.max_limit, self.limit + self.increase / self.limit)
+                if int(new_limit) > int(self.limit):
+                    self._stats["increases"] += 1
+                self.limit = new_limit
+            self._cond.notify_all()
+
+    def info(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "target_latency_s": self.target_latency_s,
+                "latency_by_stage": {k: {kk: round(vv, 4) for kk, vv in v.items()} for k, v in self._latency.items()},
+                **self._stats,
+            }
+
+
+def classify_error(e: BaseException) -> str:
+    """429 and 5xx mean the provider is overloaded; anything else is a plain error."""
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    try:
+        status = int(status) if status is not None else None
+    except Exception:
+        status = None
+    if status == 429 or (status is not None and status >= 500):
+        return OVERLOAD
+    return ERROR
+
+
+_LIMITER: Optional[AdaptiveLimiter] = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_adaptive_limiter() -> Optional[AdaptiveLimiter]:
+    """
+    Process-wide AIMD limiter, off unless LLM_AIMD_ENABLED=1; a limit that
+    starts low would otherwise cap fan-out and portfolio runs below the
+    transport's connection pool:
+      LLM_AIMD_INITIAL, LLM_AIMD_MIN, LLM_AIMD_MAX, LLM_AIMD_TARGET_LATENCY_S,
+      LLM_AIMD_SPIKE_FACTOR.
+    """
+    global _LIMITER
+    if not env_flag("LLM_AIMD_ENABLED", False):
+        return None
+    if _LIMITER is not None:
+        return _LIMITER
+    with _LIMITER_LOCK:
+        if _LIMITER is None:
+            _LIMITER = AdaptiveLimiter(
+                initial=env_float("LLM_AIMD_INITIAL", 8.0),
+                min_limit=env_float("LLM_AIMD_MIN", 1.0),
+                max_limit=env_float("LLM_AIMD_MAX", 128.0),
+                target_latency_s=env_float("LLM_AIMD_TARGET_LATENCY_S", 10.0),
+                spike_factor=env_float("LLM_AIMD_SPIKE_FACTOR", 2.0),
+            )
+    return _LIMITER
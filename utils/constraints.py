@@ -3,6 +3,7 @@ from typing import List, Dict, Any, Tuple
 from math import isfinite
 
 from utils.models import NormalizedInput, Recommendations, Recommendation
+from utils.savings import kwh_saved_per_month
 
 _DISR_ORDER = ["none", "low", "medium", "high"]
 _IDX = {v: i for i, v in enumerate(_DISR_ORDER)}
@@ -22,16 +23,8 @@ def _num(x, default=0.0) -> float:
         return default
 
 
-def _est_kwh_saved_per_month(a: Dict[str, Any], baseline_kwh: float) -> float:
-    if a.get("kwh_saved_per_month") is not None:
-        return max(_num(a.get("kwh_saved_per_month"), 0.0), 0.0)
-    pct_min = max(_num(a.get("pct_kwh_reduction_min"), 0.0), 0.0)
-    pct_min = min(pct_min, 100.0)
-    return baseline_kwh * (pct_min / 100.0)
-
-
 def _monthly_savings_LKR(a: Dict[str, Any], baseline_kwh: float, tariff: float) -> float:
-    kwh = _est_kwh_saved_per_month(a, baseline_kwh)
+    kwh = kwh_saved_per_month(a, baseline_kwh)
     return max(kwh * max(tariff, 0.0), 0.0)
 
 
@@ -66,7 +59,7 @@ def _to_model(d: Dict[str, Any]) -> Recommendation:
 
 def _value_per_LKR(a: Dict[str, Any], baseline_kwh: float) -> float:
     capex = max(_num(a.get("est_cost"), 0.0), 0.0)
-    kwh = _est_kwh_saved_per_month(a, baseline_kwh)
+    kwh = kwh_saved_per_month(a, baseline_kwh)
     if capex <= 0:
         return 1e12 if kwh > 0 else 0.0
     return kwh / capex
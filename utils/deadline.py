@@ -0,0 +1,203 @@
+from __future__ import annotations
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from utils.env import env_float
+
+DEFAULT_REQUEST_DEADLINE_S = 60.0
+DEFAULT_STAGE_BUDGETS_S = {
+    "auditor": 20.0,
+    "composer": 30.0,
+}
+
+
+class RequestCancelled(Exception):
+    """The run was cancelled (client gone, UI rerun); not an LLM failure, so nothing degrades to a fallback."""
+
+
+_CANCEL_LOCK = threading.Lock()
+_CANCELLED: Dict[str, int] = {
+    "requests": 0,
+    "llm_calls_aborted": 0,
+    "llm_calls_skipped": 0,
+    "stages_skipped": 0,
+    "planner_iterations_skipped": 0,
+}
+
+
+def count_cancelled(kind: str, n: int = 1) -> None:
+    with _CANCEL_LOCK:
+        _CANCELLED[kind] = _CANCELLED.get(kind, 0) + n
+
+
+def cancellation_stats() -> Dict[str, int]:
+    """Process-wide counters of work dropped because its run was cancelled."""
+    with _CANCEL_LOCK:
+        return dict(_CANCELLED)
+
+
+@dataclass
+class Deadline:
+    """
+    Request-level time budget shared by every stage of one pipeline run.
+      - expires_at: time.monotonic() value after which the request is over
+      - stage_budgets: per-stage caps (seconds), further bounded by what is left
+      - degraded_stages: stages that fell back to their deterministic path
+      - cancel_reason: set by cancel(); pending LLM calls are aborted and
+        later stages raise RequestCancelled instead of running
+    """
+    expires_at: float
+    stage_budgets: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_STAGE_BUDGETS_S))
+    degraded_stages: List[str] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+    cancel_reason: Optional[str] = None
+    _on_cancel: List[Callable[[], None]] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def after(cls, seconds: float, stage_budgets: Optional[Dict[str, float]] = None) -> "Deadline":
+        budgets = dict(DEFAULT_STAGE_BUDGETS_S)
+        budgets.update(stage_budgets or {})
+        return cls(expires_at=time.monotonic() + max(float(seconds), 0.0), stage_budgets=budgets)
+
+    @classmethod
+    def from_env(cls) -> "Deadline":
+        """
+        REQUEST_DEADLINE_S (default 60), AUDITOR_LLM_BUDGET_S (default 20),
+        COMPOSER_LLM_BUDGET_S (default 30).
+        """
+        return cls.after(
+            env_float("REQUEST_DEADLINE_S", DEFAULT_REQUEST_DEADLINE_S),
+            {
+                "auditor": env_float("AUDITOR_LLM_BUDGET_S", DEFAULT_STAGE_BUDGETS_S["auditor"]),
+                "composer": env_float("COMPOSER_LLM_BUDGET_S", DEFAULT_STAGE_BUDGETS_S["composer"]),
+            },
+        )
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def stage_timeout(self, stage: str) -> float:
+        budget = self.stage_budgets.get(stage)
+        left = self.remaining()
+        return left if budget is None else min(left, max(budget, 0.0))
+
+    def mark_degraded(self, stage: str, reason: str = "") -> None:
+        if stage not in self.degraded_stages:
+            self.degraded_stages.append(stage)
+        if reason:
+            self.notes.append(f"{stage}: {reason}")
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.degraded_stages)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    def cancel(self, reason: str = "cancelled", count: bool = True) -> bool:
+        """
+        Cancel the run; safe from any thread. Returns False if it was already
+        cancelled. count=False keeps it out of the "requests" counter (for a
+        deadline that stands in for other runs).
+        """
+        with self._lock:
+            if self.cancel_reason is not None:
+                return False
+            self.cancel_reason = reason
+            callbacks, self._on_cancel = self._on_cancel, []
+        if count:
+            count_cancelled("requests")
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+        return True
+
+    def on_cancel(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Run fn when the deadline is cancelled (now, if it already is); returns an unregister callable."""
+        with self._lock:
+            if self.cancel_reason is None:
+                self._on_cancel.append(fn)
+                return lambda: self._forget(fn)
+        fn()
+        return lambda: None
+
+    def _forget(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if fn in self._on_cancel:
+                self._on_cancel.remove(fn)
+
+    def raise_if_cancelled(self, stage: str = "", kind: str = "stages_skipped") -> None:
+        """Gate for the next piece of work: counts it as skipped and raises RequestCancelled."""
+        if self.cancel_reason is None:
+            return
+        count_cancelled(kind)
+        where = f" before {stage}" if stage else ""
+        raise RequestCancelled(f"run cancelled{where}: {self.cancel_reason}")
+
+
+_CURRENT: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the pipeline run in progress (None outside run_workflow)."""
+    return _CURRENT.get()
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    token = _CURRENT.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _CURRENT.reset(token)
+
+
+def check_cancelled(stage: str) -> None:
+    """Raise RequestCancelled before `stage` when the current run has been cancelled."""
+    deadline = _CURRENT.get()
+    if deadline is not None:
+        deadline.raise_if_cancelled(stage)
+
+
+@contextmanager
+def shared_deadline(deadlines: Iterable[Optional[Deadline]]) -> Iterator[Optional[Deadline]]:
+    """
+    Current deadline for work done on behalf of several runs (a micro-batch,
+    say): it expires with the latest of them and is cancelled only once all
+    of them are. None, i.e. unbounded, if any of the runs has no deadline.
+    """
+    runs = list({id(d): d for d in deadlines}.values())
+    if not runs or any(d is None for d in runs):
+        with use_deadline(None):
+            yield None
+        return
+    latest = max(runs, key=lambda d: d.expires_at)
+    merged = Deadline(expires_at=latest.expires_at, stage_budgets=dict(latest.stage_budgets))
+    lock = threading.Lock()
+    live = [len(runs)]
+
+    def _one_cancelled() -> None:
+        with lock:
+            live[0] -= 1
+            last = live[0] == 0
+        if last:
+            merged.cancel("every run sharing this work was cancelled", count=False)
+
+    unregister = [d.on_cancel(_one_cancelled) for d in runs]
+    try:
+        with use_deadline(merged):
+            yield merged
+    finally:
+        for fn in unregister:
+            fn()
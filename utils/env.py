@@ -0,0 +1,26 @@
+from __future__ import annotations
+import os
+
+# Values that turn a flag on; anything else set turns it off, unset/empty keeps the default.
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except Exception:
+        return default
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except Exception:
+        return default
+
+
+def env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    return raw.strip().lower() in TRUE_VALUES
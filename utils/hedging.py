@@ -0,0 +1,251 @@
+from __future__ import annotations
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from utils.env import env_float
+
+
+def _valid(result: Any) -> bool:
+    return isinstance(result, dict) and bool(result)
+
+
+class HedgePolicy:
+    """
+    Decides when to fire a duplicate ("hedge") of a slow LLM call.
+      - delay: the `percentile` of recent latencies for the stage
+        (no hedging until `min_samples` latencies have been seen)
+      - budget: hedges fired never exceed `max_rate` x calls
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_rate: float = 0.1,
+        min_samples: int = 20,
+        window: int = 200,
+        min_delay_s: float = 0.5,
+    ):
+        self.percentile = min(max(percentile, 0.0), 100.0)
+        self.max_rate = max(max_rate, 0.0)
+        self.min_samples = max(min_samples, 1)
+        self.min_delay_s = min_delay_s
+        self._window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.fired = 0
+        self.won = 0
+        self.losers_cancelled = 0
+
+    def observe(self, stage: str, latency_s: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=self._window)).append(latency_s)
+
+    def delay_for(self, stage: str) -> Optional[float]:
+        with self._lock:
+            self.calls += 1
+            samples = sorted(self._latencies.get(stage, ()))
+        if len(samples) < self.min_samples:
+            return None
+        idx = min(int(round(self.percentile / 100.0 * (len(samples) - 1))), len(samples) - 1)
+        return max(samples[idx], self.min_delay_s)
+
+    def can_fire(self) -> bool:
+        """Whether the budget would allow one more hedge right now (nothing is consumed)."""
+        with self._lock:
+            return self.fired + 1 <= self.max_rate * self.calls
+
+    def try_fire(self) -> bool:
+        with self._lock:
+            if self.fired + 1 > self.max_rate * self.calls:
+                return False
+            self.fired += 1
+            return True
+
+    def record_outcome(self, hedge_won: bool, loser_cancelled: bool) -> None:
+        with self._lock:
+            if hedge_won:
+                self.won += 1
+            if loser_cancelled:
+                self.losers_cancelled += 1
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "percentile": self.percentile,
+                "max_rate": self.max_rate,
+                "calls": self.calls,
+                "hedges_fired": self.fired,
+                "hedges_won": self.won,
+                "losers_cancelled": self.losers_cancelled,
+                "samples_by_stage": {k: len(v) for k, v in self._latencies.items()},
+            }
+
+
+_EXECUTOR: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=int(env_float("LLM_HEDGE_THREADS", 32)), thread_name_prefix="llm-hedge"
+                )
+    return _EXECUTOR
+
+
+def _spawn(fn: Callable[[], Any]) -> concurrent.futures.Future:
+    """Run fn in this context on its own daemon thread; the shared pool is kept for hedges."""
+    fut: concurrent.futures.Future = concurrent.futures.Future()
+    ctx = contextvars.copy_context()
+
+    def _run() -> None:
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(ctx.run(fn))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=_run, name="llm-primary", daemon=True).start()
+    return fut
+
+
+def run_hedged(
+    policy: HedgePolicy,
+    stage: str,
+    attempt: Callable[[], Any],
+    timeout: Optional[float] = None,
+) -> Any:
+    """
+    Thread-based hedging for sync callers; the first valid (non-empty) JSON
+    result wins. A sync HTTP call cannot be interrupted, so a losing attempt
+    that already started finishes in the background and is discarded.
+    When no hedge can fire (too few samples, or the budget is spent) the
+    attempt runs inline on the caller's thread. Otherwise the primary gets a
+    thread of its own so the caller can take whichever attempt wins; only
+    hedges use the LLM_HEDGE_THREADS pool.
+    Returns (result, hedge_fired, hedge_won).
+    """
+    started = time.monotonic()
+
+    def _timed():
+        t0 = time.monotonic()
+        result = attempt()
+        if _valid(result):
+            policy.observe(stage, time.monotonic() - t0)
+        return result
+
+    delay = policy.delay_for(stage)
+    if delay is None or not policy.can_fire():
+        return _timed(), False, False
+    primary = _spawn(_timed)
+
+    first_wait = delay if timeout is None else min(delay, timeout)
+    done, _ = concurrent.futures.wait([primary], timeout=first_wait)
+    if done or not policy.try_fire():
+        left = None if timeout is None else max(timeout - (time.monotonic() - started), 0.0)
+        return primary.result(timeout=left), False, False
+
+    hedge = _executor().submit(contextvars.copy_context().run, _timed)
+    pending = {primary, hedge}
+    last_error: Optional[BaseException] = None
+    while pending:
+        left = None if timeout is None else max(timeout - (time.monotonic() - started), 0.0)
+        done, pending = concurrent.futures.wait(pending, timeout=left, return_when=concurrent.futures.FIRST_COMPLETED)
+        if not done:
+            raise concurrent.futures.TimeoutError("hedged LLM call timed out")
+        for fut in done:
+            if fut.exception() is not None:
+                last_error = fut.exception()
+                continue
+            if _valid(fut.result()) or not pending:
+                cancelled = all(p.cancel() for p in pending)
+                policy.record_outcome(fut is hedge, bool(pending) and cancelled)
+                return fut.result(), True, fut is hedge
+    raise last_error or RuntimeError("hedged LLM call failed")
+
+
+async def run_hedged_async(
+    policy: HedgePolicy,
+    stage: str,
+    attempt: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Asyncio hedging: the losing task is cancelled, which aborts its request.
+    Returns (result, hedge_fired, hedge_won).
+    """
+    async def _timed():
+        t0 = time.monotonic()
+        result = await attempt()
+        if _valid(result):
+            policy.observe(stage, time.monotonic() - t0)
+        return result
+
+    delay = policy.delay_for(stage)
+    primary = asyncio.ensure_future(_timed())
+    tasks = [primary]
+    if delay is None:
+        return await primary, False, False
+
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not policy.try_fire():
+            return await primary, False, False
+
+        hedge = asyncio.ensure_future(_timed())
+        tasks.append(hedge)
+        pending = {primary, hedge}
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+                if _valid(task.result()) or not pending:
+                    for p in pending:
+                        p.cancel()
+                    policy.record_outcome(task is hedge, bool(pending))
+                    return task.result(), True, task is hedge
+        raise last_error or RuntimeError("hedged LLM call failed")
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+_POLICY: Optional[HedgePolicy] = None
+_POLICY_LOCK = threading.Lock()
+
+
+def hedged_stages() -> set:
+    """Stages with hedging on, from LLM_HEDGE_STAGES (comma-separated, e.g. "composer")."""
+    raw = os.getenv("LLM_HEDGE_STAGES", "")
+    return {s.strip() for s in raw.split(",") if s.strip()}
+
+
+def get_hedge_policy() -> HedgePolicy:
+    """
+    Process-wide policy: LLM_HEDGE_PERCENTILE (default 95), LLM_HEDGE_MAX_RATE
+    (default 0.1), LLM_HEDGE_MIN_SAMPLES (default 20).
+    """
+    global _POLICY
+    if _POLICY is None:
+        with _POLICY_LOCK:
+            if _POLICY is None:
+                _POLICY = HedgePolicy(
+                    percentile=env_float("LLM_HEDGE_PERCENTILE", 95.0),
+                    max_rate=env_float("LLM_HEDGE_MAX_RATE", 0.1),
+                    min_samples=int(env_float("LLM_HEDGE_MIN_SAMPLES", 20)),
+                )
+    return _POLICY
@@ -0,0 +1,78 @@
+from __future__ import annotations
+import json
+from typing import Any, Iterable, List, Optional
+
+
+class JsonItemStream:
+    """
+    Incremental parser for replies shaped like {"<key>": [ {...}, {...} ]}.
+    feed() takes text chunks as they stream in and returns every array item
+    under one of `keys` that closed in that chunk, already json-decoded.
+    Text before the first "{" (a markdown fence, say) is ignored.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = set(keys)
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start: Optional[int] = None
+        self._last_string: Optional[str] = None
+        self._top_key: Optional[str] = None
+        self._in_items = False
+        self._item_start: Optional[int] = None
+        self._started = False
+        self.items_seen = 0
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> List[Any]:
+        out: List[Any] = []
+        if not chunk:
+            return out
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if not self._started:
+                if ch != "{":
+                    continue
+                self._started = True
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._string_start is not None:
+                        self._last_string = text[self._string_start + 1 : i]
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._depth == 1:
+                self._top_key = self._last_string
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._depth == 2 and self._top_key in self.keys:
+                    self._in_items = True
+                elif ch == "{" and self._depth == 3 and self._in_items:
+                    self._item_start = i
+            elif ch in "}]":
+                if ch == "}" and self._depth == 3 and self._in_items and self._item_start is not None:
+                    try:
+                        out.append(json.loads(text[self._item_start : i + 1]))
+                        self.items_seen += 1
+                    except ValueError:
+                        pass
+                    self._item_start = None
+                elif ch == "]" and self._depth == 2:
+                    self._in_items = False
+                self._depth -= 1
+        self._pos = len(text)
+        return out
@@ -1,31 +1,125 @@
 from __future__ import annotations
+import asyncio
+import concurrent.futures
 import json
 import os
 import re
-from typing import Any, Dict, Optional
-from openai import OpenAI
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterable, Iterator, List, Optional, Tuple
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
 
+from utils.llm_cache import canonical_content, get_response_cache, request_key
+from utils.singleflight import SingleFlight
+from utils.llm_transport import get_async_http_client, get_http_client, pool_metrics
+from utils.rate_limit import get_rate_limiter
+from utils.concurrency import ERROR, OK, OVERLOAD, classify_error, get_adaptive_limiter
+from utils.hedging import get_hedge_policy, hedged_stages, run_hedged, run_hedged_async
+from utils.llm_cassette import cassette_key, get_cassette
+from utils.llm_backends import Backend, get_router, stage_chain
+from utils.compaction import compact_json, compaction_enabled
+from utils.wire_schema import WireSchema, max_tokens_for, structured_output_enabled
+from utils.json_stream import JsonItemStream
+from utils.deadline import RequestCancelled, cancellation_stats, count_cancelled, current_deadline
+
 load_dotenv()
 
-_CLIENT: Optional["OpenAI"] = None
+DEFAULT_TEMPERATURE = 0.2
+
+
+class LLMError(RuntimeError):
+    """The LLM call failed (network, provider or unparseable reply)."""
+
+
+class LLMTimeoutError(LLMError):
+    """The LLM call did not finish within its time budget."""
+
+
+# One client per backend endpoint; all of them share the pooled HTTP transport.
+_CLIENTS: Dict[Tuple[Optional[str], str], "OpenAI"] = {}
+_CLIENT_LOCK = threading.Lock()
+# AsyncOpenAI wraps a loop-bound httpx.AsyncClient, so keep one set per event loop.
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Optional[str], str], AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_FLIGHTS = SingleFlight()
+
+_PRIORITY: ContextVar[Optional[str]] = ContextVar("llm_priority", default=None)
+_CALL_LOG: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("llm_call_log", default=None)
+
+
+@contextmanager
+def llm_priority(priority: str) -> Iterator[str]:
+    """Run LLM calls in this block under a priority class ("interactive" or "batch")."""
+    token = _PRIORITY.set(str(priority).lower())
+    try:
+        yield str(priority).lower()
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority() -> str:
+    return _PRIORITY.get() or os.getenv("LLM_DEFAULT_PRIORITY", "batch").lower()
+
+
+@contextmanager
+def record_llm_calls() -> Iterator[List[Dict[str, Any]]]:
+    """Collect one record per call_json/call_json_async made inside the block."""
+    log: List[Dict[str, Any]] = []
+    token = _CALL_LOG.set(log)
+    try:
+        yield log
+    finally:
+        _CALL_LOG.reset(token)
+
+
+def attach_llm_calls(records: Iterable[Dict[str, Any]]) -> None:
+    """Add records of calls made on this caller's behalf elsewhere (a shared batch, say) to the current block."""
+    log = _CALL_LOG.get()
+    if log is not None:
+        log.extend(records)
+
 
+def _backend(backend: Optional[Backend]) -> Backend:
+    return backend if backend is not None else get_router().choose("default")
 
-def _client() -> "OpenAI":
-    global _CLIENT
-    if _CLIENT is not None:
-        return _CLIENT
+
+def _client(backend: Optional[Backend] = None) -> "OpenAI":
     if OpenAI is None:
         raise RuntimeError("openai package not installed. Add `openai>=1.50.0` to requirements.txt")
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is missing. Add it to your .env")
-    _CLIENT = OpenAI(api_key=api_key)
-    return _CLIENT
+    backend = _backend(backend)
+    api_key = backend.resolve_api_key()
+    slot = (backend.base_url, api_key)
+    client = _CLIENTS.get(slot)
+    if client is None:
+        with _CLIENT_LOCK:
+            client = _CLIENTS.get(slot)
+            if client is None:
+                client = OpenAI(api_key=api_key, base_url=backend.base_url, http_client=get_http_client())
+                _CLIENTS[slot] = client
+    return client
 
 
-def _model_name() -> str:
-    return os.getenv("MODEL_NAME", "gpt-4o-mini")
+def _async_client(backend: Optional[Backend] = None) -> "AsyncOpenAI":
+    if AsyncOpenAI is None:
+        raise RuntimeError("openai package not installed. Add `openai>=1.50.0` to requirements.txt")
+    backend = _backend(backend)
+    api_key = backend.resolve_api_key()
+    slot = (backend.base_url, api_key)
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop, {}).get(slot)
+    if client is None:
+        with _CLIENT_LOCK:
+            clients = _ASYNC_CLIENTS.setdefault(loop, {})
+            client = clients.get(slot)
+            if client is None:
+                client = AsyncOpenAI(api_key=api_key, base_url=backend.base_url, http_client=get_async_http_client())
+                clients[slot] = client
+    return client
 
 
 _FENCE_RE = re.compile(r"^\s*```(?:json)?\s*([\s\S]*?)\s*```\s*$", re.IGNORECASE)
@@ -45,29 +139,688 @@ def _json_repair(s: str) -> str:
     return s
 
 
-def call_json(system_text: str, user_content: Any) -> Dict[str, Any]:
-
+def _parse_json_text(text: str) -> Dict[str, Any]:
+    payload = _strip_fences(text.strip())
     try:
-        client = _client()
-        model = _model_name()
-
-        msg = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_text},
-                {"role": "user", "content": json.dumps(user_content, ensure_ascii=False)},
-            ],
-            temperature=0.2,
+        return json.loads(payload)
+    except Exception:
+        repaired = _json_repair(payload)
+        return json.loads(repaired)
+
+
+def _user_text(user_content: Any) -> str:
+    if not compaction_enabled():
+        return json.dumps(user_content, ensure_ascii=False)
+    # Prompts built as text go out verbatim instead of as an escaped JSON string.
+    return user_content if isinstance(user_content, str) else compact_json(user_content)
+
+
+def _messages(system_text: str, user_content: Any) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system_text},
+        {"role": "user", "content": _user_text(user_content)},
+    ]
+
+
+def _read_usage(msg: Any, usage: Optional[Dict[str, Any]]) -> None:
+    u = getattr(msg, "usage", None)
+    if usage is None or u is None:
+        return
+    for name in ("prompt_tokens", "completion_tokens"):
+        value = getattr(u, name, None)
+        if value is not None:
+            usage[name] = int(value)
+
+
+def _complete_json(
+    model: str, system_text: str, user_content: Any, temperature: float, timeout: Optional[float] = None,
+    backend: Optional[Backend] = None, usage: Optional[Dict[str, Any]] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    client = _client(backend)
+    if timeout is not None:
+        # One bounded attempt: SDK retries would overrun the stage budget.
+        client = client.with_options(timeout=timeout, max_retries=0)
+    msg = client.chat.completions.create(
+        model=model,
+        messages=_messages(system_text, user_content),
+        temperature=temperature,
+        **(options or {}),
+    )
+    _read_usage(msg, usage)
+    text = (msg.choices[0].message.content or "").strip()
+    return _parse_json_text(text)
+
+
+async def _complete_json_async(
+    model: str, system_text: str, user_content: Any, temperature: float, timeout: Optional[float] = None,
+    backend: Optional[Backend] = None, usage: Optional[Dict[str, Any]] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    client = _async_client(backend)
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)
+    msg = await client.chat.completions.create(
+        model=model,
+        messages=_messages(system_text, user_content),
+        temperature=temperature,
+        **(options or {}),
+    )
+    _read_usage(msg, usage)
+    text = (msg.choices[0].message.content or "").strip()
+    return _parse_json_text(text)
+
+
+async def _stream_text_async(
+    model: str, system_text: str, user_content: Any, temperature: float, timeout: Optional[float] = None,
+    backend: Optional[Backend] = None, usage: Optional[Dict[str, Any]] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """Streamed completion: yields text deltas; usage arrives with the last chunk."""
+    client = _async_client(backend)
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=_messages(system_text, user_content),
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True},
+        **(options or {}),
+    )
+    async for chunk in stream:
+        _read_usage(chunk, usage)
+        for choice in chunk.choices or []:
+            delta = getattr(choice.delta, "content", None)
+            if delta:
+                yield delta
+
+
+def _cassette_request(model: str, system_text: str, user_content: Any, temperature: float) -> Dict[str, Any]:
+    return {"model": model, "temperature": temperature, "system": system_text, "user": user_content}
+
+
+def _recorded_complete(
+    backend: Backend, system_text: str, user_content: Any, temperature: float, timeout: Optional[float] = None,
+    usage: Optional[Dict[str, Any]] = None, options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """_complete_json behind the record/replay cassette (LLM_CASSETTE_MODE)."""
+    model = backend.model
+    cassette = get_cassette()
+    if cassette is None:
+        return _complete_json(
+            model, system_text, user_content, temperature, timeout, backend=backend, usage=usage, options=options
         )
+    key = cassette_key(model, temperature, system_text, user_content)
+    if cassette.replaying:
+        entry = cassette.get(key)
+        delay = cassette.replay_delay(entry)
+        if timeout is not None and delay > timeout:
+            time.sleep(max(timeout, 0.0))
+            raise LLMTimeoutError(f"replayed LLM call took {delay:.2f}s, over its {timeout:.2f}s budget")
+        time.sleep(delay)
+        if usage is not None:
+            usage.update(entry.get("usage") or {})
+        return entry["response"]
+    t0 = time.monotonic()
+    result = _complete_json(
+        model, system_text, user_content, temperature, timeout, backend=backend, usage=usage, options=options
+    )
+    cassette.put(key, _cassette_request(model, system_text, user_content, temperature), result, time.monotonic() - t0, usage=usage)
+    return result
 
-        text = (msg.choices[0].message.content or "").strip()
-        payload = text
 
-        payload = _strip_fences(payload)
-        try:
-            return json.loads(payload)
-        except Exception:
-            repaired = _json_repair(payload)
-            return json.loads(repaired)
+async def _recorded_complete_async(
+    backend: Backend, system_text: str, user_content: Any, temperature: float, timeout: Optional[float] = None,
+    usage: Optional[Dict[str, Any]] = None, options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    model = backend.model
+    cassette = get_cassette()
+    if cassette is None:
+        return await _complete_json_async(
+            model, system_text, user_content, temperature, timeout, backend=backend, usage=usage, options=options
+        )
+    key = cassette_key(model, temperature, system_text, user_content)
+    if cassette.replaying:
+        entry = cassette.get(key)
+        # The caller's wait_for turns an over-budget recorded latency into a timeout.
+        await asyncio.sleep(cassette.replay_delay(entry))
+        if usage is not None:
+            usage.update(entry.get("usage") or {})
+        return entry["response"]
+    t0 = time.monotonic()
+    result = await _complete_json_async(
+        model, system_text, user_content, temperature, timeout, backend=backend, usage=usage, options=options
+    )
+    cassette.put(key, _cassette_request(model, system_text, user_content, temperature), result, time.monotonic() - t0, usage=usage)
+    return result
+
+
+def _as_llm_error(e: BaseException) -> LLMError:
+    if isinstance(e, LLMError):
+        return e
+    timeout_types = (TimeoutError, asyncio.TimeoutError, concurrent.futures.TimeoutError)
+    if isinstance(e, timeout_types) or "timeout" in type(e).__name__.lower():
+        return LLMTimeoutError(f"LLM call timed out: {e}")
+    return LLMError(f"LLM call failed: {type(e).__name__}: {e}")
+
+
+def _cache_lookup(backend: Backend, system_text: str, user_content: Any, temperature: float):
+    # Cassettes must see every request, so the response cache steps aside.
+    cache = get_response_cache() if get_cassette() is None else None
+    key = request_key(backend.model, temperature, system_text, user_content, backend.base_url or "")
+    cached = cache.get(key) if cache is not None else None
+    return cache, key, cached
+
+
+def _cache_store(cache, key: str, result: Any) -> None:
+    if cache is not None and isinstance(result, dict) and result:
+        cache.put(key, result)
+
+
+def _check_budget(timeout: Optional[float]) -> None:
+    if timeout is not None and timeout <= 0:
+        raise LLMTimeoutError("no time budget left for LLM call")
+
+
+def _remaining(timeout: Optional[float], started: float) -> Optional[float]:
+    if timeout is None:
+        return None
+    left = timeout - (time.monotonic() - started)
+    _check_budget(left)
+    return left
+
+
+def _new_record(stage: str) -> Dict[str, Any]:
+    # "coalesced" until this caller turns out to be the single-flight leader.
+    rec: Dict[str, Any] = {
+        "stage": stage,
+        "priority": current_priority(),
+        "source": "coalesced",
+        "queue_wait_s": 0.0,
+        "latency_s": None,
+        "ok": False,
+    }
+    log = _CALL_LOG.get()
+    if log is not None:
+        log.append(rec)
+    return rec
+
+
+def _estimate_tokens(system_text: str, user_content: Any) -> float:
+    """Rough prompt size (4 chars/token) plus the expected completion length."""
+    try:
+        completion = float(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", 600))
     except Exception:
+        completion = 600.0
+    return (len(system_text) + len(canonical_content(user_content))) / 4.0 + completion
+
+
+def _admit(system_text: str, user_content: Any, timeout: Optional[float]) -> float:
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return 0.0
+    return limiter.acquire(_estimate_tokens(system_text, user_content), current_priority(), timeout)
+
+
+async def _admit_async(system_text: str, user_content: Any, timeout: Optional[float]) -> float:
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return 0.0
+    return await limiter.acquire_async(_estimate_tokens(system_text, user_content), current_priority(), timeout)
+
+
+def _outcome(e: BaseException) -> str:
+    if isinstance(e, (TimeoutError, asyncio.TimeoutError)) or "timeout" in type(e).__name__.lower():
+        return OVERLOAD
+    return classify_error(e)
+
+
+def _settle(aimd, backend: Backend, stage: str, latency_s: float, outcome: str) -> None:
+    """Feed one finished provider call to the AIMD limiter and the backend router."""
+    if aimd is not None:
+        aimd.release(latency_s, outcome, stage)
+    get_router().observe(backend.name, latency_s, ok=outcome == OK)
+
+
+_TOKENS: Dict[str, Dict[str, int]] = {}
+_TOKENS_LOCK = threading.Lock()
+
+
+def _account_tokens(
+    rec: Dict[str, Any], usage: Dict[str, Any], system_text: str, user_content: Any, result: Any, stage: str
+) -> None:
+    """
+    Add one provider call's token usage to its call record and the per-stage
+    totals. When the provider reports no usage, tokens are estimated at
+    4 characters per token and the record is flagged "tokens_estimated".
+    """
+    prompt = usage.get("prompt_tokens")
+    completion = usage.get("completion_tokens")
+    if prompt is None or completion is None:
+        rec["tokens_estimated"] = True
+        if prompt is None:
+            prompt = (len(system_text) + len(_user_text(user_content))) // 4
+        if completion is None:
+            completion = len(json.dumps(result, ensure_ascii=False)) // 4
+    # Hedged attempts both bill, so a record can accumulate two calls.
+    rec["prompt_tokens"] = rec.get("prompt_tokens", 0) + prompt
+    rec["completion_tokens"] = rec.get("completion_tokens", 0) + completion
+    with _TOKENS_LOCK:
+        st = _TOKENS.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        st["calls"] += 1
+        st["prompt_tokens"] += prompt
+        st["completion_tokens"] += completion
+
+
+def summarize_usage(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Token totals for one request's call records, overall and per stage."""
+    by_stage: Dict[str, Dict[str, int]] = {}
+    for c in calls:
+        if "prompt_tokens" not in c:
+            continue
+        st = by_stage.setdefault(c.get("stage", "default"), {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        st["calls"] += 1
+        st["prompt_tokens"] += c["prompt_tokens"]
+        st["completion_tokens"] += c.get("completion_tokens", 0)
+    return {
+        "prompt_tokens": sum(v["prompt_tokens"] for v in by_stage.values()),
+        "completion_tokens": sum(v["completion_tokens"] for v in by_stage.values()),
+        "estimated": any(c.get("tokens_estimated") for c in calls),
+        "by_stage": by_stage,
+    }
+
+
+def _upstream(
+    backend: Backend, system_text: str, user_content: Any, temperature: float,
+    rec: Dict[str, Any], timeout: Optional[float], started: float, stage: str,
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """One provider call: rate-limit admission, an adaptive concurrency slot, then the request."""
+    rec["queue_wait_s"] = round(_admit(system_text, user_content, _remaining(timeout, started)), 4)
+    aimd = get_adaptive_limiter()
+    if aimd is not None:
+        rec["concurrency_wait_s"] = round(aimd.acquire(_remaining(timeout, started)), 4)
+        rec["concurrency_limit"] = int(aimd.limit)
+    t0 = time.monotonic()
+    usage: Dict[str, Any] = {}
+    try:
+        result = _recorded_complete(
+            backend, system_text, user_content, temperature, _remaining(timeout, started), usage=usage, options=options
+        )
+    except Exception as e:
+        _settle(aimd, backend, stage, time.monotonic() - t0, _outcome(e))
+        raise
+    _settle(aimd, backend, stage, time.monotonic() - t0, OK)
+    _account_tokens(rec, usage, system_text, user_content, result, stage)
+    return result
+
+
+async def _upstream_async(
+    backend: Backend, system_text: str, user_content: Any, temperature: float,
+    rec: Dict[str, Any], timeout: Optional[float], started: float, stage: str,
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    waited = await _admit_async(system_text, user_content, _remaining(timeout, started))
+    rec["queue_wait_s"] = round(waited, 4)
+    aimd = get_adaptive_limiter()
+    if aimd is not None:
+        rec["concurrency_wait_s"] = round(await aimd.acquire_async(_remaining(timeout, started)), 4)
+        rec["concurrency_limit"] = int(aimd.limit)
+    t0 = time.monotonic()
+    usage: Dict[str, Any] = {}
+    try:
+        left = _remaining(timeout, started)
+        result = await asyncio.wait_for(
+            _recorded_complete_async(
+                backend, system_text, user_content, temperature, left, usage=usage, options=options
+            ),
+            left,
+        )
+    except asyncio.CancelledError:
+        _settle(aimd, backend, stage, time.monotonic() - t0, ERROR)
+        raise
+    except Exception as e:
+        _settle(aimd, backend, stage, time.monotonic() - t0, _outcome(e))
+        raise
+    _settle(aimd, backend, stage, time.monotonic() - t0, OK)
+    _account_tokens(rec, usage, system_text, user_content, result, stage)
+    return result
+
+
+def _check_cancelled(stage: str) -> None:
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.raise_if_cancelled(f"{stage} LLM call", kind="llm_calls_skipped")
+
+
+async def await_cancellable(aw: Awaitable[Any], stage: str) -> Any:
+    """
+    Await aw in its own task and cancel that task as soon as the current
+    run's deadline is cancelled; the caller then gets RequestCancelled.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return await aw
+    task = asyncio.ensure_future(aw)
+    loop = asyncio.get_running_loop()
+    unregister = deadline.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+    try:
+        return await task
+    except asyncio.CancelledError:
+        current = asyncio.current_task()
+        outer_cancelled = current is not None and hasattr(current, "cancelling") and current.cancelling() > 0
+        if deadline.cancelled and not outer_cancelled:
+            count_cancelled("llm_calls_aborted")
+            raise RequestCancelled(f"{stage} LLM call aborted: {deadline.cancel_reason}") from None
+        raise
+    finally:
+        unregister()
+
+
+def _hedging(stage: str, hedge: Optional[bool]) -> bool:
+    return bool(hedge) if hedge is not None else not hedged_stages().isdisjoint(stage_chain(stage))
+
+
+def _request_options(
+    backend: Backend, stage: str, system_text: str, schema: Optional[WireSchema]
+) -> Tuple[str, Optional[WireSchema], Dict[str, Any]]:
+    """
+    Per-call request options: the stage's max_tokens cap and, in structured
+    output mode, the short-key response schema plus its key legend appended
+    to the system prompt. Returns (system_text, active schema, options).
+    """
+    options: Dict[str, Any] = {}
+    cap = max_tokens_for(stage)
+    if cap is not None:
+        options["max_tokens"] = cap
+    if schema is None or not backend.structured_output or not structured_output_enabled():
+        return system_text, None, options
+    options["response_format"] = schema.response_format()
+    return system_text + schema.instructions(), schema, options
+
+
+def call_json(
+    system_text: str,
+    user_content: Any,
+    temperature: float = DEFAULT_TEMPERATURE,
+    timeout: Optional[float] = None,
+    raise_on_error: bool = False,
+    stage: str = "default",
+    hedge: Optional[bool] = None,
+    schema: Optional[WireSchema] = None,
+) -> Dict[str, Any]:
+    """
+    Send one chat completion and parse the reply as JSON.
+    Identical requests (model, temperature, system text, canonical user content
+    and prompt-file fingerprint) are served from the response cache, and
+    concurrent identical requests share a single upstream call.
+    Upstream calls pass the rate limiter under the current llm_priority()
+    and go to the backend routed for `stage` (see utils.llm_backends); the
+    call record names the backend that served it.
+
+    timeout: seconds for this call, queue wait included (no SDK retries when set).
+    raise_on_error: raise LLMError/LLMTimeoutError instead of returning {}.
+        When the current run's deadline is cancelled the call is skipped (or,
+        in the async variant, aborted mid-flight) with RequestCancelled,
+        whatever raise_on_error says.
+    stage: label used in call records and metrics ("auditor", "composer", ...).
+    hedge: fire a duplicate request when this one is slower than recent calls
+        (default: on for stages listed in LLM_HEDGE_STAGES).
+    schema: short-key wire schema for the reply; with LLM_STRUCTURED_OUTPUT=1
+        it is sent as a strict response format and the reply is expanded to
+        long keys before it is returned or cached.
+    """
+    started = time.monotonic()
+    rec = _new_record(stage)
+    try:
+        backend = get_router().choose(stage)
+        rec.update(model=backend.model, backend=backend.name)
+        system_text, schema, options = _request_options(backend, stage, system_text, schema)
+        rec["structured"] = schema is not None
+        cache, key, cached = _cache_lookup(backend, system_text, user_content, temperature)
+        if cached is not None:
+            rec.update(source="cache", ok=True)
+            return cached
+        _check_cancelled(stage)
+        _check_budget(timeout)
+
+        def _attempt() -> Dict[str, Any]:
+            return _upstream(
+                backend, system_text, user_content, temperature, rec, timeout, started, stage, options
+            )
+
+        def _fetch() -> Dict[str, Any]:
+            rec["source"] = "upstream"
+            if _hedging(stage, hedge):
+                result, rec["hedged"], rec["hedge_won"] = run_hedged(get_hedge_policy(), stage, _attempt, timeout)
+            else:
+                result = _attempt()
+            if schema is not None:
+                result = schema.expand(result)
+            _cache_store(cache, key, result)
+            return result
+
+        result = _FLIGHTS.do(key, _fetch, timeout=timeout)
+        rec["ok"] = True
+        return result
+    except RequestCancelled:
+        rec["error"] = "cancelled"
+        raise
+    except Exception as e:
+        rec["error"] = type(e).__name__
+        if raise_on_error:
+            raise _as_llm_error(e) from e
         return {}
+    finally:
+        rec["latency_s"] = round(time.monotonic() - started, 4)
+
+
+async def call_json_async(
+    system_text: str,
+    user_content: Any,
+    temperature: float = DEFAULT_TEMPERATURE,
+    timeout: Optional[float] = None,
+    raise_on_error: bool = False,
+    stage: str = "default",
+    hedge: Optional[bool] = None,
+    schema: Optional[WireSchema] = None,
+) -> Dict[str, Any]:
+    """Asyncio counterpart of call_json backed by AsyncOpenAI; same cache and error contract."""
+    started = time.monotonic()
+    rec = _new_record(stage)
+    try:
+        backend = get_router().choose(stage)
+        rec.update(model=backend.model, backend=backend.name)
+        system_text, schema, options = _request_options(backend, stage, system_text, schema)
+        rec["structured"] = schema is not None
+        cache, key, cached = _cache_lookup(backend, system_text, user_content, temperature)
+        if cached is not None:
+            rec.update(source="cache", ok=True)
+            return cached
+        _check_cancelled(stage)
+        _check_budget(timeout)
+
+        async def _attempt() -> Dict[str, Any]:
+            return await _upstream_async(
+                backend, system_text, user_content, temperature, rec, timeout, started, stage, options
+            )
+
+        async def _fetch() -> Dict[str, Any]:
+            rec["source"] = "upstream"
+            if _hedging(stage, hedge):
+                result, rec["hedged"], rec["hedge_won"] = await run_hedged_async(get_hedge_policy(), stage, _attempt)
+            else:
+                result = await _attempt()
+            if schema is not None:
+                result = schema.expand(result)
+            _cache_store(cache, key, result)
+            return result
+
+        result = await await_cancellable(_FLIGHTS.do_async(key, _fetch, timeout=timeout), stage)
+        rec["ok"] = True
+        return result
+    except RequestCancelled:
+        rec["error"] = "cancelled"
+        raise
+    except Exception as e:
+        rec["error"] = type(e).__name__
+        if raise_on_error:
+            raise _as_llm_error(e) from e
+        return {}
+    finally:
+        rec["latency_s"] = round(time.monotonic() - started, 4)
+
+
+_STREAMS: Dict[str, float] = {"streams": 0, "ttft_s_total": 0.0, "first_item_s_total": 0.0, "with_items": 0}
+
+
+def _record_stream(rec: Dict[str, Any]) -> None:
+    with _TOKENS_LOCK:
+        _STREAMS["streams"] += 1
+        _STREAMS["ttft_s_total"] += rec.get("ttft_s") or 0.0
+        if rec.get("first_item_s") is not None:
+            _STREAMS["with_items"] += 1
+            _STREAMS["first_item_s_total"] += rec["first_item_s"]
+
+
+def _items_of(result: Any, keys: Iterable[str]) -> List[Any]:
+    if not isinstance(result, dict):
+        return []
+    for k in keys:
+        if isinstance(result.get(k), list):
+            return list(result[k])
+    return []
+
+
+async def call_json_stream_async(
+    system_text: str,
+    user_content: Any,
+    item_keys: Iterable[str],
+    temperature: float = DEFAULT_TEMPERATURE,
+    timeout: Optional[float] = None,
+    stage: str = "default",
+    schema: Optional[WireSchema] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streamed variant of call_json_async for replies shaped {"<key>": [items]}.
+    Yields each item of the array under one of `item_keys` as soon as it
+    closes in the stream (expanded to long keys when `schema` is active).
+    The call record adds "ttft_s" (first token) and "first_item_s".
+    Cached replies and cassette runs are served whole, item by item.
+    Failures raise LLMError/LLMTimeoutError; items already yielded stand.
+    """
+    started = time.monotonic()
+    rec = _new_record(stage)
+    rec["streamed"] = True
+    try:
+        backend = get_router().choose(stage)
+        rec.update(model=backend.model, backend=backend.name)
+        system_text, schema, options = _request_options(backend, stage, system_text, schema)
+        rec["structured"] = schema is not None
+        keys = list(item_keys) + ([schema.root, schema.short_root] if schema is not None else [])
+        cache, key, cached = _cache_lookup(backend, system_text, user_content, temperature)
+        if cached is not None:
+            rec["source"] = "cache"
+        elif get_cassette() is not None:
+            # Cassettes hold whole replies, so replay/record without streaming.
+            _check_cancelled(stage)
+            _check_budget(timeout)
+            rec["source"] = "upstream"
+            cached = await await_cancellable(_upstream_async(
+                backend, system_text, user_content, temperature, rec, timeout, started, stage, options
+            ), stage)
+        if cached is not None:
+            if schema is not None:
+                cached = schema.expand(cached)
+            for item in _items_of(cached, keys):
+                yield item
+            rec["ok"] = True
+            return
+
+        _check_cancelled(stage)
+        _check_budget(timeout)
+        rec["source"] = "upstream"
+        deadline = current_deadline()
+        waited = await _admit_async(system_text, user_content, _remaining(timeout, started))
+        rec["queue_wait_s"] = round(waited, 4)
+        aimd = get_adaptive_limiter()
+        if aimd is not None:
+            rec["concurrency_wait_s"] = round(await aimd.acquire_async(_remaining(timeout, started)), 4)
+            rec["concurrency_limit"] = int(aimd.limit)
+        parser = JsonItemStream(keys)
+        usage: Dict[str, Any] = {}
+        t0 = time.monotonic()
+        outcome = ERROR
+        try:
+            async for delta in _stream_text_async(
+                backend.model, system_text, user_content, temperature, _remaining(timeout, started),
+                backend=backend, usage=usage, options=options,
+            ):
+                if deadline is not None and deadline.cancelled:
+                    count_cancelled("llm_calls_aborted")
+                    raise RequestCancelled(f"{stage} LLM stream aborted: {deadline.cancel_reason}")
+                rec.setdefault("ttft_s", round(time.monotonic() - started, 4))
+                for item in parser.feed(delta):
+                    rec.setdefault("first_item_s", round(time.monotonic() - started, 4))
+                    yield schema.expand_item(item) if schema is not None else item
+                _remaining(timeout, started)
+            outcome = OK
+        except Exception as e:
+            outcome = _outcome(e)
+            raise
+        finally:
+            _settle(aimd, backend, stage, time.monotonic() - t0, outcome)
+            _record_stream(rec)
+
+        result = _parse_json_text(parser.text)
+        if schema is not None:
+            result = schema.expand(result)
+        _account_tokens(rec, usage, system_text, user_content, result, stage)
+        _cache_store(cache, key, result)
+        rec["ok"] = True
+    except RequestCancelled:
+        rec["error"] = "cancelled"
+        raise
+    except Exception as e:
+        rec["error"] = type(e).__name__
+        raise _as_llm_error(e) from e
+    finally:
+        rec["latency_s"] = round(time.monotonic() - started, 4)
+
+
+def _stream_totals() -> Dict[str, Any]:
+    with _TOKENS_LOCK:
+        n = _STREAMS["streams"]
+        m = _STREAMS["with_items"]
+        return {
+            "streams": int(n),
+            "ttft_s_avg": round(_STREAMS["ttft_s_total"] / n, 4) if n else None,
+            "first_item_s_avg": round(_STREAMS["first_item_s_total"] / m, 4) if m else None,
+        }
+
+
+def _token_totals() -> Dict[str, Dict[str, int]]:
+    with _TOKENS_LOCK:
+        return {k: dict(v) for k, v in _TOKENS.items()}
+
+
+def metrics() -> Dict[str, Any]:
+    """Process-wide counters for the LLM call path."""
+    cache = get_response_cache()
+    limiter = get_rate_limiter()
+    aimd = get_adaptive_limiter()
+    cassette = get_cassette()
+    return {
+        "cache": cache.info() if cache is not None else None,
+        "singleflight": _FLIGHTS.info(),
+        "transport": pool_metrics(),
+        "rate_limit": limiter.info() if limiter is not None else None,
+        "concurrency": aimd.info() if aimd is not None else None,
+        "hedging": get_hedge_policy().info(),
+        "cassette": cassette.info() if cassette is not None else None,
+        "backends": get_router().info(),
+        "tokens": _token_totals(),
+        "streaming": _stream_totals(),
+        "cancellation": cancellation_stats(),
+    }
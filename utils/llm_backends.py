@@ -0,0 +1,213 @@
+from __future__ import annotations
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+from utils.env import env_float
+from utils.llm_cache import ROOT
+
+BACKENDS_PATH = ROOT / "data" / "llm_backends.yaml"
+
+
+@dataclass(frozen=True)
+class Backend:
+    """
+    One OpenAI-compatible chat completions endpoint.
+    base_url None means api.openai.com; a local server (vLLM, Ollama, LM Studio)
+    sets base_url and usually a dummy api_key.
+    """
+    name: str
+    model: str
+    base_url: Optional[str] = None
+    api_key_env: str = "OPENAI_API_KEY"
+    api_key: Optional[str] = None
+    # False for servers without json_schema response formats.
+    structured_output: bool = True
+
+    def resolve_api_key(self) -> str:
+        key = self.api_key or os.getenv(self.api_key_env)
+        if not key:
+            raise RuntimeError(f"{self.api_key_env} is missing for LLM backend {self.name!r}. Add it to your .env")
+        return key
+
+
+# Calls made on behalf of another stage; they use its route and hedging
+# unless configured themselves.
+PARENT_STAGES: Dict[str, str] = {"composer_area": "composer", "composer_batch": "composer"}
+
+
+def stage_chain(stage: str) -> Tuple[str, ...]:
+    """`stage`, then the stage it runs on behalf of, if any."""
+    parent = PARENT_STAGES.get(stage)
+    return (stage, parent) if parent else (stage,)
+
+
+@dataclass(frozen=True)
+class Route:
+    primary: str
+    fallback: Optional[str] = None
+    fallback_latency_s: Optional[float] = None
+
+
+@dataclass
+class _Health:
+    ewma_s: Optional[float] = None
+    calls: int = 0
+    errors: int = 0
+    served: int = 0
+    fallbacks_to: int = 0
+
+
+@dataclass
+class BackendRouter:
+    """
+    Picks the backend for a stage. When the primary's latency EWMA is above
+    the route's threshold, calls go to the fallback instead; every
+    `probe_every`-th such call still goes to the primary so it can recover.
+    """
+    backends: Dict[str, Backend]
+    routes: Dict[str, Route]
+    fallback_latency_s: float = 15.0
+    probe_every: int = 10
+    _health: Dict[str, _Health] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def route_for(self, stage: str) -> Route:
+        for name in stage_chain(stage) + ("default",):
+            if name in self.routes:
+                return self.routes[name]
+        return Route(primary=next(iter(self.backends)))
+
+    def choose(self, stage: str) -> Backend:
+        route = self.route_for(stage)
+        primary = self.backends[route.primary]
+        if not route.fallback or route.fallback not in self.backends:
+            return primary
+        threshold = route.fallback_latency_s or self.fallback_latency_s
+        with self._lock:
+            health = self._health.setdefault(primary.name, _Health())
+            if health.ewma_s is None or health.ewma_s <= threshold:
+                return primary
+            health.fallbacks_to += 1
+            if health.fallbacks_to % max(self.probe_every, 1) == 0:
+                return primary
+        return self.backends[route.fallback]
+
+    def observe(self, backend: str, latency_s: float, ok: bool = True) -> None:
+        with self._lock:
+            health = self._health.setdefault(backend, _Health())
+            health.calls += 1
+            if ok:
+                health.served += 1
+            else:
+                health.errors += 1
+            health.ewma_s = latency_s if health.ewma_s is None else 0.8 * health.ewma_s + 0.2 * latency_s
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "routes": {k: vars(v) for k, v in self.routes.items()},
+                "backends": {
+                    name: {
+                        "model": b.model,
+                        "base_url": b.base_url,
+                        **{k: (round(v, 4) if isinstance(v, float) else v)
+                           for k, v in vars(self._health.get(name, _Health())).items()},
+                    }
+                    for name, b in self.backends.items()
+                },
+            }
+
+
+def _default_backend() -> Backend:
+    return Backend(
+        name="default",
+        model=os.getenv("MODEL_NAME", "gpt-4o-mini"),
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+    )
+
+
+def _parse_route(raw: Any) -> Route:
+    if isinstance(raw, str):
+        return Route(primary=raw)
+    return Route(
+        primary=str(raw["primary"]),
+        fallback=raw.get("fallback"),
+        fallback_latency_s=raw.get("fallback_latency_s"),
+    )
+
+
+def load_router(path: Optional[Path] = None) -> BackendRouter:
+    """
+    Router from a YAML registry (see data/llm_backends.example.yaml).
+    Without a registry every stage uses one "default" backend built from
+    MODEL_NAME and OPENAI_BASE_URL, which is the previous behaviour.
+    """
+    default = _default_backend()
+    threshold = env_float("LLM_FALLBACK_LATENCY_S", 15.0)
+    cfg: Dict[str, Any] = {}
+    if path is not None and path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+
+    backends: Dict[str, Backend] = {}
+    for name, raw in (cfg.get("backends") or {}).items():
+        raw = raw or {}
+        backends[name] = Backend(
+            name=name,
+            model=str(raw.get("model") or default.model),
+            base_url=raw.get("base_url"),
+            api_key_env=str(raw.get("api_key_env") or "OPENAI_API_KEY"),
+            api_key=raw.get("api_key"),
+            structured_output=bool(raw.get("structured_output", True)),
+        )
+    backends.setdefault("default", default)
+
+    routes = {stage: _parse_route(raw) for stage, raw in (cfg.get("routes") or {}).items()}
+    routes.setdefault("default", Route(primary="default"))
+    for stage, route in routes.items():
+        for name in (route.primary, route.fallback):
+            if name and name not in backends:
+                raise ValueError(f"LLM route {stage!r} names unknown backend {name!r}")
+
+    return BackendRouter(
+        backends=backends,
+        routes=routes,
+        fallback_latency_s=float(cfg.get("fallback_latency_s", threshold)),
+    )
+
+
+_ROUTER: Optional[BackendRouter] = None
+_ROUTER_STAMP: Optional[Tuple[Any, ...]] = None
+_ROUTER_LOCK = threading.Lock()
+
+
+def _stamp(path: Path) -> Tuple[Any, ...]:
+    try:
+        st = path.stat()
+        mtime: Any = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        mtime = None
+    return (str(path), mtime, os.getenv("MODEL_NAME"), os.getenv("OPENAI_BASE_URL"), os.getenv("LLM_FALLBACK_LATENCY_S"))
+
+
+def get_router() -> BackendRouter:
+    """
+    Process-wide router, reloaded when the registry file or MODEL_NAME /
+    OPENAI_BASE_URL change. The registry path is LLM_BACKENDS_PATH
+    (default data/llm_backends.yaml).
+    """
+    global _ROUTER, _ROUTER_STAMP
+    path = Path(os.getenv("LLM_BACKENDS_PATH") or BACKENDS_PATH)
+    stamp = _stamp(path)
+    if _ROUTER is not None and _ROUTER_STAMP == stamp:
+        return _ROUTER
+    with _ROUTER_LOCK:
+        if _ROUTER is None or _ROUTER_STAMP != stamp:
+            _ROUTER = load_router(path)
+            _ROUTER_STAMP = stamp
+    return _ROUTER
@@ -0,0 +1,307 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.env import env_flag, env_float, env_int
+
+ROOT = Path(__file__).resolve().parent.parent
+PROMPTS_DIR = ROOT / "prompts"
+DEFAULTS_PATH = ROOT / "data" / "defaults.yaml"
+
+
+def _fingerprint_files() -> List[Path]:
+    files = sorted(PROMPTS_DIR.glob("*.txt")) if PROMPTS_DIR.exists() else []
+    files.append(DEFAULTS_PATH)
+    return files
+
+
+_FP_LOCK = threading.Lock()
+_FP_STATE: Tuple[Tuple[Any, ...], str] = ((), "")
+
+
+def prompt_fingerprint() -> str:
+    """
+    Hash of every prompt template and data/defaults.yaml.
+    Re-hashed only when a file's mtime/size changes, so editing a prompt
+    invalidates cached responses without re-reading files on every call.
+    """
+    global _FP_STATE
+    stamp = []
+    for p in _fingerprint_files():
+        try:
+            st = p.stat()
+            stamp.append((str(p), st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append((str(p), None, None))
+    stamp_t = tuple(stamp)
+
+    with _FP_LOCK:
+        if _FP_STATE[0] == stamp_t:
+            return _FP_STATE[1]
+        h = hashlib.sha256()
+        for p in _fingerprint_files():
+            h.update(p.name.encode("utf-8"))
+            try:
+                h.update(p.read_bytes())
+            except OSError:
+                h.update(b"<missing>")
+        _FP_STATE = (stamp_t, h.hexdigest())
+        return _FP_STATE[1]
+
+
+def canonical_content(user_content: Any) -> str:
+    if isinstance(user_content, str):
+        return user_content
+    return json.dumps(user_content, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def request_key(model: str, temperature: float, system_text: str, user_content: Any, backend: str = "") -> str:
+    """
+    Content-addressed key for one chat completion request. `backend` names
+    the endpoint (its base_url), so two servers exposing the same model
+    name do not share entries.
+    """
+    material = json.dumps(
+        {
+            "backend": backend,
+            "model": model,
+            "temperature": round(float(temperature), 4),
+            "system": system_text,
+            "user": canonical_content(user_content),
+            "fingerprint": prompt_fingerprint(),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _MemoryLRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max(0, max_entries)
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str, expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _SqliteTier:
+    """
+    Shared disk tier. WAL mode lets every uvicorn worker and Streamlit
+    session read concurrently while one of them writes. last_access only
+    orders eviction, so a hit rewrites it only once it is more than
+    `access_resolution_s` old; most reads never take the write lock.
+    """
+
+    def __init__(self, path: Path, max_entries: int, access_resolution_s: float = 300.0):
+        self.path = path
+        self.max_entries = max(0, max_entries)
+        self.access_resolution_s = max(0.0, access_resolution_s)
+        self._local = threading.local()
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, last_access FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        if now - row[2] >= self.access_resolution_s:
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return row[0], row[1]
+
+    def put(self, key: str, value: str, expires_at: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, expires_at, time.time()),
+        )
+        conn.commit()
+        with self._lock:
+            self._puts += 1
+            sweep = self._puts % 64 == 0
+        if sweep:
+            self.evict()
+
+    def evict(self) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        if self.max_entries > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        conn.commit()
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+    def count(self) -> int:
+        row = self._conn().execute("SELECT COUNT(*) FROM responses").fetchone()
+        return int(row[0]) if row else 0
+
+
+class ResponseCache:
+    """
+    Two-tier JSON response cache: in-process LRU in front of a SQLite file.
+    Values are stored as JSON text so callers always get a fresh copy.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl_s: float = 7 * 24 * 3600.0,
+        mem_entries: int = 256,
+        disk_entries: int = 20_000,
+        access_resolution_s: float = 300.0,
+    ):
+        self.ttl_s = ttl_s
+        self.memory = _MemoryLRU(mem_entries)
+        self.disk: Optional[_SqliteTier] = None
+        if path is not None:
+            try:
+                self.disk = _SqliteTier(Path(path), disk_entries, access_resolution_s)
+            except Exception:
+                self.disk = None
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return json.loads(value)
+        if self.disk is not None:
+            try:
+                row = self.disk.get(key)
+            except Exception:
+                row = None
+            if row is not None:
+                self.stats["disk_hits"] += 1
+                self.memory.put(key, row[0], row[1])
+                return json.loads(row[0])
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        text = json.dumps(value, ensure_ascii=False)
+        expires_at = time.time() + self.ttl_s
+        self.memory.put(key, text, expires_at)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, text, expires_at)
+            except Exception:
+                pass
+        self.stats["writes"] += 1
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            try:
+                self.disk.clear()
+            except Exception:
+                pass
+
+    def info(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self.stats)
+        out["memory_entries"] = len(self.memory)
+        if self.disk is not None:
+            try:
+                out["disk_entries"] = self.disk.count()
+            except Exception:
+                out["disk_entries"] = None
+            out["disk_path"] = str(self.disk.path)
+        return out
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Process-wide cache configured from the environment:
+      LLM_CACHE_ENABLED (default on), LLM_CACHE_PATH, LLM_CACHE_TTL_S,
+      LLM_CACHE_MEM_ENTRIES, LLM_CACHE_DISK_ENTRIES, LLM_CACHE_ACCESS_RESOLUTION_S.
+    Set LLM_CACHE_PATH to an empty string for a memory-only cache.
+    """
+    global _CACHE
+    if not env_flag("LLM_CACHE_ENABLED", True):
+        return None
+    if _CACHE is not None:
+        return _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            raw_path = os.getenv("LLM_CACHE_PATH", str(ROOT / ".cache" / "llm_responses.sqlite3"))
+            _CACHE = ResponseCache(
+                path=Path(raw_path) if raw_path else None,
+                ttl_s=env_float("LLM_CACHE_TTL_S", 7 * 24 * 3600.0),
+                mem_entries=env_int("LLM_CACHE_MEM_ENTRIES", 256),
+                disk_entries=env_int("LLM_CACHE_DISK_ENTRIES", 20_000),
+                access_resolution_s=env_float("LLM_CACHE_ACCESS_RESOLUTION_S", 300.0),
+            )
+    return _CACHE
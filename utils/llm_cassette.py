@@ -0,0 +1,141 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils.env import env_flag
+from utils.llm_cache import ROOT, canonical_content
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(LookupError):
+    """Replay mode found no recorded response for the request."""
+
+
+def cassette_key(model: str, temperature: float, system_text: str, user_content: Any) -> str:
+    """
+    Key for one request. Unlike the response cache key it has no prompt
+    fingerprint: the request text itself decides whether a recording matches.
+    """
+    material = json.dumps(
+        {
+            "model": model,
+            "temperature": round(float(temperature), 4),
+            "system": system_text,
+            "user": canonical_content(user_content),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Request/response recordings on disk, one JSON file per request:
+      {"request": {...}, "response": {...}, "latency_s": float, "usage": {...}, "recorded_at": float}
+    Files are written atomically, so concurrent recorders never leave half a file.
+    """
+
+    def __init__(self, directory: Path, mode: str = "replay", replay_latency: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"unknown cassette mode {mode!r}; expected one of {MODES}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        if mode == "record":
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Dict[str, Any]:
+        """Recorded entry for `key`; raises CassetteMiss when there is none."""
+        try:
+            entry = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            self._count("misses")
+            raise CassetteMiss(f"no cassette entry {key[:12]} in {self.directory}") from e
+        self._count("replayed")
+        return entry
+
+    def put(
+        self, key: str, request: Dict[str, Any], response: Any, latency_s: float,
+        usage: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        entry = {
+            "request": request,
+            "response": response,
+            "latency_s": round(latency_s, 4),
+            "usage": usage or {},
+            "recorded_at": time.time(),
+        }
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+        self._count("recorded")
+
+    def replay_delay(self, entry: Dict[str, Any]) -> float:
+        """Recorded latency to re-inject (0 unless replay_latency)."""
+        if not self.replay_latency:
+            return 0.0
+        return float(entry.get("latency_s") or 0.0)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "directory": str(self.directory),
+                "replay_latency": self.replay_latency,
+                **self._stats,
+            }
+
+
+_CASSETTE: Optional[Cassette] = None
+_CASSETTE_CONF: Optional[tuple] = None
+_CASSETTE_LOCK = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    Cassette selected by the environment, or None when LLM_CASSETTE_MODE is off:
+      LLM_CASSETTE_MODE (off | record | replay), LLM_CASSETTE_DIR,
+      LLM_CASSETTE_REPLAY_LATENCY (sleep for the recorded latency on replay).
+    """
+    global _CASSETTE, _CASSETTE_CONF
+    mode = os.getenv("LLM_CASSETTE_MODE", "off").strip().lower() or "off"
+    if mode == "off":
+        return None
+    conf = (
+        mode,
+        os.getenv("LLM_CASSETTE_DIR", str(ROOT / "cassettes")),
+        env_flag("LLM_CASSETTE_REPLAY_LATENCY", False),
+    )
+    # Re-read on change so a benchmark can switch record -> replay in one process.
+    if _CASSETTE is not None and _CASSETTE_CONF == conf:
+        return _CASSETTE
+    with _CASSETTE_LOCK:
+        if _CASSETTE is None or _CASSETTE_CONF != conf:
+            _CASSETTE = Cassette(Path(conf[1]), mode=conf[0], replay_latency=conf[2])
+            _CASSETTE_CONF = conf
+    return _CASSETTE
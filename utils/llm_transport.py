@@ -0,0 +1,216 @@
+from __future__ import annotations
+import asyncio
+import importlib.util
+import threading
+import weakref
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from utils.env import env_flag, env_float, env_int
+
+try:
+    import httpx
+except Exception:  # pragma: no cover - httpx ships with openai
+    httpx = None
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """
+    Connection pool settings for the OpenAI HTTP transport:
+      LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_MAX_KEEPALIVE, LLM_HTTP_KEEPALIVE_S,
+      LLM_HTTP2 (needs the `h2` package), LLM_HTTP_CONNECT_TIMEOUT_S.
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_s: float = 30.0
+    http2: bool = False
+    connect_timeout_s: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            max_connections=env_int("LLM_HTTP_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=env_int("LLM_HTTP_MAX_KEEPALIVE", 20),
+            keepalive_expiry_s=env_float("LLM_HTTP_KEEPALIVE_S", 30.0),
+            http2=env_flag("LLM_HTTP2", False),
+            connect_timeout_s=env_float("LLM_HTTP_CONNECT_TIMEOUT_S", 10.0),
+        )
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class _PoolStats:
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waits = 0
+
+    def enter(self) -> None:
+        with self._lock:
+            self.requests += 1
+            if self.in_flight >= self.max_connections:
+                self.waits += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "waits": self.waits,
+            }
+
+
+if httpx is not None:
+
+    class _CountingTransport(httpx.HTTPTransport):
+        def __init__(self, stats: _PoolStats, **kwargs: Any):
+            super().__init__(**kwargs)
+            self.stats = stats
+
+        def handle_request(self, request):
+            self.stats.enter()
+            try:
+                return super().handle_request(request)
+            finally:
+                self.stats.leave()
+
+    class _CountingAsyncTransport(httpx.AsyncHTTPTransport):
+        def __init__(self, stats: _PoolStats, **kwargs: Any):
+            super().__init__(**kwargs)
+            self.stats = stats
+
+        async def handle_async_request(self, request):
+            self.stats.enter()
+            try:
+                return await super().handle_async_request(request)
+            finally:
+                self.stats.leave()
+
+
+_LOCK = threading.Lock()
+_CONFIG: Optional[PoolConfig] = None
+_STATS: Optional[_PoolStats] = None
+_SYNC_CLIENT: Optional[Any] = None
+_SYNC_TRANSPORT: Optional[Any] = None
+# Async clients are bound to the event loop that opened their connections.
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_ASYNC_TRANSPORTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def _config() -> PoolConfig:
+    global _CONFIG, _STATS
+    if _CONFIG is None:
+        _CONFIG = PoolConfig.from_env()
+        _STATS = _PoolStats(_CONFIG.max_connections)
+    return _CONFIG
+
+
+def _transport_kwargs(cfg: PoolConfig) -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=cfg.max_connections,
+            max_keepalive_connections=cfg.max_keepalive_connections,
+            keepalive_expiry=cfg.keepalive_expiry_s,
+        ),
+        "http2": cfg.http2 and http2_available(),
+    }
+
+
+def _timeout(cfg: PoolConfig):
+    return httpx.Timeout(600.0, connect=cfg.connect_timeout_s)
+
+
+def get_http_client():
+    """
+    Process-wide pooled httpx.Client for the sync OpenAI client.
+    Safe to call from many threads; module state survives Streamlit reruns.
+    Returns None when httpx is unavailable (the SDK then uses its default).
+    """
+    global _SYNC_CLIENT, _SYNC_TRANSPORT
+    if httpx is None:
+        return None
+    if _SYNC_CLIENT is not None:
+        return _SYNC_CLIENT
+    with _LOCK:
+        if _SYNC_CLIENT is None:
+            cfg = _config()
+            _SYNC_TRANSPORT = _CountingTransport(_STATS, **_transport_kwargs(cfg))
+            _SYNC_CLIENT = httpx.Client(transport=_SYNC_TRANSPORT, timeout=_timeout(cfg))
+    return _SYNC_CLIENT
+
+
+def get_async_http_client():
+    """Pooled httpx.AsyncClient for the running event loop (one per loop)."""
+    if httpx is None:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is not None:
+        return client
+    with _LOCK:
+        client = _ASYNC_CLIENTS.get(loop)
+        if client is None:
+            cfg = _config()
+            transport = _CountingAsyncTransport(_STATS, **_transport_kwargs(cfg))
+            client = httpx.AsyncClient(transport=transport, timeout=_timeout(cfg))
+            _ASYNC_TRANSPORTS[loop] = transport
+            _ASYNC_CLIENTS[loop] = client
+    return client
+
+
+def _pool_state(transport: Any) -> Dict[str, int]:
+    """Open/idle connections and queued requests read from the httpcore pool."""
+    out = {"open": 0, "idle": 0, "queued": 0}
+    pool = getattr(transport, "_pool", None)
+    if pool is None:
+        return out
+    try:
+        for conn in list(getattr(pool, "connections", []) or []):
+            if conn.is_closed():
+                continue
+            out["open"] += 1
+            if conn.is_idle():
+                out["idle"] += 1
+        out["queued"] = len(getattr(pool, "_requests", []) or [])
+    except Exception:
+        pass
+    return out
+
+
+def pool_metrics() -> Dict[str, Any]:
+    if httpx is None:
+        return {"available": False}
+    # Same lock as the client builders, so config, stats and transports are one consistent snapshot.
+    with _LOCK:
+        cfg = _config()
+        stats = _STATS
+        transports = [_SYNC_TRANSPORT] if _SYNC_TRANSPORT is not None else []
+        transports.extend(list(_ASYNC_TRANSPORTS.values()))
+        async_loops = len(_ASYNC_CLIENTS)
+    totals = {"open": 0, "idle": 0, "queued": 0}
+    for t in transports:
+        for k, v in _pool_state(t).items():
+            totals[k] += v
+    out: Dict[str, Any] = {
+        "config": asdict(cfg),
+        "http2_active": cfg.http2 and http2_available(),
+        "connections_open": totals["open"],
+        "connections_idle": totals["idle"],
+        "requests_queued": totals["queued"],
+        "async_loops": async_loops,
+    }
+    out.update(stats.snapshot() if stats is not None else {})
+    return out
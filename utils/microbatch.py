@@ -0,0 +1,100 @@
+from __future__ import annotations
+import asyncio
+import contextvars
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from utils.env import env_flag, env_float, env_int
+
+
+def composer_batching_enabled() -> bool:
+    """COMPOSER_BATCH_ENABLED (default off): micro-batch concurrent composer calls."""
+    return env_flag("COMPOSER_BATCH_ENABLED", False)
+
+
+def composer_batch_settings() -> Tuple[float, int]:
+    """(window_s, max_batch) from COMPOSER_BATCH_WINDOW_MS (default 10) and COMPOSER_BATCH_MAX (default 4)."""
+    return env_float("COMPOSER_BATCH_WINDOW_MS", 10.0) / 1000.0, env_int("COMPOSER_BATCH_MAX", 4)
+
+
+# run_batch(group, items) -> one result per item, in order; an item's result
+# may be an exception instance, which is raised to that item's caller only.
+RunBatch = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submit() calls that share a group key for up to
+    `window_s` (or until `max_batch` are waiting) and runs them with a single
+    run_batch(group, items) call, handing each caller its own result.
+
+    The batch runs in a fresh task with an empty context, so it belongs to
+    no single caller: one caller being cancelled does not cancel the batch,
+    and context-local state (call logs, deadlines, priority) is not
+    inherited. Anything run_batch needs from its callers (priority,
+    deadlines) travels in the group key or the items.
+    """
+
+    def __init__(self, run_batch: RunBatch, window_s: float = 0.01, max_batch: int = 4):
+        self.run_batch = run_batch
+        self.window_s = max(float(window_s), 0.0)
+        self.max_batch = max(int(max_batch), 1)
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, Hashable], List[Tuple[Any, asyncio.Future]]] = {}
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+
+    async def submit(self, group: Hashable, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        key = (id(loop), group)
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = []
+                loop.call_later(self.window_s, self._flush, loop, key)
+            batch.append((item, fut))
+            full = len(batch) >= self.max_batch
+        if full:
+            self._flush(loop, key)
+        return await fut
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, key: Tuple[int, Hashable]) -> None:
+        with self._lock:
+            batch = self._pending.pop(key, None)
+            if not batch:
+                return
+            self.batches += 1
+            self.items += len(batch)
+            self.largest = max(self.largest, len(batch))
+        contextvars.Context().run(loop.create_task, self._run(key[1], batch))
+
+    async def _run(self, group: Hashable, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            try:
+                results = await self.run_batch(group, [item for item, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, fut), result in zip(batch, results):
+                if fut.done():
+                    continue
+                if isinstance(result, BaseException):
+                    fut.set_exception(result)
+                else:
+                    fut.set_result(result)
+        finally:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.cancel()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window_s": self.window_s,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "items": self.items,
+                "largest": self.largest,
+                "avg_size": round(self.items / self.batches, 3) if self.batches else None,
+            }
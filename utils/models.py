@@ -57,6 +57,23 @@ class Lighting(BaseModel):
     hours_per_day: float = 0.0
 
 
+class BuildingProfile(BaseModel):
+    """
+    Quantities derived from the normalized input, computed once by
+    intake_agent.normalize and read by the later stages.
+    Shares are fractions of monthly_kWh. AC and lighting estimates above the
+    bill are capped at it, and "other" is the remainder.
+    """
+    model_config = ConfigDict(extra="ignore")
+    ac_kWh_per_month: float = 0.0
+    lighting_kWh_per_month: float = 0.0
+    ac_share: float = 0.0
+    lighting_share: float = 0.0
+    other_share: float = 0.0
+    energy_intensity_kwh_per_m2: float = 0.0
+    connected_load_W: float = 0.0
+
+
 class NormalizedInput(BaseModel):
     model_config = ConfigDict(extra="ignore")
     floor_area_m2: float = 0.0
@@ -72,6 +89,12 @@ class NormalizedInput(BaseModel):
     grid_kg_per_kwh: Optional[float] = Field(
         default=None, description="Grid emission factor (kg CO2e per kWh)."
     )
+    building_type: Optional[str] = Field(
+        default=None, description='Free-form type such as "home" or "small_office"; selects the peer segment.'
+    )
+    profile: Optional[BuildingProfile] = Field(
+        default=None, description="Derived quantities; filled in by intake_agent.normalize."
+    )
 
 
 class Finding(BaseModel):
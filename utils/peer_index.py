@@ -0,0 +1,266 @@
+from __future__ import annotations
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.env import env_flag, env_float, env_int
+from utils.llm_cache import ROOT
+
+INDEX_DIR = ROOT / ".cache" / "peer_index"
+META_FILE = "segments.json"
+PENDING_FILE = "pending.jsonl"
+
+# Upper floor-area bound (m²) of each size band.
+SIZE_BANDS = ((150.0, "small"), (1000.0, "medium"), (math.inf, "large"))
+ANY = "*"
+
+
+def building_type_key(value: Any) -> Optional[str]:
+    s = str(value or "").strip().lower().replace(" ", "_").replace("-", "_")
+    return s or None
+
+
+def size_band(floor_area_m2: Any) -> Optional[str]:
+    try:
+        area = float(floor_area_m2)
+    except Exception:
+        return None
+    if not area > 0:
+        return None
+    return next(name for upper, name in SIZE_BANDS if area < upper)
+
+
+def segment_keys(building_type: Any, floor_area_m2: Any) -> List[str]:
+    """Segments a building belongs to, most specific first: type/band, type/*, */band, */*."""
+    t, b = building_type_key(building_type), size_band(floor_area_m2)
+    keys = []
+    if t and b:
+        keys.append(f"{t}/{b}")
+    if t:
+        keys.append(f"{t}/{ANY}")
+    if b:
+        keys.append(f"{ANY}/{b}")
+    keys.append(f"{ANY}/{ANY}")
+    return keys
+
+
+def intensity(floor_area_m2: Any, monthly_kWh: Any) -> Optional[float]:
+    try:
+        area, kwh = float(floor_area_m2), float(monthly_kWh)
+    except Exception:
+        return None
+    if not (area > 0 and kwh > 0 and math.isfinite(area) and math.isfinite(kwh)):
+        return None
+    return kwh / area
+
+
+def _group(rows: Iterable[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Sorted energy intensities per segment."""
+    grouped: Dict[str, List[float]] = {}
+    for row in rows:
+        ei = intensity(row.get("floor_area_m2"), row.get("monthly_kWh"))
+        if ei is None:
+            continue
+        for key in segment_keys(row.get("building_type"), row.get("floor_area_m2")):
+            grouped.setdefault(key, []).append(ei)
+    return {k: np.sort(np.asarray(v, dtype=np.float64)) for k, v in grouped.items()}
+
+
+class PeerIndex:
+    """
+    Sorted energy intensities (kWh/m²/month) of historical buildings, one
+    run per segment, concatenated into one .npy file that is memory-mapped
+    read-only. segments.json maps each segment to its (offset, length), so a
+    percentile is one binary search over the slice.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        meta = json.loads((self.directory / META_FILE).read_text(encoding="utf-8"))
+        self.generation = int(meta["generation"])
+        self.built_at = float(meta.get("built_at", 0.0))
+        self.values = np.load(self.directory / meta["values"], mmap_mode="r")
+        self.segments: Dict[str, tuple] = {k: (int(off), int(n)) for k, (off, n) in meta["segments"].items()}
+
+    def segment(self, key: str) -> np.ndarray:
+        off, n = self.segments.get(key, (0, 0))
+        return self.values[off:off + n]
+
+    def percentile(
+        self, value: float, building_type: Any = None, floor_area_m2: Any = None, min_samples: int = 30
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Share of peers (in %) whose intensity is at or below `value`, from
+        the most specific segment with at least `min_samples` buildings.
+        """
+        for key in segment_keys(building_type, floor_area_m2):
+            off, n = self.segments.get(key, (0, 0))
+            if n >= max(min_samples, 1):
+                rank = int(np.searchsorted(self.values[off:off + n], value, side="right"))
+                return {"percentile": round(100.0 * rank / n, 1), "segment": key, "peers": n}
+        return None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.directory),
+            "generation": self.generation,
+            "built_at": self.built_at,
+            "segments": len(self.segments),
+            "buildings": self.segments.get(f"{ANY}/{ANY}", (0, 0))[1],
+        }
+
+
+def _write(directory: Path, segments: Dict[str, np.ndarray], generation: int) -> None:
+    """Write a new generation; readers switch when segments.json is replaced."""
+    directory.mkdir(parents=True, exist_ok=True)
+    keys = sorted(segments)
+    values = np.concatenate([segments[k] for k in keys]) if keys else np.zeros(0)
+    name = f"values-{generation}.npy"
+    with open(directory / f"{name}.tmp", "wb") as f:
+        np.save(f, values)
+    os.replace(directory / f"{name}.tmp", directory / name)
+
+    offsets, off = {}, 0
+    for k in keys:
+        offsets[k] = [off, len(segments[k])]
+        off += len(segments[k])
+    meta = {"generation": generation, "built_at": time.time(), "values": name, "segments": offsets}
+    tmp = directory / f"{META_FILE}.tmp"
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, directory / META_FILE)
+
+    # Open memory maps keep working after unlink on POSIX; elsewhere the old
+    # file just stays until the next build.
+    for old in directory.glob("values-*.npy"):
+        if old.name != name:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+def build_peer_index(directory: Path, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Full rebuild from rows with building_type, floor_area_m2 and monthly_kWh.
+    Returns the number of buildings indexed.
+    """
+    directory = Path(directory)
+    segments = _group(rows)
+    previous = _read_generation(directory)
+    _write(directory, segments, previous + 1)
+    return len(segments.get(f"{ANY}/{ANY}", ()))
+
+
+def _read_generation(directory: Path) -> int:
+    try:
+        return int(json.loads((directory / META_FILE).read_text(encoding="utf-8"))["generation"])
+    except Exception:
+        return 0
+
+
+_PENDING_LOCK = threading.Lock()
+
+
+def record_observation(directory: Path, building_type: Any, floor_area_m2: Any, monthly_kWh: Any) -> bool:
+    """Queue one building for the next update_peer_index(); False if it has no usable intensity."""
+    if intensity(floor_area_m2, monthly_kWh) is None:
+        return False
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    line = json.dumps({
+        "building_type": building_type_key(building_type),
+        "floor_area_m2": float(floor_area_m2),
+        "monthly_kWh": float(monthly_kWh),
+    })
+    with _PENDING_LOCK, open(directory / PENDING_FILE, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+    return True
+
+
+def update_peer_index(directory: Path) -> int:
+    """
+    Merge queued observations into the index without re-reading the source
+    dataset: each segment's new values are sorted and spliced into the
+    existing sorted run. Returns the number of buildings merged.
+    """
+    directory = Path(directory)
+    pending = directory / PENDING_FILE
+    merging = directory / f"{PENDING_FILE}.merging"
+    with _PENDING_LOCK:
+        if pending.exists() and not merging.exists():
+            os.replace(pending, merging)
+    if not merging.exists():
+        return 0
+    rows = []
+    with open(merging, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    new = _group(rows)
+
+    try:
+        current = PeerIndex(directory)
+        segments = {k: np.asarray(current.segment(k)) for k in current.segments}
+    except (OSError, ValueError, KeyError):
+        segments = {}
+    for key, values in new.items():
+        old = segments.get(key)
+        segments[key] = values if old is None else np.insert(old, np.searchsorted(old, values), values)
+    _write(directory, segments, _read_generation(directory) + 1)
+    merging.unlink()
+    return len(new.get(f"{ANY}/{ANY}", ()))
+
+
+def peer_index_dir() -> Path:
+    """PEER_INDEX_PATH (default .cache/peer_index)."""
+    return Path(os.getenv("PEER_INDEX_PATH") or INDEX_DIR)
+
+
+def peer_min_samples() -> int:
+    """PEER_MIN_SAMPLES (default 30): smaller segments fall back to a broader one."""
+    return env_int("PEER_MIN_SAMPLES", 30)
+
+
+def peer_recording_enabled() -> bool:
+    """PEER_INDEX_RECORD (default off): queue every audited building for the next update."""
+    return env_flag("PEER_INDEX_RECORD", False)
+
+
+_INDEX: Optional[PeerIndex] = None
+_INDEX_KEY: Any = None
+_CHECKED_AT = 0.0
+_LOCK = threading.Lock()
+
+
+def get_peer_index() -> Optional[PeerIndex]:
+    """
+    The index at peer_index_dir(), or None if none has been built. A rebuild
+    is picked up within PEER_INDEX_CHECK_S seconds (default 5).
+    """
+    global _INDEX, _INDEX_KEY, _CHECKED_AT
+    directory = peer_index_dir()
+    now = time.monotonic()
+    if _INDEX_KEY is not None and _INDEX_KEY[0] == directory and now - _CHECKED_AT < env_float("PEER_INDEX_CHECK_S", 5.0):
+        return _INDEX
+    with _LOCK:
+        _CHECKED_AT = now
+        try:
+            key = (directory, os.stat(directory / META_FILE).st_mtime_ns)
+        except OSError:
+            _INDEX, _INDEX_KEY = None, (directory, None)
+            return None
+        if key != _INDEX_KEY:
+            try:
+                _INDEX = PeerIndex(directory)
+            except (OSError, ValueError, KeyError):
+                _INDEX = None
+            _INDEX_KEY = key
+        return _INDEX
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from utils.profile import profile_of
+from utils.quantile_sketch import KLLSketch
+
+# Per-site metrics, each summarised by one sketch.
+METRICS = (
+    "energy_intensity_kwh_per_m2",
+    "kwh_saved_per_month",
+    "lkr_saved_per_month",
+    "pct_kwh_saved",
+    "payback_months",
+)
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def site_metrics(result: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Metrics of one run_workflow() result. Payback is the site's blended
+    figure (total cost / total monthly LKR saved) and is omitted when
+    nothing is saved; intensity is omitted without a floor area.
+    """
+    building = result.get("input") or {}
+    plan = result.get("plan") or {}
+    totals = plan.get("totals") or {}
+    out: Dict[str, float] = {}
+
+    intensity = profile_of(building).energy_intensity_kwh_per_m2
+    if intensity > 0:
+        out["energy_intensity_kwh_per_m2"] = intensity
+    kwh = float(totals.get("kWh_saved_per_month") or 0.0)
+    lkr = float(totals.get("LKR_saved_per_month") or 0.0)
+    out["kwh_saved_per_month"] = kwh
+    out["lkr_saved_per_month"] = lkr
+    baseline = float(building.get("monthly_kWh") or 0.0)
+    if baseline > 0:
+        out["pct_kwh_saved"] = kwh / baseline * 100.0
+    cost = sum(float(a.get("est_cost") or 0.0) for a in plan.get("all_actions") or [])
+    if lkr > 0:
+        out["payback_months"] = cost / lkr
+    return out
+
+
+class PortfolioStats:
+    """
+    Portfolio distributions kept as one KLLSketch per metric, so memory
+    stays flat however many sites are added. add() takes each site's result
+    as it completes; merge() and to_dict()/from_dict() combine the stats of
+    several workers.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.sketches: Dict[str, KLLSketch] = {m: KLLSketch(k, seed=seed) for m in METRICS}
+        self.sites = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def add(self, result: Dict[str, Any]) -> None:
+        if not result or not result.get("plan"):
+            self.add_failure()
+            return
+        metrics = site_metrics(result)
+        with self._lock:
+            self.sites += 1
+            for name, value in metrics.items():
+                self.sketches[name].update(value)
+
+    def add_failure(self) -> None:
+        with self._lock:
+            self.failed += 1
+
+    def merge(self, other: "PortfolioStats") -> "PortfolioStats":
+        with self._lock:
+            for name, sketch in other.sketches.items():
+                self.sketches.setdefault(name, KLLSketch(self.k)).merge(sketch)
+            self.sites += other.sites
+            self.failed += other.failed
+        return self
+
+    def quantiles(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Dict[str, Any]]:
+        """{metric: {"p10": ..., "p50": ..., "p90": ..., "count": n}} for the requested quantiles."""
+        qs: Tuple[float, ...] = tuple(qs)
+        with self._lock:
+            out = {}
+            for name, sketch in self.sketches.items():
+                row: Dict[str, Any] = {f"p{round(q * 100):g}": sketch.quantile(q) for q in qs}
+                row["count"] = sketch.n
+                out[name] = row
+            return out
+
+    def summary(self) -> Dict[str, Any]:
+        return {"sites": self.sites, "failed": self.failed, "quantiles": self.quantiles()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "k": self.k,
+                "sites": self.sites,
+                "failed": self.failed,
+                "sketches": {name: s.to_dict() for name, s in self.sketches.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PortfolioStats":
+        stats = cls(int(data.get("k", 200)))
+        stats.sites = int(data.get("sites", 0))
+        stats.failed = int(data.get("failed", 0))
+        for name, s in (data.get("sketches") or {}).items():
+            stats.sketches[name] = KLLSketch.from_dict(s)
+        return stats
@@ -0,0 +1,71 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable
+
+from utils.models import BuildingProfile, NormalizedInput
+
+DAYS_PER_MONTH = 30
+
+
+def field_of(obj: Any, key: str, default: Any = 0.0) -> Any:
+    """Field of a normalized dict or of its pydantic model."""
+    if isinstance(obj, dict):
+        v = obj.get(key, default)
+    else:
+        v = getattr(obj, key, default)
+    return default if v is None else v
+
+
+def _ac_units(normalized: Any) -> Iterable[Any]:
+    return field_of(normalized, "ac_units", None) or []
+
+
+def building_profile(normalized: Any) -> BuildingProfile:
+    """Derive the profile from a normalized dict or NormalizedInput."""
+    baseline = max(float(field_of(normalized, "monthly_kWh")), 0.0)
+    floor_area = float(field_of(normalized, "floor_area_m2"))
+    lighting = field_of(normalized, "lighting", None) or {}
+
+    ac_kwh, ac_watt = 0.0, 0.0
+    for ac in _ac_units(normalized):
+        n = max(int(field_of(ac, "count", 0)), 1)
+        ac_kwh += float(field_of(ac, "watt")) * float(field_of(ac, "hours_per_day")) * n * DAYS_PER_MONTH / 1000
+        ac_watt += float(field_of(ac, "watt")) * n
+    bulbs = int(field_of(lighting, "bulbs", 0))
+    watt_per_bulb = float(field_of(lighting, "watt_per_bulb"))
+    light_kwh = bulbs * watt_per_bulb * float(field_of(lighting, "hours_per_day")) * DAYS_PER_MONTH / 1000
+
+    ac_share = min(ac_kwh / baseline, 1.0) if baseline > 0 else 0.0
+    lighting_share = min(light_kwh / baseline, 1.0 - ac_share) if baseline > 0 else 0.0
+    return BuildingProfile(
+        ac_kWh_per_month=ac_kwh,
+        lighting_kWh_per_month=light_kwh,
+        ac_share=ac_share,
+        lighting_share=lighting_share,
+        other_share=1.0 - ac_share - lighting_share if baseline > 0 else 0.0,
+        energy_intensity_kwh_per_m2=float(field_of(normalized, "monthly_kWh")) / floor_area if floor_area > 0 else 0.0,
+        connected_load_W=ac_watt + bulbs * watt_per_bulb,
+    )
+
+
+def profile_of(normalized: Any) -> BuildingProfile:
+    """
+    The profile intake attached, or one derived now for inputs built
+    elsewhere. An attached profile is trusted; inputs that did not come
+    from intake go through with_own_profile() first.
+    """
+    profile = field_of(normalized, "profile", None)
+    if isinstance(profile, BuildingProfile):
+        return profile
+    if isinstance(profile, dict):
+        return BuildingProfile(**profile)
+    return building_profile(normalized)
+
+
+def with_own_profile(normalized: NormalizedInput) -> NormalizedInput:
+    """A client-sent NormalizedInput with its profile derived from its own fields, whatever the client put there."""
+    return normalized.model_copy(update={"profile": building_profile(normalized)})
+
+
+def without_profile(normalized: Dict[str, Any]) -> Dict[str, Any]:
+    """Building data as sent to the LLM: the derived profile is ours, not the user's."""
+    return {k: v for k, v in normalized.items() if k != "profile"}
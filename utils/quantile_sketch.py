@@ -0,0 +1,119 @@
+from __future__ import annotations
+import math
+import random
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class KLLSketch:
+    """
+    KLL streaming quantile sketch (Karnin, Lang & Liberty). Holds
+    O(k + log n) values whatever the stream length; rank error is about
+    1.7/k with high probability (k=200 gives about 1%).
+
+    Level h holds values that each stand for 2**h inputs. A full level is
+    sorted and every other value (random offset) moves up a level. Sketches
+    merge level by level, so per-process sketches can be combined; to_dict()
+    and from_dict() carry them across process boundaries as JSON.
+    """
+
+    C = 2.0 / 3.0
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = max(int(k), 8)
+        self.n = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.levels: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * self.C ** depth)), 2)
+
+    def _recount(self) -> None:
+        self._size = sum(len(lv) for lv in self.levels)
+        self._max_size = sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def update(self, x: float) -> None:
+        x = float(x)
+        if not math.isfinite(x):
+            return
+        self.n += 1
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        self.levels[0].append(x)
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def extend(self, xs: Iterable[float]) -> None:
+        for x in xs:
+            self.update(x)
+
+    def _compress(self) -> None:
+        self._recount()
+        while self._size >= self._max_size:
+            for h, level in enumerate(self.levels):
+                if len(level) >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append([])
+                    level.sort()
+                    # An odd value out stays behind so total weight is preserved.
+                    keep = [level.pop()] if len(level) % 2 else []
+                    offset = self._rng.randint(0, 1)
+                    self.levels[h + 1].extend(level[offset::2])
+                    self.levels[h] = keep
+                    self._recount()
+                    break
+            else:
+                return
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold `other` into this sketch (in place) and return self."""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, level in enumerate(other.levels):
+            self.levels[h].extend(level)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+        q = min(max(float(q), 0.0), 1.0)
+        if q == 0.0:
+            return self.min
+        if q == 1.0:
+            return self.max
+        weighted = sorted((x, 1 << h) for h, level in enumerate(self.levels) for x in level)
+        total = sum(w for _, w in weighted)
+        target = q * total
+        seen = 0
+        for x, w in weighted:
+            seen += w
+            if seen >= target:
+                return x
+        return self.max
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        return [self.quantile(q) for q in qs]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "n": self.n, "min": self.min, "max": self.max, "levels": [list(lv) for lv in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], seed: Optional[int] = None) -> "KLLSketch":
+        sketch = cls(int(data.get("k", 200)), seed=seed)
+        sketch.n = int(data.get("n", 0))
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        sketch.levels = [[float(x) for x in lv] for lv in (data.get("levels") or [[]])] or [[]]
+        sketch._recount()
+        return sketch
@@ -0,0 +1,255 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.env import env_float
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class RateLimitTimeout(TimeoutError):
+    """The call could not get rate-limit capacity within its time budget."""
+
+
+def priority_rank(priority: str | None) -> int:
+    return PRIORITIES.get(str(priority or "batch").lower(), PRIORITIES["batch"])
+
+
+class _LocalBuckets:
+    """
+    Two token buckets refilled continuously: requests/min and tokens/min.
+    A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm = max(rpm, 0.0)
+        self.tpm = max(tpm, 0.0)
+        now = time.monotonic()
+        self._state = {"req": (self.rpm, now), "tok": (self.tpm, now)}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _level(level: float, stamp: float, per_min: float, now: float) -> float:
+        return min(per_min, level + (now - stamp) * per_min / 60.0)
+
+    def _take(self, req: float, tok: float, tokens: float) -> Tuple[float, float, float]:
+        """Returns (wait_s, req_after, tok_after) for 1 request + `tokens`."""
+        # A single call larger than the whole bucket is admitted once the bucket is full.
+        need_tok = min(tokens, self.tpm)
+        wait = 0.0
+        if self.rpm and req < 1.0:
+            wait = max(wait, (1.0 - req) * 60.0 / self.rpm)
+        if self.tpm and tok < need_tok:
+            wait = max(wait, (need_tok - tok) * 60.0 / self.tpm)
+        return wait, req - 1.0, tok - need_tok
+
+    def try_take(self, tokens: float) -> Tuple[bool, float]:
+        """Take 1 request + `tokens` if both buckets allow; otherwise return the wait hint."""
+        with self._lock:
+            now = time.monotonic()
+            req = self._level(*self._state["req"], self.rpm, now) if self.rpm else 0.0
+            tok = self._level(*self._state["tok"], self.tpm, now) if self.tpm else 0.0
+            wait, req_after, tok_after = self._take(req, tok, tokens)
+            if wait > 0:
+                return False, wait
+            self._state["req"] = (req_after, now)
+            self._state["tok"] = (tok_after, now)
+            return True, 0.0
+
+
+class _SqliteBuckets(_LocalBuckets):
+    """
+    Cross-process variant: bucket levels live in a SQLite file so every
+    uvicorn worker and Streamlit process draws from the same budget.
+    """
+
+    def __init__(self, rpm: float, tpm: float, path: Path):
+        super().__init__(rpm, tpm)
+        self.path = path
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL, stamp REAL)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def try_take(self, tokens: float) -> Tuple[bool, float]:
+        conn = self._conn()
+        # Wall clock: monotonic clocks are not comparable across processes.
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = dict((r[0], (r[1], r[2])) for r in conn.execute("SELECT name, level, stamp FROM buckets"))
+            req = self._level(*rows.get("req", (self.rpm, now)), self.rpm, now) if self.rpm else 0.0
+            tok = self._level(*rows.get("tok", (self.tpm, now)), self.tpm, now) if self.tpm else 0.0
+            wait, req_after, tok_after = self._take(req, tok, tokens)
+            if wait > 0:
+                conn.execute("ROLLBACK")
+                return False, wait
+            if self.rpm:
+                conn.execute("INSERT OR REPLACE INTO buckets VALUES ('req', ?, ?)", (req_after, now))
+            if self.tpm:
+                conn.execute("INSERT OR REPLACE INTO buckets VALUES ('tok', ?, ?)", (tok_after, now))
+            conn.execute("COMMIT")
+            return True, 0.0
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RateLimiter:
+    """
+    Priority-aware admission in front of the LLM provider.
+    Waiters queue by (priority rank, arrival); only the head of the queue may
+    draw from the buckets, so interactive calls overtake queued batch calls.
+    Threads block on a condition; asyncio tasks poll without blocking the loop.
+    """
+
+    POLL_S = 0.05
+
+    def __init__(self, rpm: float, tpm: float, shared_path: Optional[Path] = None):
+        self.buckets: _LocalBuckets = (
+            _SqliteBuckets(rpm, tpm, shared_path) if shared_path else _LocalBuckets(rpm, tpm)
+        )
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._stats: Dict[str, Dict[str, float]] = {
+            name: {"calls": 0, "wait_s_total": 0.0, "wait_s_max": 0.0} for name in PRIORITIES
+        }
+
+    def _enqueue(self, priority: str) -> Tuple[int, int]:
+        ticket = (priority_rank(priority), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._heap, ticket)
+        return ticket
+
+    def _leave(self, ticket: Tuple[int, int]) -> None:
+        with self._cond:
+            if ticket in self._heap:
+                self._heap.remove(ticket)
+                heapq.heapify(self._heap)
+            self._cond.notify_all()
+
+    def _is_head(self, ticket: Tuple[int, int]) -> bool:
+        with self._cond:
+            return bool(self._heap) and self._heap[0] == ticket
+
+    def _admitted(self, ticket: Tuple[int, int]) -> None:
+        # By value: a higher-priority ticket may have become the head meanwhile.
+        with self._cond:
+            self._heap.remove(ticket)
+            heapq.heapify(self._heap)
+            self._cond.notify_all()
+
+    def _try(self, ticket: Tuple[int, int], tokens: float) -> Tuple[bool, float]:
+        # The bucket draw (a SQLite transaction when shared) runs without _cond held.
+        if not self._is_head(ticket):
+            return False, self.POLL_S
+        ok, wait = self.buckets.try_take(tokens)
+        if ok:
+            self._admitted(ticket)
+        return ok, wait
+
+    async def _try_async(self, ticket: Tuple[int, int], tokens: float) -> Tuple[bool, float]:
+        if not self._is_head(ticket):
+            return False, self.POLL_S
+        if isinstance(self.buckets, _SqliteBuckets):
+            # BEGIN IMMEDIATE can wait up to the busy timeout; keep it off the event loop.
+            ok, wait = await asyncio.to_thread(self.buckets.try_take, tokens)
+        else:
+            ok, wait = self.buckets.try_take(tokens)
+        if ok:
+            self._admitted(ticket)
+        return ok, wait
+
+    def _record(self, priority: str, waited: float) -> float:
+        name = priority if priority in self._stats else "batch"
+        with self._cond:
+            st = self._stats[name]
+            st["calls"] += 1
+            st["wait_s_total"] += waited
+            st["wait_s_max"] = max(st["wait_s_max"], waited)
+        return waited
+
+    def acquire(self, tokens: float, priority: str = "batch", timeout: Optional[float] = None) -> float:
+        """Block until admitted; returns the queue wait in seconds."""
+        started = time.monotonic()
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                ok, wait = self._try(ticket, tokens)
+                if ok:
+                    return self._record(priority, time.monotonic() - started)
+                waited = time.monotonic() - started
+                if timeout is not None and waited + min(wait, self.POLL_S) > timeout:
+                    raise RateLimitTimeout(f"rate limit queue wait exceeded {timeout:.2f}s")
+                with self._cond:
+                    self._cond.wait(min(wait, self.POLL_S))
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    async def acquire_async(self, tokens: float, priority: str = "batch", timeout: Optional[float] = None) -> float:
+        started = time.monotonic()
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                ok, wait = await self._try_async(ticket, tokens)
+                if ok:
+                    return self._record(priority, time.monotonic() - started)
+                waited = time.monotonic() - started
+                if timeout is not None and waited + min(wait, self.POLL_S) > timeout:
+                    raise RateLimitTimeout(f"rate limit queue wait exceeded {timeout:.2f}s")
+                await asyncio.sleep(min(wait, self.POLL_S))
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    def info(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "rpm": self.buckets.rpm,
+                "tpm": self.buckets.tpm,
+                "shared": isinstance(self.buckets, _SqliteBuckets),
+                "queued": len(self._heap),
+                "by_priority": {k: dict(v) for k, v in self._stats.items()},
+            }
+
+
+_LIMITER: Optional[RateLimiter] = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Process-wide limiter, or None when both limits are unset:
+      LLM_RATE_LIMIT_RPM, LLM_RATE_LIMIT_TPM (0 = unlimited),
+      LLM_RATE_LIMIT_SHARED_PATH (SQLite file shared across processes).
+    """
+    global _LIMITER
+    if _LIMITER is not None:
+        return _LIMITER
+    rpm = env_float("LLM_RATE_LIMIT_RPM", 0.0)
+    tpm = env_float("LLM_RATE_LIMIT_TPM", 0.0)
+    if rpm <= 0 and tpm <= 0:
+        return None
+    with _LIMITER_LOCK:
+        if _LIMITER is None:
+            shared = os.getenv("LLM_RATE_LIMIT_SHARED_PATH") or None
+            _LIMITER = RateLimiter(rpm, tpm, Path(shared) if shared else None)
+    return _LIMITER
@@ -0,0 +1,370 @@
+from __future__ import annotations
+import ast
+import os
+import string
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from utils.env import env_float
+from utils.llm_cache import ROOT
+from utils.profile import field_of, profile_of
+
+RULES_PATH = ROOT / "data" / "audit_rules.yaml"
+
+SEVERITIES = ("low", "med", "high")
+BUILDING_NAMES = ("monthly_kWh", "floor_area_m2", "tariff_LKR_per_kWh", "energy_intensity")
+SCOPE_NAMES = {
+    "building": BUILDING_NAMES,
+    "lighting": BUILDING_NAMES + ("watt_per_bulb", "bulbs", "hours_per_day"),
+    "ac_unit": BUILDING_NAMES + ("star_rating", "hours_per_day", "watt", "count", "unit"),
+}
+
+_FUNCS = {"min": min, "max": max, "abs": abs, "round": round}
+_GLOBALS: Dict[str, Any] = {"__builtins__": {}, **_FUNCS}
+_ALLOWED = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call,
+    ast.Name, ast.Constant, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+
+class RulePackError(ValueError):
+    """The rule pack file is malformed or uses something the expression language does not allow."""
+
+
+class _Checker(ast.NodeTransformer):
+    """Rejects anything outside _ALLOWED and folds benchmark lookups (group.key) into constants."""
+
+    def __init__(self, where: str, names: Tuple[str, ...], benchmarks: Dict[str, Any]):
+        self.where = where
+        self.names = names
+        self.benchmarks = benchmarks
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        if not isinstance(node, _ALLOWED):
+            raise RulePackError(f"{self.where}: {type(node).__name__} is not allowed")
+        return super().generic_visit(node)
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        group = self.benchmarks.get(node.value.id) if isinstance(node.value, ast.Name) else None
+        if not isinstance(group, dict) or node.attr not in group:
+            raise RulePackError(f"{self.where}: unknown benchmark {ast.unparse(node)}")
+        return ast.copy_location(ast.Constant(group[node.attr]), node)
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id not in self.names and node.id not in _FUNCS:
+            raise RulePackError(f"{self.where}: unknown name {node.id!r}")
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        if not (isinstance(node.func, ast.Name) and node.func.id in _FUNCS) or node.keywords:
+            raise RulePackError(f"{self.where}: only {', '.join(_FUNCS)} can be called")
+        return self.generic_visit(node)
+
+
+def compile_expression(source: Any, where: str, names: Tuple[str, ...], benchmarks: Dict[str, Any]):
+    try:
+        tree = ast.parse(str(source).strip(), mode="eval")
+    except SyntaxError as e:
+        raise RulePackError(f"{where}: {e.msg}") from None
+    tree = ast.fix_missing_locations(_Checker(where, names, benchmarks).visit(tree))
+    return compile(tree, f"<{where}>", "eval")
+
+
+def _check_template(template: Any, where: str, names: Tuple[str, ...]) -> str:
+    template = str(template)
+    try:
+        fields = [f for _, f, _, _ in string.Formatter().parse(template) if f is not None]
+    except ValueError as e:
+        raise RulePackError(f"{where}: {e}") from None
+    for f in fields:
+        head = f.split("[", 1)[0].split(".", 1)[0]
+        if head not in names and head != "benchmarks":
+            raise RulePackError(f"{where}: unknown name {head!r}")
+    return template
+
+
+def logic_key(scope: str, when: Any, severity: Any, impact: Any) -> Tuple[str, ...]:
+    """A rule's scope and parsed expressions: equal for rules that decide and compute the same, however written."""
+    def parsed(source: Any) -> str:
+        return ast.dump(ast.parse(str(source).strip(), mode="eval"))
+
+    return (scope, parsed(when), severity if severity in SEVERITIES else parsed(severity), parsed(impact))
+
+
+@dataclass
+class RuleStats:
+    evaluations: int = 0
+    hits: int = 0
+    errors: int = 0
+    time_ns: int = 0
+
+
+@dataclass
+class CompiledRule:
+    id: str
+    scope: str
+    area: str
+    when: Any
+    severity: Any  # a SEVERITIES string or a code object
+    confidence: float
+    impact: Any
+    issue: str
+    reason: str
+    logic: Tuple[str, ...] = ()  # logic_key() of the rule's source
+    stats: RuleStats = field(default_factory=RuleStats)
+
+    def apply(self, names: Dict[str, Any], benchmarks: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not eval(self.when, _GLOBALS, names):
+            return None
+        severity = self.severity if isinstance(self.severity, str) else eval(self.severity, _GLOBALS, names)
+        if severity not in SEVERITIES:
+            raise RulePackError(f"rule {self.id}: severity {severity!r}")
+        impact = eval(self.impact, _GLOBALS, names)
+        return {
+            "area": self.area,
+            "issue": self.issue.format(benchmarks=benchmarks, **names),
+            "severity": severity,
+            "reason": self.reason.format(benchmarks=benchmarks, **names),
+            "confidence": self.confidence,
+            "estimated_kwh_impact": impact,
+        }
+
+
+def _compile_rule(spec: Any, benchmarks: Dict[str, Any]) -> CompiledRule:
+    if not isinstance(spec, dict) or not spec.get("id"):
+        raise RulePackError(f"every rule needs an id: {spec!r}")
+    rid = str(spec["id"])
+    missing = [k for k in ("scope", "area", "when", "severity", "confidence", "impact", "issue", "reason") if k not in spec]
+    if missing:
+        raise RulePackError(f"rule {rid}: missing {', '.join(missing)}")
+    scope = spec["scope"]
+    if scope not in SCOPE_NAMES:
+        raise RulePackError(f"rule {rid}: scope must be one of {', '.join(SCOPE_NAMES)}")
+    names = SCOPE_NAMES[scope]
+    severity = spec["severity"]
+    return CompiledRule(
+        id=rid,
+        scope=scope,
+        area=str(spec["area"]),
+        when=compile_expression(spec["when"], f"rule {rid} when", names, benchmarks),
+        severity=severity if severity in SEVERITIES else compile_expression(severity, f"rule {rid} severity", names, benchmarks),
+        confidence=float(spec["confidence"]),
+        impact=compile_expression(spec["impact"], f"rule {rid} impact", names, benchmarks),
+        issue=_check_template(spec["issue"], f"rule {rid} issue", names),
+        reason=_check_template(spec["reason"], f"rule {rid} reason", names),
+        logic=logic_key(scope, spec["when"], severity, spec["impact"]),
+    )
+
+
+class RulePack:
+    """
+    Audit rules compiled from data/audit_rules.yaml. Expressions are parsed,
+    checked and compiled to code objects once, with benchmark references
+    already folded into constants, so evaluate() only runs eval() over small
+    dicts of numbers.
+    """
+
+    def __init__(self, path: Path, benchmarks: Dict[str, Any], rules: List[CompiledRule], version: Any = None):
+        self.path = Path(path)
+        self.benchmarks = benchmarks
+        self.rules = rules
+        self.version = version
+        self.loaded_at = time.time()
+        self._lock = threading.Lock()
+        # Consecutive rules with the same scope are one pass, as in the old
+        # hand-written _analyze_* functions: unit 1's AC findings come before
+        # unit 2's.
+        self._passes: List[Tuple[str, List[CompiledRule]]] = []
+        for rule in rules:
+            if self._passes and self._passes[-1][0] == rule.scope:
+                self._passes[-1][1].append(rule)
+            else:
+                self._passes.append((rule.scope, [rule]))
+
+    def adopt_stats(self, previous: "RulePack") -> None:
+        """Keep counters for rules that survive a reload."""
+        old = {r.id: r.stats for r in previous.rules}
+        for rule in self.rules:
+            if rule.id in old:
+                rule.stats = old[rule.id]
+
+    def _scopes(self, scope: str, normalized: Any, base: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if scope == "building":
+            yield base
+        elif scope == "lighting":
+            lighting = field_of(normalized, "lighting", None) or {}
+            yield {
+                **base,
+                "watt_per_bulb": field_of(lighting, "watt_per_bulb", 0),
+                "bulbs": field_of(lighting, "bulbs", 0),
+                "hours_per_day": field_of(lighting, "hours_per_day", 0),
+            }
+        else:
+            for i, ac in enumerate(field_of(normalized, "ac_units", None) or []):
+                yield {
+                    **base,
+                    "star_rating": field_of(ac, "star_rating", 0),
+                    "hours_per_day": field_of(ac, "hours_per_day", 0),
+                    "watt": field_of(ac, "watt", 0),
+                    "count": field_of(ac, "count", 0),
+                    "unit": i + 1,
+                }
+
+    def evaluate(self, normalized: Any) -> List[Dict[str, Any]]:
+        """Every finding the rules raise for one building (a normalized dict or NormalizedInput), unsorted."""
+        base = {
+            "monthly_kWh": field_of(normalized, "monthly_kWh", 0),
+            "floor_area_m2": field_of(normalized, "floor_area_m2", 0),
+            "tariff_LKR_per_kWh": field_of(normalized, "tariff_LKR_per_kWh", 0),
+            "energy_intensity": profile_of(normalized).energy_intensity_kwh_per_m2,
+        }
+        findings: List[Dict[str, Any]] = []
+        counts: Dict[int, List[int]] = {}
+        clock = time.perf_counter_ns
+        for scope, rules in self._passes:
+            for names in self._scopes(scope, normalized, base):
+                for rule in rules:
+                    c = counts.setdefault(id(rule), [0, 0, 0, 0])
+                    start = clock()
+                    try:
+                        finding = rule.apply(names, self.benchmarks)
+                    except Exception:
+                        finding = None
+                        c[2] += 1
+                    c[3] += clock() - start
+                    c[0] += 1
+                    if finding is not None:
+                        c[1] += 1
+                        findings.append(finding)
+        with self._lock:
+            for rule in self.rules:
+                c = counts.get(id(rule))
+                if c:
+                    rule.stats.evaluations += c[0]
+                    rule.stats.hits += c[1]
+                    rule.stats.errors += c[2]
+                    rule.stats.time_ns += c[3]
+        return findings
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "id": r.id,
+                    "scope": r.scope,
+                    "evaluations": r.stats.evaluations,
+                    "hits": r.stats.hits,
+                    "errors": r.stats.errors,
+                    "hit_rate": round(r.stats.hits / r.stats.evaluations, 4) if r.stats.evaluations else None,
+                    "total_ms": round(r.stats.time_ns / 1e6, 3),
+                    "avg_us": round(r.stats.time_ns / r.stats.evaluations / 1e3, 3) if r.stats.evaluations else None,
+                }
+                for r in self.rules
+            ]
+
+
+def load_rule_pack(path: Optional[Path] = None) -> RulePack:
+    path = Path(path or RULES_PATH)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = yaml.safe_load(f) or {}
+        version = os.stat(path).st_mtime_ns
+    except (OSError, yaml.YAMLError) as e:
+        raise RulePackError(f"{path}: {e}") from None
+    if not isinstance(raw, dict) or not isinstance(raw.get("rules"), list):
+        raise RulePackError(f"{path}: expected a mapping with a `rules` list")
+    benchmarks = raw.get("benchmarks") or {}
+    if not isinstance(benchmarks, dict):
+        raise RulePackError(f"{path}: `benchmarks` must be a mapping")
+    rules = [_compile_rule(spec, benchmarks) for spec in raw["rules"]]
+    ids = [r.id for r in rules]
+    dupes = sorted({i for i in ids if ids.count(i) > 1})
+    if dupes:
+        raise RulePackError(f"{path}: duplicate rule ids {', '.join(dupes)}")
+    return RulePack(path, benchmarks, rules, version)
+
+
+class RulePackSource:
+    """
+    Hands out the current RulePack and recompiles it when the file changes,
+    checking the file's mtime at most every `check_s` seconds. A reload that
+    fails keeps the last good pack and is reported in info().
+    """
+
+    def __init__(self, path: Path, check_s: float = 1.0):
+        self.path = Path(path)
+        self.check_s = max(float(check_s), 0.0)
+        self._lock = threading.Lock()
+        self._pack = load_rule_pack(self.path)
+        self._checked_at = time.monotonic()
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+        self._failed_version: Any = None
+
+    def get(self) -> RulePack:
+        if time.monotonic() - self._checked_at < self.check_s:
+            return self._pack
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                version = os.stat(self.path).st_mtime_ns
+            except OSError:
+                version = None
+            if version == self._pack.version:
+                return self._pack
+            try:
+                pack = load_rule_pack(self.path)
+            except RulePackError as e:
+                # Count each broken edit once, not once per check.
+                if version != self._failed_version:
+                    self.reload_errors += 1
+                    self.last_error = str(e)
+                    self._failed_version = version
+                return self._pack
+            pack.adopt_stats(self._pack)
+            self._pack = pack
+            self.reloads += 1
+            self.last_error = None
+            return pack
+
+    def info(self) -> Dict[str, Any]:
+        pack = self._pack
+        return {
+            "path": str(self.path),
+            "rules": len(pack.rules),
+            "loaded_at": pack.loaded_at,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+            "per_rule": pack.stats(),
+        }
+
+
+_SOURCE: Optional[RulePackSource] = None
+_SOURCE_LOCK = threading.Lock()
+
+
+def get_rule_source() -> RulePackSource:
+    """Process-wide source for AUDIT_RULES_PATH (default data/audit_rules.yaml); AUDIT_RULES_CHECK_S (default 1) between mtime checks."""
+    global _SOURCE
+    path = Path(os.getenv("AUDIT_RULES_PATH") or RULES_PATH)
+    source = _SOURCE
+    if source is None or source.path != path:
+        with _SOURCE_LOCK:
+            if _SOURCE is None or _SOURCE.path != path:
+                _SOURCE = RulePackSource(path, env_float("AUDIT_RULES_CHECK_S", 1.0))
+            source = _SOURCE
+    return source
+
+
+def get_rule_pack() -> RulePack:
+    return get_rule_source().get()
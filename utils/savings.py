@@ -0,0 +1,24 @@
+from __future__ import annotations
+from math import isfinite
+from typing import Any
+
+
+def _num(x, default=0.0) -> float:
+    try:
+        v = float(x)
+        return v if isfinite(v) else default
+    except Exception:
+        return default
+
+
+def kwh_saved_per_month(action: Any, baseline_kwh: float) -> float:
+    """
+    Monthly kWh an action saves: its own kwh_saved_per_month when given,
+    otherwise pct_kwh_reduction_min of the baseline. Accepts a
+    Recommendation or its dict form.
+    """
+    get = action.get if isinstance(action, dict) else (lambda k: getattr(action, k, None))
+    if get("kwh_saved_per_month") is not None:
+        return max(_num(get("kwh_saved_per_month"), 0.0), 0.0)
+    pct = max(min(_num(get("pct_kwh_reduction_min"), 0.0), 100.0), 0.0)
+    return baseline_kwh * (pct / 100.0)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.env import env_flag, env_float, env_int
+from utils.llm_cache import ROOT, ResponseCache, prompt_fingerprint
+from utils.models import AuditResult, NormalizedInput
+
+# Neighbouring log buckets differ by this ratio (25%): 118 m² and 122 m²
+# share a bucket, 100 m² and 200 m² do not.
+LOG_RATIO = 1.25
+HOURS_STEP = 2.0
+WATT_STEP = 5.0
+
+# Fields the LLM states in absolute terms for the building it saw; dropped on
+# a hit so the impact estimator re-derives them from the percentages, the
+# actual monthly_kWh and the actual tariff.
+ABSOLUTE_FIELDS = ("kwh_saved_per_month", "payback_months")
+
+
+def _log_bucket(x: Any) -> Optional[int]:
+    try:
+        x = float(x)
+    except Exception:
+        return None
+    if not math.isfinite(x) or x <= 0:
+        return None
+    return int(round(math.log(x) / math.log(LOG_RATIO)))
+
+
+def _step_bucket(x: Any, step: float) -> int:
+    try:
+        return int(round(float(x) / step))
+    except Exception:
+        return 0
+
+
+def building_signature(normalized: NormalizedInput, findings: AuditResult) -> Dict[str, Any]:
+    """
+    Quantised profile of what the composer sees. Buildings with the same
+    signature get interchangeable recommendations:
+      - energy intensity (kWh per m² per month), log-bucketed
+      - AC units grouped by star rating, daily-hours and wattage bucket
+      - lighting wattage/hours buckets and a log-bucketed bulb count
+      - policy caps (budget log-bucketed, payback and CO₂ goal stepped)
+      - the set of (finding area, severity)
+    Absolute size (monthly_kWh, floor area) and tariff are left out; they
+    are applied afterwards by the impact estimator.
+    """
+    area = normalized.floor_area_m2 or 0.0
+    intensity = (normalized.monthly_kWh or 0.0) / area if area > 0 else None
+    ac = Counter(
+        (int(round(u.star_rating or 0)), _step_bucket(u.hours_per_day, HOURS_STEP), _log_bucket(u.watt))
+        for u in normalized.ac_units
+        for _ in range(max(int(u.count or 0), 1))
+    )
+    lighting = normalized.lighting
+    policy = normalized.policy
+    return {
+        "intensity": _log_bucket(intensity),
+        "ac": sorted([list(k) + [n] for k, n in ac.items()], key=str),
+        "lighting": [
+            _step_bucket(lighting.watt_per_bulb, WATT_STEP),
+            _step_bucket(lighting.hours_per_day, HOURS_STEP),
+            _log_bucket(lighting.bulbs),
+        ] if lighting and lighting.bulbs > 0 else None,
+        "policy": {
+            "budget": _log_bucket(policy.target_budget_LKR),
+            "payback": _step_bucket(policy.payback_threshold_months, 6) if policy.payback_threshold_months else None,
+            "co2_goal": _step_bucket(policy.co2_reduction_goal_pct, 5) if policy.co2_reduction_goal_pct else None,
+            "max_disruption": policy.max_disruption,
+        } if policy else None,
+        "findings": sorted({(f.area, f.severity) for f in (findings.findings or [])}),
+    }
+
+
+def signature_key(signature: Dict[str, Any], model: str) -> str:
+    material = json.dumps(
+        {"signature": signature, "model": model, "fingerprint": prompt_fingerprint()},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def rescalable(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """A cached composer reply with the building-specific absolute fields removed."""
+    recs: List[Any] = raw.get("recommendations") if isinstance(raw, dict) else None
+    if not isinstance(recs, list):
+        return {"recommendations": []}
+    return {
+        "recommendations": [
+            {k: v for k, v in r.items() if k not in ABSOLUTE_FIELDS} if isinstance(r, dict) else r
+            for r in recs
+        ]
+    }
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_similarity_cache() -> Optional[ResponseCache]:
+    """
+    Composer cache keyed on building_signature(); None unless
+    COMPOSER_SIMILARITY_CACHE=1. COMPOSER_SIMILARITY_CACHE_PATH (empty for
+    memory only) and COMPOSER_SIMILARITY_CACHE_TTL_S (default 7 days)
+    configure it like the response cache.
+    """
+    global _CACHE
+    if not env_flag("COMPOSER_SIMILARITY_CACHE", False):
+        return None
+    if _CACHE is not None:
+        return _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            raw_path = os.getenv("COMPOSER_SIMILARITY_CACHE_PATH", str(ROOT / ".cache" / "similar_recommendations.sqlite3"))
+            _CACHE = ResponseCache(
+                path=Path(raw_path) if raw_path else None,
+                ttl_s=env_float("COMPOSER_SIMILARITY_CACHE_TTL_S", 7 * 24 * 3600.0),
+                mem_entries=env_int("COMPOSER_SIMILARITY_CACHE_MEM_ENTRIES", 256),
+            )
+    return _CACHE
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    Deduplicates identical in-flight calls. The first caller for a key (the
+    leader) runs the work; concurrent callers with the same key wait on the
+    leader's future and receive a deep copy of its result.
+
+    One shared concurrent.futures.Future per key lets threads (.result())
+    and asyncio tasks (wrap_future) wait on the same leader.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self._tasks: Dict[str, "asyncio.Future[Any]"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut, False
+            fut = Future()
+            self._inflight[key] = fut
+            self.leaders += 1
+            return fut, True
+
+    def _leave(self, key: str, fut: Future) -> None:
+        """One caller stops waiting; async work nobody waits for any more is cancelled."""
+        with self._lock:
+            if self._inflight.get(key) is not fut:
+                return
+            self._waiters[key] -= 1
+            task = self._tasks.get(key) if self._waiters[key] <= 0 else None
+        if task is not None:
+            task.cancel()
+
+    def _done(self, key: str, fut: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+                self._waiters.pop(key, None)
+                self._tasks.pop(key, None)
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """timeout bounds how long a follower waits; the leader bounds its own work."""
+        fut, leader = self._join(key)
+        if not leader:
+            try:
+                return copy.deepcopy(fut.result(timeout=timeout))
+            finally:
+                self._leave(key, fut)
+        try:
+            result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            self._done(key, fut)
+        fut.set_result(result)
+        return result
+
+    def _settle(self, key: str, fut: Future, task: "asyncio.Future[Any]") -> None:
+        self._done(key, fut)
+        if task.cancelled():
+            fut.set_exception(RuntimeError("single-flight work was cancelled"))
+        elif task.exception() is not None:
+            fut.set_exception(task.exception())
+        else:
+            fut.set_result(task.result())
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        The leader starts fn() as a task owned by the flight rather than by
+        itself, and every caller (leader included) only waits on it. A caller
+        that is cancelled stops waiting without failing the others; the work
+        itself is cancelled only once no caller is left waiting.
+        """
+        fut, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(fn())
+            with self._lock:
+                self._tasks[key] = task
+            task.add_done_callback(lambda t: self._settle(key, fut, t))
+        waiter = asyncio.wrap_future(fut)
+        try:
+            # shield: a caller that gives up must not cancel the shared future
+            result = await asyncio.wait_for(asyncio.shield(waiter), None if leader else timeout)
+        finally:
+            if not waiter.done():
+                # Nobody reads this caller's copy of the outcome any more.
+                waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._leave(key, fut)
+        return result if leader else copy.deepcopy(result)
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+            }
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from utils.env import env_flag
+from utils.models import Finding, Recommendation
+
+
+def structured_output_enabled() -> bool:
+    """LLM_STRUCTURED_OUTPUT (default off): send JSON-schema response formats with short keys."""
+    return env_flag("LLM_STRUCTURED_OUTPUT", False)
+
+
+# Caps for stages whose replies are short by design; LLM_MAX_TOKENS_<STAGE> overrides.
+DEFAULT_MAX_TOKENS = {"composer_area": 700}
+
+
+def max_tokens_for(stage: str) -> Optional[int]:
+    """Per-stage completion cap from LLM_MAX_TOKENS_<STAGE> (e.g. LLM_MAX_TOKENS_COMPOSER); unset means none."""
+    raw = os.getenv(f"LLM_MAX_TOKENS_{stage.upper()}")
+    if not raw:
+        return DEFAULT_MAX_TOKENS.get(stage)
+    try:
+        value = int(raw)
+    except Exception:
+        value = 0
+    return value if value > 0 else None
+
+
+def _strict(prop: Dict[str, Any]) -> Dict[str, Any]:
+    """Field schema from pydantic, trimmed to what strict response formats accept."""
+    out = {k: v for k, v in prop.items() if k not in {"title", "default", "description", "minimum", "exclusiveMinimum"}}
+    if "anyOf" in out:
+        out["anyOf"] = [_strict(p) for p in out["anyOf"]]
+    if "items" in out:
+        out["items"] = _strict(out["items"])
+    return out
+
+
+@dataclass(frozen=True)
+class WireSchema:
+    """
+    Compact wire format for one LLM reply: a list of items under a short
+    root key, each item using short field keys. `fields` maps short -> long
+    names of `item_model` fields; `extra` adds non-model fields as
+    short -> (long, json schema).
+    """
+    name: str
+    root: str
+    short_root: str
+    item_model: Type[BaseModel]
+    fields: Dict[str, str]
+    extra: Dict[str, Tuple[str, Dict[str, Any]]] = field(default_factory=dict)
+    hint: str = ""
+
+    def _item_schema(self) -> Dict[str, Any]:
+        props = self.item_model.model_json_schema().get("properties", {})
+        properties = {short: _strict(props[long]) for short, long in self.fields.items()}
+        properties.update({short: schema for short, (_, schema) in self.extra.items()})
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False,
+        }
+
+    def json_schema(self) -> Dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {self.short_root: {"type": "array", "items": self._item_schema()}},
+            "required": [self.short_root],
+            "additionalProperties": False,
+        }
+
+    def response_format(self) -> Dict[str, Any]:
+        return {"type": "json_schema", "json_schema": {"name": self.name, "strict": True, "schema": self.json_schema()}}
+
+    def instructions(self) -> str:
+        """Appended to the system prompt so the model knows what the short keys mean."""
+        names = {**self.fields, **{k: v[0] for k, v in self.extra.items()}}
+        keys = ", ".join(f"{short}={long}" for short, long in names.items())
+        text = f"\n\nRESPONSE KEYS: reply with the schema's short keys. {self.short_root}={self.root}; {keys}."
+        return text + (f" {self.hint}" if self.hint else "")
+
+    def expand_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """One short-key item -> long keys; nulls are dropped so model defaults apply."""
+        names = {**self.fields, **{k: v[0] for k, v in self.extra.items()}}
+        return {names.get(k, k): v for k, v in item.items() if v is not None}
+
+    def expand(self, raw: Any) -> Dict[str, Any]:
+        """Short-key reply -> the long-key dict the pydantic models expect; long-key replies pass through."""
+        if not isinstance(raw, dict) or self.root in raw:
+            return raw
+        items = [self.expand_item(item) for item in raw.get(self.short_root) or [] if isinstance(item, dict)]
+        return {self.root: items}
+
+
+AUDIT_WIRE = WireSchema(
+    name="audit_findings",
+    root="findings",
+    short_root="f",
+    item_model=Finding,
+    fields={"a": "area", "i": "issue", "s": "severity", "r": "reason"},
+    extra={
+        "c": ("confidence", {"type": "number"}),
+        "k": ("estimated_kwh_impact", {"type": "number"}),
+    },
+    hint="Keep issue and reason under 20 words each.",
+)
+
+RECOMMENDATIONS_WIRE = WireSchema(
+    name="recommendations",
+    root="recommendations",
+    short_root="r",
+    item_model=Recommendation,
+    fields={
+        "a": "action",
+        "st": "steps",
+        "mn": "pct_kwh_reduction_min",
+        "mx": "pct_kwh_reduction_max",
+        "c": "est_cost",
+        "n": "notes",
+        "d": "disruption",
+        "k": "kwh_saved_per_month",
+        "p": "payback_months",
+    },
+    hint="Use at most 4 short steps; notes under 15 words or null.",
+)
@@ -1,5 +1,8 @@
 from __future__ import annotations
-from typing import Any, Dict, Tuple, List
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple, List
 
 from agents import intake_agent
 from agents import efficiency_auditor
@@ -7,10 +10,18 @@ from agents import recommendation_composer
 from agents import impact_estimator
 from agents import policy_agent
 from agents.planner import TinyPlanner
+from agents.speculation import audit_and_compose, audit_and_compose_async
 
 from utils.models import NormalizedInput, AuditResult, Recommendations, ImpactPlan
 from utils.validation import validate_actions_report
 from utils.autofix import AutoFixContext
+from utils.deadline import Deadline, check_cancelled, use_deadline
+from utils.llm import record_llm_calls, summarize_usage
+from utils.portfolio import PortfolioStats
+from utils.archetypes import (
+    ArchetypeStore, StoredPlan, archetype_payloads, exact_key, features, fresh_for_s,
+    get_archetype_store, get_refresher, load_grid, max_distance, servable,
+)
 
 
 def _coerce_normalized(x: Dict[str, Any] | NormalizedInput) -> NormalizedInput:
@@ -47,7 +58,19 @@ def _compose_and_filter(
     Returns (filtered_recommendations_model, policy_report_dict)
     """
     recs_any = recommendation_composer.compose_recommendations(normalized, findings)
+    return _filter_recs(normalized, recs_any)
 
+
+async def _compose_and_filter_async(
+    normalized: NormalizedInput, findings: AuditResult
+) -> Tuple[Recommendations, Dict[str, Any]]:
+    recs_any = await recommendation_composer.compose_recommendations_async(normalized, findings)
+    return _filter_recs(normalized, recs_any)
+
+
+def _filter_recs(
+    normalized: NormalizedInput, recs_any: Dict[str, Any] | Recommendations
+) -> Tuple[Recommendations, Dict[str, Any]]:
     if isinstance(recs_any, dict):
         recs_dict = recs_any
     else:
@@ -153,11 +176,27 @@ def _legacy_run_workflow(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
     normalized_dict = intake_agent.normalize(raw_payload or {})
     normalized = _coerce_normalized(normalized_dict)
 
-    findings_any = efficiency_auditor.audit(normalized)
-    findings = _coerce_audit(findings_any)
+    findings, recs_any = audit_and_compose(normalized)
+    recs_filtered, _policy_report = _filter_recs(normalized, recs_any)
+    return _legacy_output(raw_payload, normalized, findings, recs_filtered)
+
+
+async def _legacy_run_workflow_async(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
+    normalized_dict = intake_agent.normalize(raw_payload or {})
+    normalized = _coerce_normalized(normalized_dict)
+
+    findings, recs_any = await audit_and_compose_async(normalized)
+    recs_filtered, _policy_report = _filter_recs(normalized, recs_any)
+    return _legacy_output(raw_payload, normalized, findings, recs_filtered)
 
-    recs_filtered, _policy_report = _compose_and_filter(normalized, findings)
 
+def _legacy_output(
+    raw_payload: Dict[str, Any],
+    normalized: NormalizedInput,
+    findings: AuditResult,
+    recs_filtered: Recommendations,
+) -> Dict[str, Any]:
+    check_cancelled("estimator")
     plan_any = impact_estimator.estimate_impact(normalized, recs_filtered)
     plan = _coerce_plan(plan_any)
 
@@ -227,18 +266,7 @@ def _shape_from_planner_final(final: Dict[str, Any] | None) -> Dict[str, Any]:
     }
 
 
-def run_workflow(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Planner-enabled workflow with backward-compatible output.
-    Toggle with: payload.planner.enabled  (default True)
-    """
-    use_planner = bool(raw_payload.get("planner", {}).get("enabled", True))
-
-    if not use_planner or TinyPlanner is None:
-        return _legacy_run_workflow(raw_payload)
-
-    planner = TinyPlanner(max_iters=2)
-    out = planner.run(raw_payload)
+def _planner_output(raw_payload: Dict[str, Any], out: Dict[str, Any]) -> Dict[str, Any]:
     final = out.get("final") or {}
 
     shaped = _shape_from_planner_final(final)
@@ -252,3 +280,213 @@ def run_workflow(raw_payload: Dict[str, Any]) -> Dict[str, Any]:
     )
 
     return shaped
+
+
+def _mark_degraded(shaped: Dict[str, Any], deadline: Deadline, calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    shaped["llm_calls"] = calls
+    shaped["llm_usage"] = summarize_usage(calls)
+    shaped["degraded"] = deadline.degraded
+    shaped["degraded_stages"] = list(deadline.degraded_stages)
+    if deadline.notes:
+        shaped["degraded_notes"] = list(deadline.notes)
+    return shaped
+
+
+def run_workflow(raw_payload: Dict[str, Any], deadline: Deadline | None = None) -> Dict[str, Any]:
+    """
+    Planner-enabled workflow with backward-compatible output.
+    Toggle with: payload.planner.enabled  (default True)
+    deadline: request budget shared by every stage (defaults to Deadline.from_env()).
+    Stages that ran out of budget fall back to deterministic results and are
+    listed in the output's "degraded_stages". "llm_calls" holds one record per
+    LLM call (stage, source, queue wait, latency, tokens); "llm_usage" totals
+    the tokens per stage.
+    Calling deadline.cancel() (from another thread, say) skips the remaining
+    stages and planner iterations and raises RequestCancelled.
+    """
+    deadline = deadline or Deadline.from_env()
+    use_planner = bool(raw_payload.get("planner", {}).get("enabled", True))
+
+    with use_deadline(deadline), record_llm_calls() as calls:
+        if not use_planner or TinyPlanner is None:
+            return _mark_degraded(_legacy_run_workflow(raw_payload), deadline, calls)
+
+        planner = TinyPlanner(max_iters=2)
+        out = planner.run(raw_payload)
+        return _mark_degraded(_planner_output(raw_payload, out), deadline, calls)
+
+
+async def run_workflow_async(raw_payload: Dict[str, Any], deadline: Deadline | None = None) -> Dict[str, Any]:
+    """
+    Asyncio variant of run_workflow with the same output shape.
+    LLM stages are awaited, so one worker can hold many analyses in flight.
+    deadline.cancel() also aborts the LLM call in flight.
+    """
+    deadline = deadline or Deadline.from_env()
+    use_planner = bool(raw_payload.get("planner", {}).get("enabled", True))
+
+    with use_deadline(deadline), record_llm_calls() as calls:
+        if not use_planner or TinyPlanner is None:
+            return _mark_degraded(await _legacy_run_workflow_async(raw_payload), deadline, calls)
+
+        planner = TinyPlanner(max_iters=2)
+        out = await planner.run_async(raw_payload)
+        return _mark_degraded(_planner_output(raw_payload, out), deadline, calls)
+
+
+async def run_portfolio_async(
+    payloads: Iterable[Dict[str, Any]], stats: PortfolioStats | None = None, concurrency: int = 8
+) -> PortfolioStats:
+    """
+    Run every site through run_workflow_async, at most `concurrency` at a
+    time, and fold each result into `stats` as it completes. Results are not
+    kept, so memory does not grow with the number of sites; `payloads` may
+    be a generator. A site that raises is counted in stats.failed.
+    """
+    stats = stats if stats is not None else PortfolioStats()
+    sites = iter(payloads)
+
+    async def worker() -> None:
+        for payload in sites:
+            try:
+                stats.add(await run_workflow_async(payload))
+            except Exception:
+                stats.add_failure()
+
+    await asyncio.gather(*(worker() for _ in range(max(int(concurrency), 1))))
+    return stats
+
+
+async def run_workflow_stream(
+    raw_payload: Dict[str, Any], deadline: Deadline | None = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of the single-pass pipeline (no planner retries).
+    Yields events as they become available:
+      {"event": "findings", ...}  once the audit is done
+      {"event": "action", ...}    per recommendation, as the composer streams it
+      {"event": "result", ...}    the full run_workflow-shaped output, with
+                                  "stream": {"time_to_first_action_s", "actions_streamed"}
+    """
+    deadline = deadline or Deadline.from_env()
+    started = time.monotonic()
+
+    with use_deadline(deadline), record_llm_calls() as calls:
+        normalized = _coerce_normalized(intake_agent.normalize(raw_payload or {}))
+        check_cancelled("auditor")
+        findings = _coerce_audit(await efficiency_auditor.audit_async(normalized))
+        yield {"event": "findings", "elapsed_s": round(time.monotonic() - started, 4), "findings": findings.model_dump()}
+
+        check_cancelled("composer")
+        first_action_s = None
+        streamed = 0
+        recs: Recommendations | None = None
+        async for ev in recommendation_composer.compose_recommendations_stream(normalized, findings):
+            if ev["type"] == "done":
+                recs = ev["recommendations"]
+                continue
+            streamed += 1
+            elapsed = round(time.monotonic() - started, 4)
+            if first_action_s is None:
+                first_action_s = elapsed
+            yield {"event": "action", "elapsed_s": elapsed, "recommendation": ev["recommendation"], "impact": ev["impact"]}
+
+        recs_filtered, _policy_report = _filter_recs(normalized, recs or Recommendations())
+        shaped = _mark_degraded(_legacy_output(raw_payload, normalized, findings, recs_filtered), deadline, calls)
+        shaped["stream"] = {"time_to_first_action_s": first_action_s, "actions_streamed": streamed}
+        yield {"event": "result", "elapsed_s": round(time.monotonic() - started, 4), "result": shaped}
+
+
+def precompute_archetypes(
+    store: Optional[ArchetypeStore] = None, grid_path: Optional[Path] = None, limit: Optional[int] = None
+) -> int:
+    """
+    Batch job: run the full pipeline for every archetype in data/archetypes.yaml
+    and store each result with its feature vector. Returns how many were stored;
+    degraded runs are skipped so a flaky provider never seeds the store.
+    """
+    store = store or get_archetype_store()
+    stored = 0
+    for arch_id, payload in archetype_payloads(load_grid(grid_path)):
+        if limit is not None and stored >= limit:
+            break
+        result = run_workflow(payload)
+        if result.get("degraded"):
+            continue
+        result["archetype"] = arch_id
+        normalized = _coerce_normalized(intake_agent.normalize(payload))
+        store.put(f"archetype:{arch_id}", "archetype", result, features(normalized))
+        stored += 1
+    return stored
+
+
+def remember_exact(raw_payload: Dict[str, Any], result: Dict[str, Any], store: Optional[ArchetypeStore] = None) -> None:
+    """Keep a full pipeline result so the next identical request is served from the store."""
+    normalized = _coerce_normalized(intake_agent.normalize(raw_payload or {}))
+    if result.get("degraded") or not servable(normalized):
+        return
+    (store or get_archetype_store()).put(exact_key(normalized), "exact", result)
+
+
+def _served(
+    result: Dict[str, Any], hit: StoredPlan, source: str, refreshing: bool, distance: Optional[float] = None
+) -> Dict[str, Any]:
+    out = dict(result)
+    out["llm_calls"] = []
+    out["llm_usage"] = summarize_usage([])
+    out["served_from"] = {
+        "source": source,
+        "key": hit.key,
+        "age_s": round(hit.age_s, 1),
+        "distance": round(distance, 4) if distance is not None else None,
+        "refreshing": refreshing,
+    }
+    return out
+
+
+def _rebased(result: Dict[str, Any], raw_payload: Dict[str, Any], normalized: NormalizedInput) -> Dict[str, Any]:
+    """An archetype's findings and recommendations with the plan re-estimated on the caller's own input."""
+    out = dict(result)
+    out.update(_legacy_output(
+        raw_payload, normalized, _coerce_audit(result["findings"]), _coerce_recs(result["recommendations"])
+    ))
+    return out
+
+
+def serve_precomputed(raw_payload: Dict[str, Any], store: Optional[ArchetypeStore] = None) -> Optional[Dict[str, Any]]:
+    """
+    Stale-while-revalidate lookup in the archetype store:
+      - an exact plan for this input is served; if older than ARCHETYPE_FRESH_S
+        it is also recomputed in the background;
+      - otherwise the nearest archetype within ARCHETYPE_MAX_DISTANCE lends
+        its findings and recommendations, the plan is re-estimated on this
+        input, and the exact plan is computed in the background for next time;
+      - otherwise None, and the caller runs the pipeline itself.
+    Only exact plans are served verbatim. Requests with policy caps or goals
+    are never served from the store.
+    The output says where it came from under "served_from".
+    """
+    normalized = _coerce_normalized(intake_agent.normalize(raw_payload or {}))
+    if not servable(normalized):
+        return None
+    store = store or get_archetype_store()
+    key = exact_key(normalized)
+    payload = dict(raw_payload or {})
+
+    def _refresh() -> None:
+        remember_exact(payload, run_workflow(payload), store)
+
+    hit = store.get(key)
+    if hit is not None:
+        stale = hit.age_s > fresh_for_s()
+        if stale:
+            get_refresher().schedule(key, _refresh)
+        return _served(hit.result, hit, "exact", refreshing=stale)
+
+    arch_key, d = store.nearest(features(normalized))
+    hit = store.get(arch_key) if arch_key is not None and d <= max_distance() else None
+    if hit is None:
+        return None
+    result = _rebased(hit.result, payload, normalized)
+    get_refresher().schedule(key, _refresh)
+    return _served(result, hit, "archetype", refreshing=True, distance=d)